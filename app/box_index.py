@@ -0,0 +1,80 @@
+import numpy as np  # Библиотека для работы с массивами
+import pandas as pd  # Библиотека для работы с таблицами
+from app.layout import number_offset
+
+# Допустимое расхождение положения образца по глубине и по номеру, м
+PLACEMENT_TOLERANCE_M = 0.05
+
+
+class BoxDepthIndex:
+    def __init__(self, layouts):
+        """Индекс интервалов коробок по глубине: отсортированные массивы кровли и подошвы.
+
+        layouts — раскладки коробок (BoxLayout). Образцы сопоставляются с коробками
+        одним бинарным поиском по всему массиву глубин.
+        """
+        layouts = sorted(layouts, key=lambda layout: layout.top_depth)
+        self.layouts = {int(layout.box_number): layout for layout in layouts}
+        self._boxes = np.array([int(layout.box_number) for layout in layouts], dtype=np.int64)
+        self._tops = np.array([layout.top_depth for layout in layouts], dtype=float)
+        self._bottoms = np.array([layout.bottom_depth for layout in layouts], dtype=float)
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def boxes_at(self, depths):
+        """Номера коробок и смещения от их верха (м) для массива абсолютных глубин.
+
+        Глубины вне всех интервалов (и NaN) дают коробку -1 и смещение NaN.
+        При перекрытии интервалов берётся коробка с наибольшей кровлей.
+        """
+        depths = np.asarray(depths, dtype=float)
+        if not len(self._boxes):
+            return np.full(len(depths), -1, dtype=np.int64), np.full(len(depths), np.nan)
+        position = np.searchsorted(self._tops, depths, side="right") - 1
+        clipped = np.maximum(position, 0)
+        found = (position >= 0) & (depths <= self._bottoms[clipped])
+        return np.where(found, self._boxes[clipped], -1), np.where(found, depths - self._tops[clipped], np.nan)
+
+    def place(self, samples_df, box_column, number_column="Номер образца", depth_column="Глубина",
+              tolerance=PLACEMENT_TOLERANCE_M):
+        """Добавляет к таблице образцов положение по глубине и отметку расхождения с номером.
+
+        "Коробка по глубине" и "Смещение, м" — по абсолютной глубине (NaN, если глубина
+        не указана или вне интервалов коробок); "Смещение по номеру, м" — дробная часть
+        номера в метрах (см. number_offset); "Расхождение" — коробка или положение по глубине
+        не совпадают с закодированными в номере.
+        """
+        if depth_column in samples_df.columns:
+            depths = pd.to_numeric(samples_df[depth_column], errors="coerce").to_numpy(dtype=float)
+        else:
+            depths = np.full(len(samples_df), np.nan)
+        boxes, offsets = self.boxes_at(depths)
+
+        numbers = pd.to_numeric(samples_df[number_column], errors="coerce").to_numpy(dtype=float)
+        number_boxes = pd.to_numeric(samples_df[box_column], errors="coerce").to_numpy(dtype=float)
+        number_offsets = number_offset(numbers)
+
+        located = boxes >= 0
+        mismatch = located & ((boxes != number_boxes) | (np.abs(offsets - number_offsets) > tolerance))
+        return samples_df.assign(**{
+            "Коробка по глубине": pd.Series(np.where(located, boxes, np.nan), index=samples_df.index).astype("Int64"),
+            "Смещение, м": pd.Series(offsets, index=samples_df.index).round(3),
+            "Смещение по номеру, м": pd.Series(number_offsets, index=samples_df.index).round(3),
+            "Расхождение": pd.Series(mismatch, index=samples_df.index),
+        })
+
+
+def placement_issues(placed_df, box_column, number_column="Номер образца", depth_column="Глубина"):
+    """Сообщения об образцах, положение которых по глубине не совпадает с номером или не найдено."""
+    issues = []
+    for _, row in placed_df[placed_df["Расхождение"]].iterrows():
+        issues.append(f"Образец {row[number_column]}: по глубине {row[depth_column]} м — коробка "
+                      f"{row['Коробка по глубине']}, {row['Смещение, м']} м от верха; по номеру — коробка "
+                      f"{int(row[box_column])}, {row['Смещение по номеру, м']} м.")
+    outside = placed_df[placed_df["Коробка по глубине"].isna() & placed_df[depth_column].notna()] \
+        if depth_column in placed_df.columns else placed_df.iloc[0:0]
+    for _, row in outside.iterrows():
+        issues.append(f"Образец {row[number_column]}: глубина {row[depth_column]} м вне интервалов коробок, "
+                      f"положение взято по номеру.")
+    return issues
@@ -0,0 +1,323 @@
+import argparse  # Разбор аргументов командной строки
+import hashlib  # Ключ задания по входным данным
+import json  # Формат запросов и ответов
+import os  # Модуль для работы с файлами и папками
+import threading  # Синхронизация потоков
+import time  # Время создания и завершения заданий
+import urllib.error  # Ошибки HTTP клиента
+import urllib.request  # Локальный HTTP клиент
+import uuid  # Идентификаторы заданий
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.column_mapping import MAIN_FIELDS, detect_columns
+from app.data_processor import DataProcessor
+from app.encoding import PROFILES, DEFAULT_PROFILE
+from app.photo_index import PhotoIndex
+from app.samples_loader import load_samples
+
+# Адрес службы: только локальный интерфейс, сеть не нужна
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+# Сколько каталогов строится одновременно
+SERVICE_WORKERS = 2
+# Версия формата ключа кэша: увеличивается, если меняется вид каталога при тех же входных данных
+CACHE_KEY_VERSION = 1
+
+
+def default_cache_dir():
+    """Папка кэша готовых каталогов по умолчанию (можно указать общую папку на сетевом диске)."""
+    base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "CoreCatalog", "build_cache")
+
+
+def _file_fingerprint(path):
+    """Путь, время изменения и размер файла (None, если файла нет)."""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return [os.path.abspath(path), None, None]
+    return [os.path.abspath(path), stat.st_mtime_ns, stat.st_size]
+
+
+def job_key(request):
+    """Ключ задания: одинаковые запросы по неизменённым файлам дают один ключ.
+
+    В ключ входят параметры сборки, а также время изменения и размер Excel, файла
+    образцов и всех фото папки, поэтому правка любого из них даёт новый каталог.
+    """
+    photos = sorted(PhotoIndex(request["images_folder"]).scan().items())
+    payload = {
+        "version": CACHE_KEY_VERSION,
+        "excel": _file_fingerprint(request["excel_path"]),
+        "samples": _file_fingerprint(request.get("samples_path")),
+        "photos": photos,
+        "columns": request.get("columns"),
+        "samples_columns": request.get("samples_columns"),
+        "profile": request.get("profile") or DEFAULT_PROFILE.name,
+        "vector_scale": request.get("vector_scale", True),
+        "composite": request.get("composite", False),
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _JobProgress:
+    """Заменяет прогресс-бар интерфейса для create_catalog: get/set/update."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def get(self):
+        return self.job.progress
+
+    def set(self, value):
+        self.job.progress = value
+
+    def update(self):
+        pass
+
+
+class BuildJob:
+    def __init__(self, key, request):
+        """Задание на сборку каталога: состояние, прогресс и путь к результату."""
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.request = request
+        self.status = "queued"  # queued / running / done / failed
+        self.progress = 0.0
+        self.error = None
+        self.output_path = None
+        self.cached = False
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "id": self.id, "key": self.key, "status": self.status, "progress": round(self.progress, 3),
+            "error": self.error, "cached": self.cached, "created": self.created, "finished": self.finished,
+            "result": f"/jobs/{self.id}/result" if self.status == "done" else None,
+        }
+
+
+class BuildService:
+    def __init__(self, cache_dir=None, workers=SERVICE_WORKERS):
+        """Служба сборки каталогов: очередь заданий, пул исполнителей и общий кэш готовых файлов.
+
+        Одинаковые задания (см. job_key), пришедшие одновременно, выполняются один раз;
+        если каталог с тем же ключом уже есть в кэше, он отдаётся без сборки.
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-build")
+        self.lock = threading.Lock()
+        self.jobs = {}  # id -> BuildJob
+        self.active = {}  # ключ -> выполняемое или ожидающее задание
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.docx")
+
+    def submit(self, request):
+        """Принимает запрос на сборку; возвращает задание (новое, уже выполняемое или готовое из кэша)."""
+        for field in ("excel_path", "images_folder"):
+            if not request.get(field):
+                raise ValueError(f"Не указано поле '{field}'.")
+        if not os.path.isfile(request["excel_path"]):
+            raise ValueError(f"Файл {request['excel_path']} не найден.")
+        if not os.path.isdir(request["images_folder"]):
+            raise ValueError(f"Папка {request['images_folder']} не найдена.")
+        if request.get("profile") and request["profile"] not in PROFILES:
+            raise ValueError(f"Неизвестный профиль кодирования: {request['profile']}")
+
+        key = job_key(request)
+        with self.lock:
+            job = self.active.get(key)
+            if job is not None:
+                return job  # Такое же задание уже в работе
+            job = BuildJob(key, request)
+            self.jobs[job.id] = job
+            if os.path.exists(self.cache_path(key)):
+                job.status, job.progress, job.cached = "done", 1.0, True
+                job.output_path, job.finished = self.cache_path(key), time.time()
+                return job
+            self.active[key] = job
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = "running"
+        request = job.request
+        try:
+            columns = request.get("columns")
+            if not columns:
+                detection = detect_columns(request["excel_path"], MAIN_FIELDS, "main")
+                columns = detection["columns"] if detection["confident"] else None
+            names = ("box_column", "start_column", "end_column", "measurements_column")
+            processor = DataProcessor(request["excel_path"], request["images_folder"],
+                                      **(dict(zip(names, columns)) if columns else {}))
+            processor.process_data()
+            samples_df = None
+            if request.get("samples_path"):
+                samples_columns = request.get("samples_columns") or [None, None]
+                samples_df = load_samples(request["samples_path"], processor.box_column,
+                                          number_column=samples_columns[0], depth_column=samples_columns[1])
+            total_boxes = processor.current_dataframe[processor.box_column].nunique()
+            processor.create_catalog(
+                self.cache_path(job.key), samples_df, _JobProgress(job),
+                1.0 / total_boxes if total_boxes else 1.0,
+                profile=PROFILES.get(request.get("profile")) or DEFAULT_PROFILE,
+                vector_scale=request.get("vector_scale", True),
+                composite=request.get("composite", False),
+            )
+            job.output_path = self.cache_path(job.key)
+            job.progress = 1.0
+            job.status = "done"
+        except Exception as e:
+            print(f"Ошибка сборки задания {job.id}: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            with self.lock:
+                self.active.pop(job.key, None)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None  # BuildService, задаётся в make_server
+
+    def _send_json(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["health"]:
+            return self._send_json(200, {"status": "ok"})
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "Задание не найдено."})
+            if len(parts) == 2:
+                return self._send_json(200, job.to_dict())
+            if parts[2:] == ["result"]:
+                if job.status != "done":
+                    return self._send_json(409, {"error": "Каталог ещё не готов.", "status": job.status})
+                size = os.path.getsize(job.output_path)
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+                with open(job.output_path, "rb") as f:
+                    while True:
+                        chunk = f.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                return None
+        return self._send_json(404, {"error": "Неизвестный адрес."})
+
+    def do_POST(self):
+        if self.path.split("?")[0].rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Неизвестный адрес."})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            job = self.service.submit(request)
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        return self._send_json(202, job.to_dict())
+
+    def log_message(self, format, *args):
+        print(f"Служба сборки: {self.address_string()} {format % args}")
+
+
+def make_server(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    """HTTP-сервер службы (порт 0 — любой свободный)."""
+    handler = type("BuildHandler", (_Handler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class BuildClient:
+    def __init__(self, url=f"http://{SERVICE_HOST}:{SERVICE_PORT}"):
+        """Клиент службы сборки."""
+        self.url = url.rstrip("/")
+
+    def _call(self, method, path, data=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8") if data is not None else None
+        request = urllib.request.Request(self.url + path, data=body, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(json.loads(e.read().decode("utf-8")).get("error", str(e))) from None
+
+    def submit(self, excel_path, images_folder, samples_path=None, columns=None, samples_columns=None,
+               profile=None, vector_scale=True, composite=False):
+        """Отправляет задание; возвращает его состояние (словарь с "id")."""
+        return self._call("POST", "/jobs", {
+            "excel_path": str(excel_path), "images_folder": str(images_folder),
+            "samples_path": str(samples_path) if samples_path else None,
+            "columns": columns, "samples_columns": samples_columns,
+            "profile": profile, "vector_scale": vector_scale, "composite": composite,
+        })
+
+    def status(self, job_id):
+        return self._call("GET", f"/jobs/{job_id}")
+
+    def wait(self, job_id, interval=0.5, timeout=None):
+        """Ждёт завершения задания; возвращает итоговое состояние."""
+        start = time.time()
+        while True:
+            state = self.status(job_id)
+            if state["status"] in ("done", "failed"):
+                return state
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError(f"Задание {job_id} не завершилось за {timeout} с.")
+            time.sleep(interval)
+
+    def download(self, job_id, save_path):
+        """Сохраняет готовый каталог в save_path."""
+        with urllib.request.urlopen(f"{self.url}/jobs/{job_id}/result") as response, open(save_path, "wb") as f:
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+        return save_path
+
+
+def main(argv=None):
+    """Запуск службы: python -m app.build_service --port 8765 --cache <папка> --workers 2"""
+    parser = argparse.ArgumentParser(description="Локальная служба сборки каталогов.")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--cache", default=None, help="Папка кэша готовых каталогов (может быть общей)")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    args = parser.parse_args(argv)
+
+    service = BuildService(args.cache, args.workers)
+    server = make_server(service, port=args.port)
+    print(f"Служба сборки запущена: http://{SERVICE_HOST}:{server.server_port}, кэш: {service.cache_dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import difflib  # Нечёткое сравнение строк
+import json  # Хранение профилей
+import os  # Модуль для работы с файлами и папками
+import re  # Модуль для регулярных выражений
+import tempfile  # Запись файла профилей через временный файл
+import pandas as pd
+from app.table_loaders import read_table_header
+
+# Сколько строк читать для проверки типов столбцов (файл целиком не читается)
+SAMPLE_ROWS = 50
+# Минимальная оценка, при которой сопоставление принимается без диалога
+AUTO_ACCEPT_SCORE = 0.75
+# Минимальная оценка, при которой столбец предлагается в диалоге
+SUGGEST_SCORE = 0.4
+
+
+def normalize_name(name):
+    """Приводит название столбца к виду для сравнения: нижний регистр, «е» вместо «ё», без знаков препинания."""
+    text = str(name).lower().replace("ё", "е")
+    text = re.sub(r"[^\w№]+", " ", text)
+    return " ".join(text.split())
+
+
+class ColumnField:
+    def __init__(self, label, synonyms, kind="number"):
+        """Поле, которое нужно найти в таблице: подпись в диалоге, синонимы названия и ожидаемый тип значений."""
+        self.label = label
+        self.synonyms = [normalize_name(synonym) for synonym in synonyms]
+        self.kind = kind  # "number" — числа, "integer" — целые числа
+
+
+# Поля основного файла и файла с образцами (порядок совпадает с порядком в диалоге выбора столбцов)
+MAIN_FIELDS = [
+    ColumnField("Коробка (BOX)", ["box", "коробка", "номер коробки", "№ коробки", "ящик", "кор"], "integer"),
+    ColumnField("От (начало коробки)", ["от", "from", "top", "начало", "кровля", "глубина от", "интервал от"]),
+    ColumnField("До (конец коробки)", ["до", "to", "bottom", "base", "конец", "подошва", "глубина до", "интервал до"]),
+    ColumnField("Замеры (для выноса)", ["замеры", "замер", "вынос", "длина керна", "керн", "recovery", "м керна"]),
+]
+SAMPLES_FIELDS = [
+    ColumnField("Номер образца", ["номер образца", "№ образца", "образец", "sample", "sample id", "шифр"]),
+    ColumnField("Глубина", ["глубина", "depth", "глубина отбора", "абсолютная глубина", "md"]),
+]
+
+
+def read_header(path, sample_rows=SAMPLE_ROWS):
+    """Читает заголовок таблицы и первые sample_rows строк для проверки типов (любой формат, см. table_loaders.py)."""
+    return read_table_header(path, sample_rows)
+
+
+def name_score(column, field):
+    """Оценка совпадения названия столбца с синонимами поля (0..1)."""
+    name = normalize_name(column)
+    if not name:
+        return 0.0
+    best = 0.0
+    for synonym in field.synonyms:
+        if name == synonym:
+            return 1.0
+        words = name.split()
+        if synonym in words or (len(synonym) > 3 and synonym in name):
+            best = max(best, 0.85)
+        else:
+            best = max(best, 0.8 * difflib.SequenceMatcher(None, name, synonym).ratio())
+    return best
+
+
+def type_score(values, field):
+    """Оценка соответствия значений столбца ожидаемому типу поля (0..1)."""
+    values = values.dropna()
+    if values.empty:
+        return 0.5  # Пустая выборка ничего не говорит о типе
+    numbers = pd.to_numeric(values, errors="coerce")
+    numeric_share = numbers.notna().mean()
+    if field.kind == "integer":
+        numbers = numbers.dropna()
+        integer_share = (numbers == numbers.round()).mean() if not numbers.empty else 0.0
+        return numeric_share * integer_share
+    return numeric_share
+
+
+def auto_map(sample_df, fields):
+    """Сопоставляет полям столбцы таблицы по названиям и типам значений.
+
+    Каждому полю достаётся свой столбец (жадно по убыванию оценки).
+    Возвращает (список столбцов в порядке полей, список оценок); None — если подходящего столбца нет.
+    """
+    candidates = []
+    for field_index, field in enumerate(fields):
+        for column in sample_df.columns:
+            score_by_name = name_score(column, field)
+            if score_by_name < SUGGEST_SCORE:
+                continue
+            score = 0.7 * score_by_name + 0.3 * type_score(sample_df[column], field)
+            candidates.append((score, field_index, column))
+
+    columns = [None] * len(fields)
+    scores = [0.0] * len(fields)
+    used = set()
+    for score, field_index, column in sorted(candidates, key=lambda item: item[0], reverse=True):
+        if columns[field_index] is None and column not in used and score >= SUGGEST_SCORE:
+            columns[field_index] = column
+            scores[field_index] = round(float(score), 3)
+            used.add(column)
+    return columns, scores
+
+
+def is_confident(columns, scores):
+    """Сопоставление можно принять без диалога: все поля найдены с высокой оценкой."""
+    return bool(all(column is not None for column in columns) and min(scores) >= AUTO_ACCEPT_SCORE)
+
+
+class MappingProfiles:
+    def __init__(self, path=None):
+        """Именованные профили сопоставления столбцов, сохраняемые между сеансами в JSON-файле."""
+        if path is None:
+            base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".config")
+            path = os.path.join(base, "CoreCatalog", "column_profiles.json")
+        self.path = path
+        self.profiles = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Ошибка чтения профилей столбцов {self.path}: {e}")
+            return {}
+
+    def save(self, name, kind, columns):
+        """Сохраняет профиль: kind — "main" или "samples", columns — столбцы в порядке полей."""
+        self.profiles[name] = {"kind": kind, "columns": [str(column) for column in columns]}
+        self._write()
+
+    def delete(self, name):
+        """Удаляет профиль."""
+        if self.profiles.pop(name, None) is not None:
+            self._write()
+
+    def _write(self):
+        # Пишем во временный файл и переименовываем, чтобы не оставить недописанный файл
+        folder = os.path.dirname(self.path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.profiles, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def match(self, columns, kind):
+        """Ищет профиль, все столбцы которого есть в таблице; возвращает (имя, столбцы) или (None, None)."""
+        available = {str(column): column for column in columns}
+        for name, profile in self.profiles.items():
+            if profile.get("kind") == kind and all(column in available for column in profile["columns"]):
+                return name, [available[column] for column in profile["columns"]]
+        return None, None
+
+
+def detect_columns(path, fields, kind, profiles=None):
+    """Определяет столбцы таблицы без диалога: сначала по сохранённым профилям, затем автоматически.
+
+    Читает только заголовок и первые строки. Возвращает словарь с ключами
+    "columns", "scores", "profile" (имя профиля или None), "confident" и "available".
+    """
+    sample_df = read_header(path)
+    available = list(sample_df.columns)
+    if profiles is not None:
+        name, columns = profiles.match(available, kind)
+        if name is not None:
+            return {"columns": columns, "scores": [1.0] * len(columns), "profile": name,
+                    "confident": True, "available": available}
+    columns, scores = auto_map(sample_df, fields)
+    return {"columns": columns, "scores": scores, "profile": None,
+            "confident": is_confident(columns, scores), "available": available}
@@ -1,74 +1,99 @@
 import os
 import pandas as pd
-import re
 from pathlib import Path
-from app.utils import find_continuous_intervals, resource_path
+from app.utils import find_continuous_intervals, resource_path, compact_dtypes, expand_dtypes, format_recovery, \
+    set_cell, DEPTH_DECIMALS
+from app.layout import BoxLayout
+from app.sample_index import SampleIndex
+from app.table_loaders import read_table
+from app.box_index import BoxDepthIndex, placement_issues
+from app.pipeline import run_pipeline
+from app.photo_index import PhotoIndex, PhotoFolderWatcher, parse_photo_name, box_key
+from app.imaging import load_photo, PREFETCH_MAX_BYTES
+from app.encoding import DEFAULT_PROFILE
+from app.volumes import partition_jobs, estimate_job_bytes, build_volumes, write_volume_index
+from app.preflight import run_preflight
+from app.workspace import BuildWorkspace
+from app.page_template import BoxPageTemplate
+from app.depth_scale import scale_ticks, draw_scale
+from app.panel import panel_component, compose_panel, fit_height, PANEL_QUALITY_DROP
 from docx import Document
 from docx.shared import Inches, Cm
 from PIL import Image, ImageDraw, ImageFont
+import copy
 import io
-import math
-import time
+
+# Высота фото коробки на странице каталога, дюймы
+PHOTO_HEIGHT_INCHES = 8.614
+# Ширины столбцов таблицы страницы коробки, дюймы
+PAGE_COLUMN_WIDTHS = (0.9, 3.5, 4.0, 0.5)
+
+
+def extract_well_name(photo_path):
+    """Возвращает название скважины из имени фото ("скв.77_12.JPG" -> "77")."""
+    if not photo_path or pd.isna(photo_path):
+        return None
+    parsed = parse_photo_name(Path(photo_path).name)
+    return parsed[2] if parsed else None
+
+
+def _same_value(a, b):
+    """Сравнивает значения ячеек с учётом NaN и точности float32."""
+    if pd.isna(a) and pd.isna(b):
+        return True
+    if pd.isna(a) or pd.isna(b):
+        return False
+    return round(float(a), DEPTH_DECIMALS) == round(float(b), DEPTH_DECIMALS)
+
 
 class DataProcessor:
-    def __init__(self, excel_path, images_folder, box_column="BOX", start_column="от", end_column="до", measurements_column="замеры"):
+    def __init__(self, excel_path, images_folder, box_column="BOX", start_column="от", end_column="до", measurements_column="замеры",
+                 core_count_column="колонки", box_length_column="длина коробки"):
         print(f"Инициализация DataProcessor: box_column='{box_column}', start_column='{start_column}', end_column='{end_column}', measurements_column='{measurements_column}'")
         self.excel_path = Path(excel_path).resolve()
         self.images_folder = Path(images_folder).resolve()
         self.data = None
         self.all_image_files = []
         self.current_dataframe = None
+        self.sample_index = None  # Индекс образцов по коробкам и глубинам
+        self.sample_placement = None  # Образцы с положением по глубине и отметкой расхождения с номером
+        self.photo_index = None  # Индекс фото по коробкам
+        self.photo_watcher = None  # Опрос папки с фото
         self.box_column = box_column
         self.start_column = start_column
         self.end_column = end_column
         self.measurements_column = measurements_column
+        self.core_count_column = core_count_column  # Необязательный столбец: число колонок керна в коробке
+        self.box_length_column = box_length_column  # Необязательный столбец: длина коробки (м)
 
     def load_excel(self):
-        """Загружает данные из Excel в DataFrame."""
-        self.data = pd.read_excel(self.excel_path)
+        """Загружает таблицу коробок (Excel, CSV, Parquet, LAS — по расширению) в DataFrame.
+
+        Для текстовых форматов глубины и замеры сразу читаются как float64, без определения типов.
+        """
+        self.data = read_table(self.excel_path, {
+            self.start_column: "float64", self.end_column: "float64", self.measurements_column: "float64",
+        })
 
     def load_image_files(self):
-        """Получает список всех изображений из выбранной папки."""
-        valid_extensions = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
-        self.all_image_files = [f.resolve() for f in self.images_folder.iterdir() if f.suffix.lower() in valid_extensions]
+        """Получает список всех изображений из выбранной папки и строит индекс фото по коробкам."""
+        self.photo_index = PhotoIndex(self.images_folder).build()
+        self.all_image_files = self.photo_index.all_files()
 
     def add_photo_columns(self):
         """Добавляет столбцы с путями к фотографиям и названием скважины."""
-        if not self.all_image_files:
+        if self.photo_index is None:
             self.load_image_files()
 
         if self.box_column not in self.data.columns:  # Используем self.box_column вместо 'BOX'
             raise ValueError(f"В данных отсутствует столбец '{self.box_column}' для сопоставления с фото.")
 
-        def find_matching_file(box, uf=False):
-            box_str = str(box)
-            pattern = re.compile(rf"^(.+?)_{box_str}(_uf)?\.(jpg|jpeg|png|tif|tiff|bmp)$", re.IGNORECASE)
-            for file_path in self.all_image_files:
-                file_name = file_path.name.lower()
-                match = pattern.match(file_name)
-                if match:
-                    if uf and "_uf" in file_name:
-                        return str(file_path)
-                    elif not uf and "_uf" not in file_name:
-                        return str(file_path)
-            return None
-
-        def extract_well_name(photo_path):
-            if not photo_path:
-                return None
-            file_name = Path(photo_path).stem
-            match = re.match(r"^(.+?)_\d+(_uf)?$", file_name)
-            if match:
-                well_name = match.group(1)
-                return well_name.replace("скв.", "").strip()
-            return None
-
-        self.data["Фото"] = self.data[self.box_column].apply(lambda box: find_matching_file(box, uf=False))
-        self.data["Фото УФ"] = self.data[self.box_column].apply(lambda box: find_matching_file(box, uf=True))
-        self.data["Скважина"] = self.data["Фото"].apply(extract_well_name)
-        cols = list(self.data.columns)
-        cols.insert(cols.index(self.box_column), cols.pop(cols.index("Скважина")))
-        self.data = self.data[cols]
+        # Поиск по индексу фото вместо перебора всех файлов для каждой коробки
+        self.data["Фото"] = self.data[self.box_column].apply(lambda box: self.photo_index.find(box, uf=False))
+        self.data["Фото УФ"] = self.data[self.box_column].apply(lambda box: self.photo_index.find(box, uf=True))
+        # Вставляем столбец на место, без перестановки всей таблицы
+        self.data.insert(self.data.columns.get_loc(self.box_column), "Скважина",
+                         self.data["Фото"].apply(extract_well_name))
 
     def compute_intervals(self):
         """Вычисляет непрерывные интервалы и добавляет их в DataFrame как 'Начало интервала' и 'Конец интервала'."""
@@ -82,24 +107,17 @@ class DataProcessor:
 
         _, interval_dict = find_continuous_intervals(self.data, start_col, end_col)
 
-        def get_interval_start(row):
-            start = float(row[start_col])
-            return interval_dict.get(start, (None, None))[0]
-
-        def get_interval_end(row):
-            start = float(row[start_col])
-            return interval_dict.get(start, (None, None))[1]
-
-        self.data["Начало интервала"] = self.data.apply(get_interval_start, axis=1)
-        self.data["Конец интервала"] = self.data.apply(get_interval_end, axis=1)
+        # Сопоставляем начало строки с интервалом через словарь, без построчного apply
+        starts = self.data[start_col].astype(float)
+        interval_starts = starts.map({start: interval[0] for start, interval in interval_dict.items()})
+        interval_ends = starts.map({start: interval[1] for start, interval in interval_dict.items()})
 
-        cols = list(self.data.columns)
-        end_col_index = cols.index(end_col)
-        cols.pop(cols.index("Начало интервала"))
-        cols.pop(cols.index("Конец интервала"))
-        cols.insert(end_col_index + 1, "Начало интервала")
-        cols.insert(end_col_index + 2, "Конец интервала")
-        self.data = self.data[cols]
+        for name in ("Начало интервала", "Конец интервала"):
+            if name in self.data.columns:
+                del self.data[name]
+        end_col_index = self.data.columns.get_loc(end_col)
+        self.data.insert(end_col_index + 1, "Начало интервала", interval_starts)
+        self.data.insert(end_col_index + 2, "Конец интервала", interval_ends)
 
     def process_data(self, samples_file=None):
         """Обрабатывает данные: загружает Excel, добавляет фото, вычисляет интервалы."""
@@ -122,102 +140,246 @@ class DataProcessor:
             self.data[end_col] = pd.to_numeric(self.data[end_col], errors="coerce")
             self.data[start_col] = pd.to_numeric(self.data[start_col], errors="coerce")
 
-            self.data["Вынос"] = self.data.apply(
-                lambda
-                    row: f"{row[measurements_col]} м ({(row[measurements_col] / (row[end_col] - row[start_col]) * 100):.1f} %)"
-                if pd.notna(row[measurements_col]) and pd.notna(row[end_col]) and pd.notna(row[start_col]) and (
-                        row[end_col] - row[start_col]) != 0
-                else "N/A",
-                axis=1
-            )
-            cols = list(self.data.columns)
-            cols.insert(cols.index(measurements_col) + 1, cols.pop(cols.index("Вынос")))  # Обновлено
-            self.data = self.data[cols]
-
-        self.current_dataframe = self.data.copy()
-        if self.start_column in self.current_dataframe.columns:
-            self.current_dataframe = self.current_dataframe.sort_values(by=self.start_column)
+            vynos = format_recovery(self.data[measurements_col], self.data[start_col], self.data[end_col])
+            if "Вынос" in self.data.columns:
+                del self.data["Вынос"]
+            self.data.insert(self.data.columns.get_loc(measurements_col) + 1, "Вынос", vynos)
+
+        # Единственная материализация: отсортированная таблица в компактных типах,
+        # self.data и current_dataframe ссылаются на один и тот же объект
+        if self.start_column in self.data.columns:
+            self.data = self.data.sort_values(by=self.start_column)
+        self.data = self.compact_table(self.data)
+        self.current_dataframe = self.data
         return self.current_dataframe
 
-    def generate_depth_scale(self, top_depth, bottom_depth, core_count, box_length=1.0):
-        """Генерирует шкалу глубин для коробки."""
-        # Параметры шкалы
-        shift_up = 20  # Сдвиг сверху в пикселях
-        shift_btm = 20  # Сдвиг снизу в пикселях
-        image_height = 1100  # Высота изображения шкалы (пиксели)
-        image_width = 50  # Ширина изображения шкалы
-        step_rul = 0.1  # Шаг линейки (0.1 м)
-
-        # Создаём изображение для первой шкалы
-        im_d = Image.new('RGB', (image_width, image_height), (255, 255, 255))
-        draw = ImageDraw.Draw(im_d)
-
-        # Если есть вторая шкала (core_count == 2), создаём её
-        if core_count == 2:
-            im_d2 = Image.new('RGB', (image_width, image_height), (255, 255, 255))
-            draw2 = ImageDraw.Draw(im_d2)
-        else:
-            draw2 = None
-
-        # Загружаем шрифт
-        try:
-            font_path = resource_path('resources/arial.ttf')
-            font = ImageFont.truetype(font_path, 14)
-            font_small = ImageFont.truetype(font_path, 10)
-        except IOError:
-            font = ImageFont.load_default()
-            font_small = ImageFont.load_default()
-
-        # Определяем направление шкалы (сверху вниз)
-        rul_direct = 1  # 1: сверху вниз, -1: снизу вверх
-        if rul_direct == 1:
-            shift = shift_up
-            h = (image_height - shift_up - shift_btm) / (box_length * 10)  # Масштаб в пикселях на дециметр
-            dy_text = 15  # Смещение текста для первой отметки
-        else:
-            shift = image_height - shift_btm
-            h = -(image_height - shift_up - shift_btm) / (box_length * 10)
-            dy_text = -15
-
-        # Рисуем отметки на шкале
-        for depth in [top_depth, bottom_depth]:
-            for ll in range(round((bottom_depth - top_depth) / step_rul) + 1):
-                current_depth = top_depth + ll * step_rul
-                # Вычисляем позицию на шкале
-                dz = (current_depth - top_depth) / box_length  # Нормализованная позиция
-                hy = (image_height - shift_up - shift_btm) * dz
-                tsh = dy_text if ll == 0 else 0  # Смещение текста для первой отметки
-
-                # Определяем, на какую шкалу рисовать (первая или вторая)
-                target_draw = draw if ll < (round((bottom_depth - top_depth) / step_rul) + 1) // 2 or core_count == 1 else draw2
-
-                # Рисуем отметки
-                if current_depth % 1 < 0.00001:  # Каждые 1 м
-                    target_draw.line((0, shift_up + hy, 50, shift_up + hy), fill="green", width=4)
-                    target_draw.text((0, shift_up + hy + tsh), str(round(current_depth, 1)), (0, 0, 0), font=font)
-                elif current_depth % 0.5 < 0.00001:  # Каждые 0.5 м
-                    target_draw.line((0, shift_up + hy, 50, shift_up + hy), fill="green", width=2)
-                    target_draw.text((0, shift_up + hy + tsh), str(round(current_depth, 1)), (0, 0, 0), font=font)
-                else:  # Каждые 0.1 м
-                    target_draw.line((0, shift_up + hy, 25, shift_up + hy), fill="green", width=2)
-
-        # Сохраняем первую шкалу в поток
-        img_d = io.BytesIO()
-        im_d.save(img_d, 'JPEG')
-        img_d.seek(0)
-
-        # Если есть вторая шкала, сохраняем её
-        if core_count == 2:
-            img_d2 = io.BytesIO()
-            im_d2.save(img_d2, 'JPEG')
-            img_d2.seek(0)
-            return img_d, img_d2
-        return img_d, None
-
-    def draw_sample_circles(self, photo_path, samples_in_box, core_count, suffix='_with_circles'):
-        """Рисует кружки на копии фото керна в местах отбора образцов, не изменяя оригинал."""
-        # Открываем изображение
-        img = Image.open(photo_path)
+    def compact_table(self, data):
+        """Переводит обработанную таблицу в компактные типы (см. compact_dtypes)."""
+        cols_lower = {str(col).lower(): col for col in data.columns}
+        numeric_cols = [cols_lower.get(name.lower()) for name in
+                        (self.start_column, self.end_column, self.measurements_column, self.box_length_column)]
+        return compact_dtypes(
+            data,
+            category_columns=["Скважина", "Фото", "Фото УФ"],
+            float_columns=[col for col in numeric_cols if col] + ["Начало интервала", "Конец интервала"],
+            integer_columns=[self.box_column]
+        )
+
+    @classmethod
+    def from_project(cls, store, well_name):
+        """Открывает скважину из файла проекта (ProjectStore) без чтения Excel и сканирования папки.
+
+        Индекс фото восстанавливается по сохранённому снимку папки; изменения в папке после
+        сохранения подхватит опрос папки (start_photo_watcher).
+        """
+        info = store.well_info(well_name)
+        if info is None:
+            raise KeyError(f"Скважина '{well_name}' отсутствует в проекте.")
+        processor = cls(info["excel_path"], info["images_folder"], **info["settings"])
+        processor.data = processor.compact_table(store.load_table(well_name))
+        processor.current_dataframe = processor.data
+        processor.photo_index = PhotoIndex(processor.images_folder).restore(store.load_photo_files(well_name))
+        processor.all_image_files = processor.photo_index.all_files()
+        return processor
+
+    def apply_edit(self, row_label, column, value):
+        """Применяет правку ячейки и пересчитывает только зависимые значения.
+
+        Изменение глубин пересчитывает интервалы только затронутой группы строк,
+        изменение глубин или замеров — "Вынос" только этой строки.
+        Возвращает метки строк, значения которых изменились.
+        """
+        df = self.current_dataframe
+        cols_lower = {col.lower(): col for col in df.columns}
+        start_col = cols_lower.get(self.start_column.lower())
+        end_col = cols_lower.get(self.end_column.lower())
+        measurements_col = cols_lower.get(self.measurements_column.lower())
+        numeric_cols = {start_col, end_col, measurements_col, self.box_column,
+                        cols_lower.get(self.core_count_column.lower()) if self.core_count_column else None,
+                        cols_lower.get(self.box_length_column.lower()) if self.box_length_column else None}
+        numeric_cols.discard(None)
+
+        if column in numeric_cols or column in ("Начало интервала", "Конец интервала"):
+            value = pd.to_numeric(str(value).replace(",", "."), errors="coerce")
+        elif value == "" and column in ("Фото", "Фото УФ"):
+            value = None
+
+        old_range = None
+        if column in (start_col, end_col) and "Начало интервала" in df.columns:
+            old_range = (df.at[row_label, "Начало интервала"], df.at[row_label, "Конец интервала"])
+
+        set_cell(df, row_label, column, value)
+        affected = {row_label}
+
+        if old_range is not None:
+            affected |= self._recompute_interval_group(row_label, old_range, start_col, end_col)
+
+        if column in (start_col, end_col, measurements_col) and measurements_col and "Вынос" in df.columns:
+            row = df.loc[[row_label], [measurements_col, start_col, end_col]].astype(float).round(DEPTH_DECIMALS)
+            vynos = format_recovery(row[measurements_col], row[start_col], row[end_col])
+            df.at[row_label, "Вынос"] = vynos.iloc[0]
+
+        return list(affected)
+
+    def _recompute_interval_group(self, row_label, old_range, start_col, end_col):
+        """Пересчитывает непрерывные интервалы только для групп строк, которых касается правка."""
+        df = self.current_dataframe
+        gap = 0.1  # Допустимый разрыв между строками интервала, как в find_continuous_intervals
+        starts = df[start_col].astype(float).round(DEPTH_DECIMALS)
+        ends = df[end_col].astype(float).round(DEPTH_DECIMALS)
+        group_starts = df["Начало интервала"].astype(float).round(DEPTH_DECIMALS).fillna(starts)
+        group_ends = df["Конец интервала"].astype(float).round(DEPTH_DECIMALS).fillna(ends)
+
+        # Диапазон: старый интервал строки и её новое положение
+        bounds = [old_range[0], old_range[1], starts.at[row_label], ends.at[row_label]]
+        bounds = [float(b) for b in bounds if pd.notna(b)]
+        if not bounds:
+            return set()
+        lo, hi = min(bounds), max(bounds)
+
+        # Расширяем диапазон целыми группами, пока в него попадают соседние интервалы
+        while True:
+            mask = (group_starts <= hi + gap) & (group_ends >= lo - gap)
+            new_lo = min(lo, group_starts[mask].min())
+            new_hi = max(hi, group_ends[mask].max())
+            if new_lo == lo and new_hi == hi:
+                break
+            lo, hi = new_lo, new_hi
+
+        # Возвращаем глубинам исходные десятичные значения (float32 даёт «хвосты» у границы разрыва)
+        subset = df.loc[mask, [start_col, end_col]].astype(float).round(DEPTH_DECIMALS)
+        _, interval_dict = find_continuous_intervals(subset, start_col, end_col)
+        interval_starts = subset[start_col].astype(float).map({k: v[0] for k, v in interval_dict.items()})
+        interval_ends = subset[start_col].astype(float).map({k: v[1] for k, v in interval_dict.items()})
+
+        changed = set()
+        for label in subset.index:
+            new_start, new_end = interval_starts.at[label], interval_ends.at[label]
+            old_start, old_end = df.at[label, "Начало интервала"], df.at[label, "Конец интервала"]
+            if not (_same_value(new_start, old_start) and _same_value(new_end, old_end)):
+                set_cell(df, label, "Начало интервала", new_start)
+                set_cell(df, label, "Конец интервала", new_end)
+                changed.add(label)
+        return changed
+
+    def start_photo_watcher(self, interval=2.0):
+        """Запускает опрос папки с фото: новые, изменённые и удалённые файлы попадают в индекс."""
+        if self.photo_index is None:
+            self.load_image_files()
+        if self.photo_watcher is None:
+            self.photo_watcher = PhotoFolderWatcher(self.photo_index, interval)
+        self.photo_watcher.start()
+
+    def stop_photo_watcher(self):
+        """Останавливает опрос папки с фото."""
+        if self.photo_watcher is not None:
+            self.photo_watcher.stop()
+
+    def apply_photo_changes(self):
+        """Обновляет "Фото", "Фото УФ" и "Скважина" для коробок, чьи фото изменились.
+
+        Возвращает метки изменённых строк, чтобы интерфейс обновил только их.
+        """
+        if self.photo_watcher is None or self.current_dataframe is None:
+            return []
+        changed_boxes = self.photo_watcher.get_changes()
+        if not changed_boxes:
+            return []
+
+        df = self.current_dataframe
+        box_keys = df[self.box_column].map(box_key)
+        affected = list(df.index[box_keys.isin(changed_boxes)])
+        with self.photo_watcher.lock:
+            self.all_image_files = self.photo_index.all_files()
+            for label in affected:
+                box = df.at[label, self.box_column]
+                photo_path = self.photo_index.find(box, uf=False)
+                set_cell(df, label, "Фото", photo_path)
+                set_cell(df, label, "Фото УФ", self.photo_index.find(box, uf=True))
+                set_cell(df, label, "Скважина", extract_well_name(photo_path))
+        print(f"Обновлены фото коробок: {sorted(changed_boxes)}")
+        return affected
+
+    def box_layouts(self):
+        """Раскладки всех коробок таблицы: номер коробки -> BoxLayout."""
+        return {box_number: self.get_box_layout(box_number, group)
+                for box_number, group in self.current_dataframe.groupby(self.box_column)}
+
+    def build_sample_index(self, samples_df, layouts=None):
+        """Строит индекс образцов по коробкам и глубинам и сохраняет его для повторного использования.
+
+        Образец относится к коробке по абсолютной глубине (индекс интервалов от/до, см. box_index.py);
+        образцы без глубины или с глубиной вне всех коробок — по номеру, как раньше.
+        """
+        if samples_df is None:
+            self.sample_index = self.sample_placement = None
+            return None
+        layouts = layouts if layouts is not None else self.box_layouts()
+        placed = BoxDepthIndex(layouts.values()).place(samples_df, self.box_column)
+        self.sample_placement = placed
+        issues = placement_issues(placed, self.box_column)
+        if issues:
+            print(f"Положение образцов по глубине не совпадает с номером ({len(issues)}), например: {issues[0]}")
+
+        number_boxes = pd.to_numeric(placed[self.box_column], errors="coerce")
+        placement_box = placed["Коробка по глубине"].astype("Float64").fillna(number_boxes).astype(float)
+        self.sample_index = SampleIndex(placed.assign(**{self.box_column: placement_box}), self.box_column)
+        return self.sample_index
+
+    def get_placement_issues(self):
+        """Сообщения о расхождении положения образцов по глубине и по номеру (после build_sample_index)."""
+        if self.sample_placement is None:
+            return []
+        return placement_issues(self.sample_placement, self.box_column)
+
+    def get_sample_index(self):
+        """Возвращает последний построенный индекс образцов."""
+        return self.sample_index
+
+    def get_box_layout(self, box_number, group):
+        """Строит раскладку коробки по первой строке группы: интервал, число колонок и длина коробки."""
+        cols_lower = {col.lower(): col for col in group.columns}
+        start_col = cols_lower[self.start_column.lower()]
+        end_col = cols_lower[self.end_column.lower()]
+        row = group.iloc[0]
+
+        core_count = 1
+        core_count_col = cols_lower.get(self.core_count_column.lower()) if self.core_count_column else None
+        if core_count_col is not None:
+            value = pd.to_numeric(row[core_count_col], errors="coerce")
+            if pd.notna(value) and value >= 1:
+                core_count = int(value)
+
+        box_length = 1.0
+        box_length_col = cols_lower.get(self.box_length_column.lower()) if self.box_length_column else None
+        if box_length_col is not None:
+            value = pd.to_numeric(row[box_length_col], errors="coerce")
+            if pd.notna(value) and value > 0:
+                box_length = float(value)
+
+        return BoxLayout(box_number, float(row[start_col]), float(row[end_col]), core_count, box_length)
+
+    def generate_depth_scale(self, layout):
+        """Генерирует растровые шкалы глубин для коробки: по одной шкале на каждую колонку керна.
+
+        Используется для предпросмотра; в каталог по умолчанию вставляется векторная шкала (см. depth_scale.py).
+        """
+        scales = []
+        for col_top, col_bottom in layout.columns:
+            im_d = draw_scale(scale_ticks(layout, col_top, col_bottom))
+
+            # Сохраняем шкалу в поток
+            img_d = io.BytesIO()
+            im_d.save(img_d, 'JPEG')
+            img_d.seek(0)
+            scales.append(img_d)
+        return scales
+
+    def annotate_image(self, img, samples_in_box, layout):
+        """Возвращает RGB-копию изображения с кружками в местах отбора образцов.
+
+        Все колонки керна размечаются за один проход по фото.
+        """
         # Создаём копию изображения
         img_copy = Image.new('RGB', img.size)
         img_copy.paste(img)  # Копируем содержимое, чтобы гарантированно не изменять оригинал
@@ -228,16 +390,13 @@ class DataProcessor:
         shift_up = 0  # Отступ сверху (можно настроить, если нужно)
         shift_btm = 0  # Отступ снизу (можно настроить, если нужно)
 
-        # Радиус кружка (12% от ширины изображения)
-        r = img_width * 0.12
-
-        # Вычисляем позицию по горизонтали (центр для одного ядра)
-        hx = img_width / (2 * core_count)
+        # Радиус кружка (12% от ширины одной колонки)
+        r = img_width * 0.12 / layout.core_count
 
         # Настраиваем шрифт для подписи
         try:
             font_path = resource_path('resources/arial.ttf')
-            font = ImageFont.truetype(font_path, int(r * 1))
+            font = ImageFont.truetype(font_path, max(1, int(r * 1)))
         except IOError:
             font = ImageFont.load_default()
 
@@ -248,12 +407,13 @@ class DataProcessor:
         # Обрабатываем каждый образец в коробке
         for _, sample in samples_in_box.iterrows():
             sample_num = sample['Номер образца']
-            # Извлекаем десятичную часть номера образца (глубина в метрах от верха коробки)
-            depth_in_box = sample_num - int(sample_num)  # Например, для 3.15 это 0.15 м
+            # Колонка и доля её высоты: по глубине образца, без глубины — по дробной части номера
+            column, depth_in_column = layout.locate_placed(sample_num, sample.get('Смещение, м'))
+            # Вычисляем позицию по горизонтали (центр колонки)
+            hx = layout.column_center(column, img_width)
 
             # Вычисляем вертикальную позицию кружка
-            # Коробка 1 м, высота изображения (за вычетом отступов) соответствует 1 м
-            hy = (img_height - shift_up - shift_btm) * depth_in_box
+            hy = (img_height - shift_up - shift_btm) * depth_in_column
 
             # Корректируем положение, если кружок близко к краю
             if shift_up + hy + r > 0.95 * img_height:  # Близко к нижнему краю
@@ -264,7 +424,7 @@ class DataProcessor:
             # Рисуем кружок
             draw.arc(
                 (hx - r, shift_up + hy - r, hx + r, shift_up + hy + r),
-                0, 360, fill=(255, 255, 0), width=int(r / 10)
+                0, 360, fill=(255, 255, 0), width=max(1, int(r / 10))
             )
 
             # Добавляем подпись (номер образца)
@@ -285,49 +445,235 @@ class DataProcessor:
                     font=font
                 )
 
-        # Закрываем исходное изображение
-        img.close()
+        return img_copy
+
+    def collect_box_jobs(self, samples_df=None):
+        """Готовит задания на коробки: группа строк, раскладка, образцы и пути к фото."""
+        cols_lower = {col.lower(): col for col in self.current_dataframe.columns}
+        if not cols_lower.get(self.start_column.lower()) or not cols_lower.get(self.end_column.lower()):
+            raise ValueError(f"Не найдены столбцы '{self.start_column}' и/или '{self.end_column}' в DataFrame.")
+
+        layouts = self.box_layouts()
+        sample_index = self.build_sample_index(samples_df, layouts)
+        jobs = []
+        for box_number, group in self.current_dataframe.groupby(self.box_column):
+            photo_path = group["Фото"].iloc[0]
+            photo_uf_path = group["Фото УФ"].iloc[0]
+            jobs.append({
+                "box_number": box_number,
+                "group": group,
+                "layout": layouts[box_number],
+                "samples": sample_index.for_box(box_number) if sample_index is not None else None,
+                "photo_path": photo_path if pd.notna(photo_path) else None,
+                "photo_uf_path": photo_uf_path if pd.notna(photo_uf_path) else None,
+            })
+        return jobs
+
+    def read_box_photos(self, job):
+        """Этап чтения: загружает байты основного и УФ-фото коробки (без декодирования).
+
+        Гигантские сканы заранее не читаются: вместо байтов передаётся путь, и файл
+        читается полосами на этапе обработки.
+        """
+        photos = {}
+        for key in ("photo_path", "photo_uf_path"):
+            path = job[key]
+            if path and os.path.exists(path) and os.path.getsize(path) > PREFETCH_MAX_BYTES:
+                photos[key] = path
+            elif path and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    photos[key] = f.read()
+            else:
+                photos[key] = None
+        return photos
+
+    def render_box(self, job, photos, profile=None, vector_scale=False, composite=False):
+        """Этап обработки: строит шкалы, рисует кружки образцов и кодирует фото коробки.
+
+        Размер фото в пикселях и качество задаёт профиль кодирования (по умолчанию DEFAULT_PROFILE)
+        исходя из высоты фото на странице. При vector_scale вместо JPEG-шкал готовятся
+        только отметки, а шкала рисуется в документе векторными фигурами.
+        При composite шкалы и основное фото собираются в одну картинку (см. render_box_panel);
+        коробка без основного фото получает обычные шкалы.
+        """
+        profile = profile or DEFAULT_PROFILE
+        box_number = job["box_number"]
+        layout = job["layout"]
+        samples_in_box = job["samples"]
+        keys = ("photo_path", "photo_uf_path")
+        if composite and photos["photo_path"] is not None:
+            rendered = {"panel": self.render_box_panel(job, photos["photo_path"], profile)}
+            keys = ("photo_uf_path",)
+        elif vector_scale:
+            rendered = {"scale_ticks": [scale_ticks(layout, top, bottom) for top, bottom in layout.columns]}
+        else:
+            rendered = {"scales": self.generate_depth_scale(layout)}
+        for key in keys:
+            data = photos[key]
+            if data is None:
+                print(f"Фото {key} для коробки {box_number} не найдено или отсутствует: {job[key]}")
+                rendered[key] = None
+                continue
+            # Фото сразу уменьшается до размера на странице; кружки рисуются уже на уменьшенном фото
+            img = load_photo(job[key], (None, profile.pixel_height(PHOTO_HEIGHT_INCHES)),
+                             data if isinstance(data, bytes) else None)
+            if samples_in_box is not None and not samples_in_box.empty:
+                print(f"Рисуем кружки образцов на фото коробки {box_number}: {job[key]}")
+                img = self.annotate_image(img, samples_in_box, layout)
+            try:
+                rendered[key] = profile.encode(img, height_inches=PHOTO_HEIGHT_INCHES)
+            except Exception as e:
+                print(f"Ошибка кодирования фото {job[key]}: {e}")
+                # Если закодировать не удалось, вставляем исходный файл
+                rendered[key] = io.BytesIO(data) if isinstance(data, bytes) else data
+        return rendered
+
+    def render_box_panel(self, job, data, profile=None):
+        """Собирает шкалы глубин и основное фото коробки в одно изображение.
+
+        Панель сразу строится в пикселях профиля для высоты фото на странице: шкалы рисуются
+        в этом размере. Линейка и масштаб остаются общими картинками документа, УФ-фото
+        кодируется отдельно (см. render_box). Бюджет панели — объём того же фото в обычном
+        режиме: качество начинается на PANEL_QUALITY_DROP ниже профильного и при нужде
+        подбирается двоичным поиском (см. EncodingProfile.encode). data — байты или путь
+        основного фото. Возвращает JPEG (BytesIO).
+        """
+        profile = profile or DEFAULT_PROFILE
+        layout = job["layout"]
+        samples_in_box = job["samples"]
+        height = profile.pixel_height(PHOTO_HEIGHT_INCHES)
+
+        parts = [draw_scale(scale_ticks(layout, top, bottom), height) for top, bottom in layout.columns]
+        img = load_photo(job["photo_path"], (None, height), data if isinstance(data, bytes) else None)
+        if samples_in_box is not None and not samples_in_box.empty:
+            print(f"Рисуем кружки образцов на фото коробки {job['box_number']}: {job['photo_path']}")
+            img = self.annotate_image(img, samples_in_box, layout)
+        photo = fit_height(img.convert('RGB'), height)
+        budget = profile.encode(photo, height_inches=PHOTO_HEIGHT_INCHES).getbuffer().nbytes
+        return profile.encode(compose_panel(parts + [photo], height), height_inches=PHOTO_HEIGHT_INCHES,
+                              quality=profile.quality - PANEL_QUALITY_DROP, max_bytes=budget)
+
+    def render_box_thumbnail(self, job, height=400):
+        """Строит уменьшенную панель коробки для предпросмотра: шкалы, фото, шкала-линейка и УФ-фото.
+
+        Использует ту же раскладку и образцы, что и каталог; фото декодируется сразу
+        в уменьшенном размере (см. load_photo), поэтому миниатюра строится быстро.
+        """
+        layout = job["layout"]
+        samples_in_box = job["samples"]
+
+        parts = [draw_scale(scale_ticks(layout, top, bottom), height) for top, bottom in layout.columns]
+        for key, shkala_after in (("photo_path", True), ("photo_uf_path", False)):
+            path = job[key]
+            if path and os.path.exists(path):
+                img = load_photo(path, (None, height))  # Общее изображение кэша: не изменяем на месте
+                if samples_in_box is not None and not samples_in_box.empty:
+                    img = self.annotate_image(img, samples_in_box, layout)
+                parts.append(fit_height(img, height))
+            if shkala_after:
+                # Высота линейки в каталоге — 1 дюйм при высоте фото 8.614 дюйма
+                parts.append(panel_component('shkala.jpg', max(1, round(height / PHOTO_HEIGHT_INCHES))))
+        return compose_panel(parts, height, gap=4)
+
+    def write_box_page(self, doc, job, rendered, resources):
+        """Этап записи: добавляет в документ страницу коробки с таблицей, фото и шкалами.
+
+        Страница копируется из шаблона resources["page_template"] (см. BoxPageTemplate),
+        после чего заполняются текст ячеек и картинки.
+        """
+        box_number = job["box_number"]
+        # float32-глубины и замеры в текст — только через округлённый float64, иначе в каталог попадает "шум"
+        group = expand_dtypes(job["group"])
+        layout = job["layout"]
+        samples_in_box = job["samples"]
+        template = resources["page_template"]
+        set_text = template.set_text
+        cols_lower = {col.lower(): col for col in group.columns}
+        start_col = cols_lower[self.start_column.lower()]
+        end_col = cols_lower[self.end_column.lower()]
+
+        target_height = Inches(PHOTO_HEIGHT_INCHES)
+
+        print(f"Обработка коробки {box_number}")
+        cells = template.add_page()
 
-        # Сохраняем изменённое изображение во временный файл
-        temp_img = io.BytesIO()
-        img_copy.save(temp_img, 'JPEG')
-        temp_img.seek(0)
+        set_text(cells[0][0], f'Коробка {int(box_number)}')
 
-        # Создаём уникальный временный путь, чтобы избежать перезаписи
-        base, ext = os.path.splitext(photo_path)
-        temp_path = f"{base}{suffix}_{int(time.time())}{ext}"  # Добавляем временную метку для уникальности
-        with open(temp_path, 'wb') as f:
-            f.write(temp_img.getvalue())
+        ts = 'Интервал бурения: '
+        for idx, row in group.iterrows():
+            ts += f"{row['Начало интервала']}-{row['Конец интервала']}\nвынос: {row['Вынос']}\n"
+        set_text(cells[0][1], ts.strip())
 
-        # Проверяем, что исходный файл не изменился
-        if os.path.getsize(photo_path) != os.path.getsize(temp_path):
-            print(f"Исходный файл {photo_path} не изменён.")
+        set_text(cells[1][0], 'Номера образцов:')
+
+        if samples_in_box is not None:
+            sample_numbers = samples_in_box['Номер образца'].tolist()
+            set_text(cells[2][0], '\n'.join(map(str, sample_numbers)))
         else:
-            print(f"Внимание: исходный файл {photo_path} может быть изменён!")
+            set_text(cells[2][0], '')
 
-        return temp_path
+        start_value = group[start_col].iloc[0]
+        set_text(cells[1][1], f'[{start_value}]' if layout.core_count == 1 else ' '.join(layout.column_labels()))
 
-    def compress_image(self, image_path, max_width=1200, quality=85):
-        """Сжимает изображение до заданной ширины и качества."""
-        try:
-            img = Image.open(image_path)
-            # Преобразуем в RGB, если изображение в RGBA или другом формате
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            # Уменьшаем ширину, сохраняя пропорции
-            width_percent = max_width / float(img.size[0])
-            new_height = int(float(img.size[1]) * float(width_percent))
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-            # Сохраняем в буфер с заданным качеством
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=quality)
-            output.seek(0)
-            return output
-        except Exception as e:
-            print(f"Ошибка сжатия изображения {image_path}: {e}")
-            return image_path  # Возвращаем исходный путь в случае ошибки
-
-    def create_catalog(self, save_path, samples_df=None, progress_bar=None, progress_step=1.0):
+        end_value = group[end_col].iloc[0]
+        set_text(cells[3][1], f'[{end_value}]')
+
+        set_text(cells[1][2], 'Исследования:')
+
+        if samples_in_box is not None and not samples_in_box.empty:
+            # Подпись образца ставится напротив точки отбора на фото: доля высоты колонки * высота фото
+            labels = []
+            for idx, sample in samples_in_box.iterrows():
+                sample_num = sample['Номер образца']
+                _, depth_in_box = layout.locate_placed(sample_num, sample.get('Смещение, м'))
+                labels.append((depth_in_box * target_height, f"{sample_num}\t{sample['Исследования']}"))
+            labels.sort(key=lambda label: label[0])
+            template.add_positioned_labels(cells[2][2], labels)
+
+        # Добавляем шкалу глубин, основное фото и УФ-фото
+        self._add_box_pictures(template, cells[2][1].p_lst[0], rendered, resources, target_height)
+
+        # Добавляем масштаб
+        template.add_picture(cells[2][3].p_lst[0], io.BytesIO(resources["scale"]), target_height)
+
+    def _add_box_pictures(self, template, paragraph, rendered, resources, target_height):
+        """Шкалы глубин, фото, линейка и УФ-фото коробки отдельными картинками в абзаце paragraph.
+
+        В составном режиме шкалы и основное фото — одна картинка панели.
+        """
+        shkala_height = Inches(1)
+        if rendered.get("panel") is not None:
+            template.add_picture(paragraph, rendered["panel"], target_height)
+        elif rendered.get("scale_ticks") is not None:
+            for ticks in rendered["scale_ticks"]:
+                template.add_vector_scale(paragraph, ticks, target_height)
+        else:
+            for img_d in rendered["scales"]:
+                template.add_picture(paragraph, img_d, target_height)
+
+        if rendered.get("photo_path") is not None:
+            template.add_picture(paragraph, rendered["photo_path"], target_height)
+
+        template.add_picture(paragraph, io.BytesIO(resources["shkala"]), shkala_height)
+
+        if rendered["photo_uf_path"] is not None:
+            template.add_picture(paragraph, rendered["photo_uf_path"], target_height)
+
+    def create_catalog(self, save_path, samples_df=None, progress_bar=None, progress_step=1.0, prefetch=4, workers=None,
+                       profile=None, jobs=None, title=None, vector_scale=True, composite=False):
+        """Создаёт каталог Word.
+
+        Чтение фото, их обработка и запись документа идут конвейером (см. run_pipeline):
+        пока одна коробка записывается, следующие уже читаются с диска и обрабатываются.
+        profile — профиль кодирования фото (см. app.encoding.PROFILES); jobs — готовые
+        задания коробок (для томов), title — подзаголовок тома; vector_scale — шкалы глубин
+        векторными фигурами Word вместо JPEG (меньше размер, чёткость при любом масштабе);
+        composite — шкалы и основное фото коробки одной картинкой (меньше картинок для Word
+        при сохранении и прокрутке, размер файла — не больше, чем с векторными шкалами).
+        """
+        profile = profile or DEFAULT_PROFILE
+        if profile.image_format != "JPEG":
+            raise ValueError("Word-каталог поддерживает только JPEG-профили кодирования.")
         print("Внутри DataProcessor.create_catalog")
         print(f"Используемый box_column: '{self.box_column}'")
         if self.current_dataframe is None:
@@ -345,6 +691,13 @@ class DataProcessor:
         if not os.path.exists(shkala_image_path):
             raise FileNotFoundError(f"Файл {shkala_image_path} не найден.")
 
+        # Статичные картинки читаем один раз на весь каталог
+        resources = {}
+        with open(scale_image_path, 'rb') as f:
+            resources["scale"] = f.read()
+        with open(shkala_image_path, 'rb') as f:
+            resources["shkala"] = f.read()
+
         doc = Document()
         print("Документ создан")
 
@@ -356,6 +709,8 @@ class DataProcessor:
             section.right_margin = Cm(1)
 
         doc.add_heading(f'Фотографии керна по скважине {self.current_dataframe["Скважина"].iloc[0]}', 0)
+        if title:
+            doc.add_heading(title, 1)
         print("Заголовок добавлен")
 
         p = doc.add_paragraph('Глубины даны по керну. ')
@@ -364,182 +719,84 @@ class DataProcessor:
         p.add_run(
             'Первая цифра соответствует номеру коробки, вторая – расстояние в сантиметрах от низа коробки до точки отбора образца.')
         print("Вступительный текст добавлен")
-
-        width_samles_col = 0.9
-        width_photo_col = 3.5
-        width_samles_right = 4.0
-        target_height = Inches(8.614)
-        shkala_height = Inches(1)
-
-        grouped = self.current_dataframe.groupby(self.box_column)
-        print(f"Группировка выполнена, групп: {len(grouped)}")
-
-        cols_lower = {col.lower(): col for col in self.current_dataframe.columns}
-        start_col = cols_lower.get(self.start_column.lower())
-        end_col = cols_lower.get(self.end_column.lower())
-
-        if not start_col or not end_col:
-            raise ValueError(f"Не найдены столбцы '{self.start_column}' и/или '{self.end_column}' в DataFrame.")
-
-        for box_number, group in grouped:
-            print(f"Обработка коробки {box_number}")
-            doc.add_page_break()
-
-            table = doc.add_table(rows=4, cols=4, style='Table Grid')
-            for cell in table.columns[0].cells:
-                cell.width = Inches(width_samles_col)
-            for cell in table.columns[1].cells:
-                cell.width = Inches(width_photo_col)
-            for cell in table.columns[2].cells:
-                cell.width = Inches(width_samles_right)
-            for cell in table.columns[3].cells:
-                cell.width = Inches(0.5)
-
-            cell = table.cell(0, 0)
-            cell.text = f'Коробка {int(box_number)}'
-
-            cell = table.cell(0, 1)
-            ts = 'Интервал бурения: '
-            for idx, row in group.iterrows():
-                ts += f"{row['Начало интервала']}-{row['Конец интервала']}\nвынос: {row['Вынос']}\n"
-            cell.text = ts.strip()
-
-            cell = table.cell(1, 0)
-            cell.text = 'Номера образцов:'
-
-            cell = table.cell(2, 0)
-            if samples_df is not None:
-                samples_in_box = samples_df[samples_df[self.box_column] == int(box_number)]
-                sample_numbers = samples_in_box['Номер образца'].tolist()
-                cell.text = '\n'.join(map(str, sample_numbers))
-            else:
-                cell.text = ''
-
-            cell = table.cell(1, 1)
-            start_value = group[start_col].iloc[0]
-            cell.text = f'[{start_value}]'
-
-            cell = table.cell(3, 1)
-            end_value = group[end_col].iloc[0]
-            cell.text = f'[{end_value}]'
-
-            cell = table.cell(1, 2)
-            cell.text = 'Исследования:'
-
-            cell = table.cell(2, 2)
-            if samples_df is not None and not samples_in_box.empty:
-                samples_in_box = samples_in_box.sort_values(by='Номер образца')
-                # Начало коробки
-                box_start_depth = float(group[start_col].iloc[0])
-                # Максимум 45 параграфов для 1 метра
-                max_paragraphs = 45
-                # Очищаем ячейку перед заполнением
-                cell._element.clear_content()
-
-                # Добавляем начальный пустой параграф
-                cell.add_paragraph("")
-
-                previous_position = 0  # Позиция в параграфах от начала коробки
-                for idx, sample in samples_in_box.iterrows():
-                    sample_num = sample['Номер образца']
-                    research = sample['Исследования']
-                    # Вычисляем позицию образца в метрах от начала коробки
-                    depth_in_box = sample_num - int(sample_num)  # Например, 0.57 для 22.57
-                    # Преобразуем в количество параграфов (0.57 м * 45 = 25.65 -> 26 параграфов)
-                    position_in_paragraphs = int(depth_in_box * max_paragraphs)
-
-                    # Добавляем пустые параграфы до текущего образца
-                    paragraphs_to_add = position_in_paragraphs - previous_position
-                    for _ in range(paragraphs_to_add):
-                        cell.add_paragraph("")
-
-                    # Добавляем подпись образца
-                    paragraph = cell.add_paragraph()
-                    run = paragraph.add_run()
-                    run.text = f"{sample_num}\t{research}"
-
-                    # Обновляем предыдущую позицию
-                    previous_position = position_in_paragraphs
-
-            # Добавляем шкалу глубин, основное фото и УФ-фото
-            cell = table.cell(2, 1)
-            paragraph = cell.paragraphs[0]
-            top_depth = float(group[start_col].iloc[0])
-            bottom_depth = float(group[end_col].iloc[0])
-            core_count = 1
-            print(f"Генерация шкалы глубин для коробки {box_number}: {top_depth} - {bottom_depth}")
-            img_d, img_d2 = self.generate_depth_scale(top_depth, bottom_depth, core_count)
-            run = paragraph.add_run()
-            run.add_picture(img_d, height=target_height)
-            if img_d2:
-                run = paragraph.add_run()
-                run.add_picture(img_d2, height=target_height)
-
-            photo_path = group["Фото"].iloc[0]
-            if pd.notna(photo_path) and os.path.exists(photo_path):
-                if samples_df is not None and not samples_in_box.empty:
-                    print(f"Обрабатываем основное фото для коробки {box_number}: {photo_path}")
-                    modified_photo_path = self.draw_sample_circles(photo_path, samples_in_box, core_count)
-                    compressed_photo = self.compress_image(modified_photo_path)
-                    print(f"Добавляем сжатое основное фото с кружками для коробки {box_number}")
-                    run = paragraph.add_run()
-                    run.add_picture(compressed_photo, height=target_height)
-                    try:
-                        os.remove(modified_photo_path)
-                        print(f"Удалён временный файл основного фото: {modified_photo_path}")
-                    except Exception as e:
-                        print(f"Ошибка удаления временного файла основного фото: {e}")
-                else:
-                    print(f"Сжимаем и добавляем оригинальное основное фото для коробки {box_number}: {photo_path}")
-                    compressed_photo = self.compress_image(photo_path)
-                    run = paragraph.add_run()
-                    run.add_picture(compressed_photo, height=target_height)
-            else:
-                print(f"Основное фото для коробки {box_number} не найдено или отсутствует: {photo_path}")
-
-            print(f"Добавляем шкалу для коробки {box_number}: {shkala_image_path}")
-            run = paragraph.add_run()
-            run.add_picture(shkala_image_path, height=shkala_height)
-
-            photo_uf_path = group["Фото УФ"].iloc[0]
-            if pd.notna(photo_uf_path) and os.path.exists(photo_uf_path):
-                if samples_df is not None and not samples_in_box.empty:
-                    print(f"Обрабатываем УФ-фото для коробки {box_number}: {photo_uf_path}")
-                    modified_uf_photo_path = self.draw_sample_circles(photo_uf_path, samples_in_box, core_count,
-                                                                      suffix='_uf_with_circles')
-                    compressed_uf_photo = self.compress_image(modified_uf_photo_path)
-                    print(f"Добавляем сжатое УФ-фото с кружками для коробки {box_number}")
-                    run = paragraph.add_run()
-                    run.add_picture(compressed_uf_photo, height=target_height)
-                    try:
-                        os.remove(modified_uf_photo_path)
-                        print(f"Удалён временный файл УФ-фото: {modified_uf_photo_path}")
-                    except Exception as e:
-                        print(f"Ошибка удаления временного файла УФ-фото: {e}")
-                else:
-                    print(f"Сжимаем и добавляем оригинальное УФ-фото для коробки {box_number}: {photo_uf_path}")
-                    compressed_uf_photo = self.compress_image(photo_uf_path)
-                    run = paragraph.add_run()
-                    run.add_picture(compressed_uf_photo, height=target_height)
-            else:
-                print(f"УФ-фото для коробки {box_number} не найдено или отсутствует: {photo_uf_path}")
-
-            # Добавляем масштаб
-            cell = table.cell(2, 3)
-            paragraph = cell.paragraphs[0]
-            run = paragraph.add_run()
-            print(f"Добавляем масштаб для коробки {box_number}: {scale_image_path}")
-            run.add_picture(scale_image_path, height=target_height)
+        resources["page_template"] = BoxPageTemplate(doc, PAGE_COLUMN_WIDTHS)
+
+        if jobs is None:
+            jobs = self.collect_box_jobs(samples_df)
+        print(f"Группировка выполнена, групп: {len(jobs)}")
+
+        pipeline = run_pipeline(
+            jobs,
+            self.read_box_photos,
+            lambda job, photos: (job, self.render_box(job, photos, profile, vector_scale, composite)),
+            prefetch=prefetch,
+            workers=workers
+        )
+        for job, rendered in pipeline:
+            self.write_box_page(doc, job, rendered, resources)
 
             if progress_bar is not None:
                 progress_bar.set(min(progress_bar.get() + progress_step, 1.0))
                 progress_bar.update()
 
         print(f"Сохранение в {save_path}")
-        doc.save(save_path)
+        # Документ собирается во временном файле и переносится на место целиком:
+        # при сбое не остаётся недописанного каталога
+        # Ожидаемый размер нужен, чтобы большой каталог сохранялся на диск, а не в оперативную память
+        expected_size = sum(estimate_job_bytes(job, profile, PHOTO_HEIGHT_INCHES) for job in jobs)
+        with BuildWorkspace("catalog") as workspace:
+            temp_path = workspace.new_path("catalog", ".docx", expected_size)
+            doc.save(temp_path)
+            workspace.publish(temp_path, save_path)
         print(f"Документ сохранён: {save_path}")
         return save_path
 
+    def dry_run(self, samples_df=None, profile=None, workers=None):
+        """Пробная сборка: проверки и оценка каталога без декодирования фото и записи документа.
+
+        Возвращает отчёт run_preflight: замечания по коробкам, число страниц, ожидаемые
+        время сборки и размер файла (по заголовкам фото и калибровке на этом компьютере).
+        """
+        if self.current_dataframe is None:
+            raise ValueError("Нет данных для проверки каталога.")
+        return run_preflight(self, PHOTO_HEIGHT_INCHES, samples_df, profile, workers)
+
+    def volume_copy(self):
+        """Облегчённая копия для сборки тома в другом процессе: без таблицы, индексов и фоновых потоков.
+
+        Строки коробок передаются в процесс вместе с заданиями тома; от таблицы остаётся
+        первая строка — для заголовка и проверки столбцов.
+        """
+        processor = copy.copy(self)
+        processor.data = None
+        processor.current_dataframe = self.current_dataframe.head(1)
+        processor.all_image_files = []
+        processor.sample_index = None
+        processor.sample_placement = None
+        processor.photo_index = None
+        processor.photo_watcher = None
+        return processor
+
+    def create_catalog_volumes(self, save_path, samples_df=None, mode="pages", limit=None, volume_count=None,
+                               processes=None, progress_bar=None, profile=None, composite=False):
+        """Создаёт каталог из нескольких томов и оглавление со ссылками на них.
+
+        Коробки делятся на тома по числу страниц, интервалу глубин или оценке размера
+        (см. partition_jobs); тома строятся параллельно в отдельных процессах.
+        save_path — путь к оглавлению, тома сохраняются рядом с ним.
+        """
+        if self.current_dataframe is None:
+            raise ValueError("Нет данных для создания каталога.")
+        profile = profile or DEFAULT_PROFILE
+        jobs = self.collect_box_jobs(samples_df)
+        volumes = partition_jobs(
+            jobs, mode, limit, volume_count,
+            weight=lambda job: estimate_job_bytes(job, profile, PHOTO_HEIGHT_INCHES)
+        )
+        print(f"Коробок: {len(jobs)}, томов: {len(volumes)}")
+        summaries = build_volumes(self.volume_copy(), save_path, volumes, profile, processes, progress_bar, composite)
+        return write_volume_index(save_path, self.current_dataframe["Скважина"].iloc[0], summaries)
+
     def get_current_dataframe(self):
         """Возвращает текущий DataFrame."""
         return self.current_dataframe
@@ -0,0 +1,136 @@
+import math  # Модуль для математических функций
+from PIL import Image, ImageDraw, ImageFont
+from app.utils import resource_path
+
+# Геометрия шкалы глубин в пикселях растрового варианта; векторная шкала масштабирует её до высоты на странице
+SCALE_WIDTH_PX = 50  # Ширина шкалы
+SCALE_HEIGHT_PX = 1100  # Высота шкалы
+SCALE_MARGIN_PX = 20  # Отступы сверху и снизу
+LABEL_SHIFT_PX = 15  # Смещение подписи первой отметки, чтобы она не уходила за верх
+FONT_PX = 14  # Размер шрифта подписей
+STEP_RUL = 0.1  # Шаг линейки (0.1 м)
+EMU_PER_POINT = 12700  # EMU в одном пункте
+SCALE_COLOR = "008000"  # Цвет отметок (green)
+
+# Уровень отметки -> (доля ширины шкалы, толщина линии в пикселях)
+TICK_STYLES = {
+    "m": (1.0, 4),  # Каждые 1 м
+    "half": (1.0, 2),  # Каждые 0.5 м
+    "dm": (0.5, 2),  # Каждые 0.1 м
+}
+
+_NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:wpg="http://schemas.microsoft.com/office/word/2010/wordprocessingGroup" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+)
+
+
+def scale_ticks(layout, col_top, col_bottom):
+    """Отметки шкалы колонки: (положение 0..1 по высоте колонки, уровень, подпись или None, первая ли отметка)."""
+    ticks = []
+    # Отметки считаем в дециметрах, чтобы избежать ошибок округления float
+    first_tick = math.ceil(round(col_top / STEP_RUL, 6))
+    last_tick = math.floor(round(col_bottom / STEP_RUL, 6))
+    for ll, tick in enumerate(range(first_tick, last_tick + 1)):
+        current_depth = tick * STEP_RUL
+        dz = (current_depth - col_top) / layout.box_length  # Нормализованная позиция
+        if tick % 10 == 0:
+            level = "m"
+        elif tick % 5 == 0:
+            level = "half"
+        else:
+            level = "dm"
+        label = str(round(current_depth, 1)) if level != "dm" else None
+        ticks.append((dz, level, label, ll == 0))
+    return ticks
+
+
+def tick_y_px(dz):
+    """Вертикальная позиция отметки в пикселях шкалы."""
+    return SCALE_MARGIN_PX + (SCALE_HEIGHT_PX - 2 * SCALE_MARGIN_PX) * dz
+
+
+def draw_scale(ticks, height_px=SCALE_HEIGHT_PX):
+    """Растровая шкала колонки высотой height_px пикселей: геометрия растровой шкалы в масштабе.
+
+    При высоте по умолчанию (SCALE_HEIGHT_PX) рисует ту же шкалу, что и раньше; для составной
+    панели коробки шкала рисуется сразу в размере фото, без растяжения.
+    """
+    k = height_px / SCALE_HEIGHT_PX
+    try:
+        font = ImageFont.truetype(resource_path('resources/arial.ttf'), max(1, round(FONT_PX * k)))
+    except IOError:
+        font = ImageFont.load_default()
+
+    width = max(1, round(SCALE_WIDTH_PX * k))
+    im_d = Image.new('RGB', (width, height_px), (255, 255, 255))
+    draw = ImageDraw.Draw(im_d)
+    for dz, level, label, first in ticks:
+        length_share, line_px = TICK_STYLES[level]
+        y = tick_y_px(dz) * k
+        draw.line((0, y, width * length_share, y), fill="green", width=max(1, round(line_px * k)))
+        if label is not None:
+            tsh = LABEL_SHIFT_PX * k if first else 0  # Смещение текста для первой отметки
+            draw.text((0, y + tsh), label, (0, 0, 0), font=font)
+    return im_d
+
+
+def _line_xml(x, y, length, width):
+    return (
+        '<wps:wsp><wps:cNvCnPr/><wps:spPr>'
+        f'<a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{length}" cy="0"/></a:xfrm>'
+        '<a:prstGeom prst="line"><a:avLst/></a:prstGeom>'
+        f'<a:ln w="{width}"><a:solidFill><a:srgbClr val="{SCALE_COLOR}"/></a:solidFill></a:ln>'
+        '</wps:spPr><wps:bodyPr/></wps:wsp>'
+    )
+
+
+def _label_xml(x, y, width, height, text, half_points):
+    return (
+        '<wps:wsp><wps:cNvSpPr txBox="1"/><wps:spPr>'
+        f'<a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{width}" cy="{height}"/></a:xfrm>'
+        '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom><a:noFill/><a:ln><a:noFill/></a:ln>'
+        '</wps:spPr><wps:txbx><w:txbxContent><w:p>'
+        '<w:pPr><w:spacing w:before="0" w:after="0" w:line="240" w:lineRule="auto"/></w:pPr>'
+        f'<w:r><w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial" w:cs="Arial"/><w:sz w:val="{half_points}"/></w:rPr>'
+        f'<w:t>{text}</w:t></w:r></w:p></w:txbxContent></wps:txbx>'
+        '<wps:bodyPr rot="0" wrap="none" lIns="0" tIns="0" rIns="0" bIns="0" anchor="t"><a:noAutofit/></wps:bodyPr>'
+        '</wps:wsp>'
+    )
+
+
+def vector_scale_xml(ticks, height, shape_id, name="Шкала глубин"):
+    """XML встроенного рисунка DrawingML (группа линий и подписей) для шкалы высотой height (EMU)."""
+    height = int(height)
+    px = height / SCALE_HEIGHT_PX  # EMU в одном пикселе растровой шкалы
+    width = round(SCALE_WIDTH_PX * px)
+    half_points = max(2, round(FONT_PX * px / EMU_PER_POINT * 2))  # Размер шрифта в полупунктах
+    label_height = round(FONT_PX * 1.4 * px)
+
+    shapes = []
+    for dz, level, label, first in ticks:
+        length_share, line_px = TICK_STYLES[level]
+        y = round(tick_y_px(dz) * px)
+        shapes.append(_line_xml(0, y, round(width * length_share), round(line_px * px)))
+        if label is not None:
+            shift = LABEL_SHIFT_PX if first else 0
+            label_y = min(round((tick_y_px(dz) + shift) * px), height - label_height)
+            shapes.append(_label_xml(0, label_y, width, label_height, label, half_points))
+
+    return (
+        f'<w:drawing {_NAMESPACES}>'
+        '<wp:inline distT="0" distB="0" distL="0" distR="0">'
+        f'<wp:extent cx="{width}" cy="{height}"/><wp:effectExtent l="0" t="0" r="0" b="0"/>'
+        f'<wp:docPr id="{shape_id}" name="{name} {shape_id}"/><wp:cNvGraphicFramePr/>'
+        '<a:graphic><a:graphicData uri="http://schemas.microsoft.com/office/word/2010/wordprocessingGroup">'
+        '<wpg:wgp><wpg:cNvGrpSpPr/><wpg:grpSpPr>'
+        f'<a:xfrm><a:off x="0" y="0"/><a:ext cx="{width}" cy="{height}"/>'
+        f'<a:chOff x="0" y="0"/><a:chExt cx="{width}" cy="{height}"/></a:xfrm>'
+        '</wpg:grpSpPr>'
+        + "".join(shapes) +
+        '</wpg:wgp></a:graphicData></a:graphic></wp:inline></w:drawing>'
+    )
+
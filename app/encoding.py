@@ -0,0 +1,96 @@
+import io  # Работа с потоками байтов
+from PIL import Image  # Работа с изображениями
+
+# Форматы, которые умеет кодировать профиль (Word вставляет только JPEG, WebP — для прочих выходов)
+ENCODING_FORMATS = ("JPEG", "WEBP")
+
+
+class EncodingProfile:
+    def __init__(self, name, dpi=150, quality=85, max_bytes=None, min_quality=30,
+                 optimize=True, progressive=False, image_format="JPEG"):
+        """Профиль кодирования фото для каталога.
+
+        Размер в пикселях выбирается по реальному размеру фото на странице и dpi
+        (без увеличения исходника). Если задан max_bytes, качество подбирается
+        двоичным поиском между min_quality и quality так, чтобы файл уложился в бюджет.
+        """
+        if image_format not in ENCODING_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат кодирования: {image_format}")
+        self.name = name
+        self.dpi = dpi
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.min_quality = min(min_quality, quality)
+        self.optimize = optimize
+        self.progressive = progressive
+        self.image_format = image_format
+
+    def pixel_height(self, height_inches):
+        """Высота в пикселях для фото высотой height_inches дюймов на странице."""
+        return max(1, round(height_inches * self.dpi))
+
+    def target_size(self, size, height_inches=None, width_inches=None):
+        """Размер в пикселях для размещённого фото; исходник не увеличивается."""
+        width, height = size
+        scale = 1.0
+        if height_inches:
+            scale = min(scale, self.pixel_height(height_inches) / height)
+        if width_inches:
+            scale = min(scale, max(1, round(width_inches * self.dpi)) / width)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def save_at(self, img, quality):
+        """Кодирует изображение как есть (без уменьшения) с заданным качеством; возвращает BytesIO."""
+        output = io.BytesIO()
+        if self.image_format == "JPEG":
+            img.save(output, format="JPEG", quality=quality, optimize=self.optimize,
+                     progressive=self.progressive, dpi=(self.dpi, self.dpi))
+        else:
+            img.save(output, format="WEBP", quality=quality, method=6 if self.optimize else 4)
+        output.seek(0)
+        return output
+
+    def encode(self, img, height_inches=None, width_inches=None, quality=None, max_bytes=None):
+        """Уменьшает изображение под размер на странице и кодирует его; возвращает BytesIO.
+
+        quality — начальное качество вместо профильного (не выше его и не ниже min_quality),
+        max_bytes — бюджет байт вместо профильного.
+        """
+        quality = self.quality if quality is None else max(self.min_quality, min(quality, self.quality))
+        max_bytes = max_bytes or self.max_bytes
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        size = self.target_size(img.size, height_inches, width_inches)
+        if size != img.size:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+
+        output = self.save_at(img, quality)
+        if max_bytes is None or output.getbuffer().nbytes <= max_bytes:
+            return output
+
+        # Двоичный поиск наибольшего качества, укладывающегося в бюджет
+        best = None
+        low, high = self.min_quality, quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = self.save_at(img, quality)
+            if candidate.getbuffer().nbytes <= max_bytes:
+                best = candidate
+                low = quality + 1
+            else:
+                high = quality - 1
+        if best is None:
+            print(f"Фото не укладывается в {max_bytes} байт даже при качестве {self.min_quality}")
+            best = self.save_at(img, self.min_quality)
+        return best
+
+
+# Готовые профили каталога: стандартный, для печати/архива и для рассылки по почте
+DEFAULT_PROFILE = EncodingProfile("Стандарт", dpi=150, quality=85)
+PROFILES = {
+    profile.name: profile for profile in (
+        DEFAULT_PROFILE,
+        EncodingProfile("Печать (архив)", dpi=300, quality=92),
+        EncodingProfile("Почта", dpi=96, quality=80, max_bytes=150_000, progressive=True),
+    )
+}
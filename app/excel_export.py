@@ -0,0 +1,206 @@
+import zipfile  # Книга .xlsx — zip-архив с XML-частями
+from xml.sax.saxutils import escape  # Экранирование текста для XML
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+from app.utils import expand_dtypes
+from app.samples_loader import NO_RESEARCH
+from app.workspace import BuildWorkspace
+
+# Сколько строк таблицы переводится в XML за раз (память не зависит от размера таблицы)
+EXPORT_CHUNK_ROWS = 10_000
+# Цвет подсветки строк (как в интерфейсе)
+HIGHLIGHT_COLOR = "FF6666"
+# Служебный столбец с процентом выноса для правила выделения
+RECOVERY_PERCENT_COLUMN = "Вынос, %"
+# Символы, недопустимые в XML
+_ILLEGAL_XML = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+
+def recovery_percents(vynos):
+    """Процент выноса из текстов "X м (Y %)" для всего столбца сразу; NaN, если процента нет."""
+    extracted = vynos.astype(object).where(vynos.notna(), "").astype(str).str.extract(r"\((\d+\.\d+|\d+) %\)")[0]
+    return pd.to_numeric(extracted, errors="coerce")
+
+
+def _text_cells(values):
+    """XML ячеек со строками (inline-строки, без общей таблицы строк)."""
+    text = values.astype(str).str.replace(_ILLEGAL_XML, "", regex=True)
+    text = text.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False) \
+        .str.replace(">", "&gt;", regex=False)
+    return '<c t="inlineStr"><is><t xml:space="preserve">' + text + "</t></is></c>"
+
+
+def _column_cells(series):
+    """XML ячеек столбца для всех строк сразу; пустые значения — пустая ячейка <c/>."""
+    series = series.reset_index(drop=True)
+    if pd.api.types.is_bool_dtype(series):
+        return '<c t="b"><v>' + series.astype(int).astype(str) + "</v></c>"
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.astype(np.float64) if not pd.api.types.is_integer_dtype(series) else series
+        finite = np.isfinite(values.astype(np.float64))
+        cells = "<c><v>" + values.astype(str) + "</v></c>"
+        return cells.where(finite, "<c/>")
+    values = series.astype(object)
+    present = values.notna()
+    # Числа в столбцах смешанного типа остаются числами, как при to_excel
+    numeric = values.map(lambda value: isinstance(value, (int, float, np.number)) and not isinstance(value, bool))
+    cells = pd.Series("<c/>", index=values.index, dtype=object)
+    text_mask = present & ~numeric
+    if text_mask.any():
+        cells[text_mask] = _text_cells(values[text_mask])
+    number_mask = present & numeric
+    if number_mask.any():
+        numbers = values[number_mask].astype(np.float64)
+        cells[number_mask] = ("<c><v>" + numbers.astype(str) + "</v></c>").where(np.isfinite(numbers), "<c/>")
+    return cells
+
+
+class StreamingWorkbook:
+    def __init__(self, path):
+        """Книга Excel, листы которой пишутся в файл потоком, порциями строк.
+
+        Строки переводятся в XML по столбцам для целой порции сразу, поэтому запись
+        не зависит от поячеечных объектов и память не растёт с размером таблицы.
+        Подсветка задаётся правилом условного форматирования на весь лист.
+        """
+        self.path = path
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.sheets = []  # Названия листов
+        self.dxf_count = 0  # Форматы для условного форматирования (один на лист с подсветкой)
+
+    def add_sheet(self, title, df, highlight_formula=None):
+        """Записывает таблицу на новый лист; highlight_formula — условие выделения строки (для строки 2)."""
+        number = len(self.sheets) + 1
+        self.sheets.append(title)
+        columns = [str(column) for column in df.columns]
+        with self.zip.open(f"xl/worksheets/sheet{number}.xml", "w") as f:
+            f.write((_XML_HEADER + f'<worksheet xmlns="{_MAIN_NS}">'
+                     '<sheetViews><sheetView workbookViewId="0">'
+                     '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                     '</sheetView></sheetViews><sheetFormatPr defaultRowHeight="15"/>').encode("utf-8"))
+            # Ширина столбцов по заголовку и первым строкам
+            head = df.head(200).map(str)  # map, а не astype: в pandas 3 astype(str) оставляет NaN числом
+            widths = [max([len(column)] + [len(value) for value in head.iloc[:, index]])
+                      for index, column in enumerate(columns)]
+            f.write(("<cols>" + "".join(
+                f'<col min="{index}" max="{index}" width="{max(8, min(60, width + 2))}" customWidth="1"/>'
+                for index, width in enumerate(widths, start=1)) + "</cols><sheetData>").encode("utf-8"))
+
+            header = "".join('<c t="inlineStr" s="1"><is><t xml:space="preserve">' + escape(column) + "</t></is></c>"
+                             for column in columns)
+            f.write(f'<row r="1">{header}</row>'.encode("utf-8"))
+            for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+                chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+                cells = _column_cells(chunk.iloc[:, 0])
+                for index in range(1, chunk.shape[1]):
+                    cells = cells + _column_cells(chunk.iloc[:, index])
+                rows = [f'<row r="{start + offset + 2}">{row}</row>' for offset, row in enumerate(cells)]
+                f.write("".join(rows).encode("utf-8"))
+            f.write(b"</sheetData>")
+
+            if highlight_formula is not None and len(df):
+                last = f"{get_column_letter(len(columns))}{len(df) + 1}"
+                f.write((f'<conditionalFormatting sqref="A2:{last}">'
+                         f'<cfRule type="expression" dxfId="{self.dxf_count}" priority="1">'
+                         f"<formula>{escape(highlight_formula)}</formula></cfRule>"
+                         "</conditionalFormatting>").encode("utf-8"))
+                self.dxf_count += 1
+            f.write(b"</worksheet>")
+
+    def close(self):
+        """Дописывает служебные части книги и закрывает файл."""
+        sheets = "".join(f'<sheet name="{escape(title[:31], {chr(34): "&quot;"})}" sheetId="{number}" r:id="rId{number}"/>'
+                         for number, title in enumerate(self.sheets, start=1))
+        self.zip.writestr("xl/workbook.xml", _XML_HEADER + (
+            f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>'))
+
+        relationships = "".join(
+            f'<Relationship Id="rId{number}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{number}.xml"/>'
+            for number in range(1, len(self.sheets) + 1))
+        styles_id = len(self.sheets) + 1
+        relationships += f'<Relationship Id="rId{styles_id}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+        self.zip.writestr("xl/_rels/workbook.xml.rels", _XML_HEADER + (
+            f'<Relationships xmlns="{_PKG_REL_NS}">{relationships}</Relationships>'))
+
+        dxf = (f'<dxf><font><color rgb="FF000000"/></font><fill><patternFill patternType="solid">'
+               f'<fgColor rgb="FF{HIGHLIGHT_COLOR}"/><bgColor rgb="FF{HIGHLIGHT_COLOR}"/></patternFill></fill></dxf>')
+        self.zip.writestr("xl/styles.xml", _XML_HEADER + (
+            f'<styleSheet xmlns="{_MAIN_NS}">'
+            '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            f'<dxfs count="{self.dxf_count}">{dxf * self.dxf_count}</dxfs>'
+            '</styleSheet>'))
+
+        self.zip.writestr("_rels/.rels", _XML_HEADER + (
+            f'<Relationships xmlns="{_PKG_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'))
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{number}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for number in range(1, len(self.sheets) + 1))
+        self.zip.writestr("[Content_Types].xml", _XML_HEADER + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>'))
+        self.zip.close()
+
+
+def main_table_sheet(df):
+    """Основная таблица для экспорта и условие выделения строк с выносом больше 100 %."""
+    df = expand_dtypes(df)
+    if "Вынос" not in df.columns:
+        return df, None
+    df = df.assign(**{RECOVERY_PERCENT_COLUMN: recovery_percents(df["Вынос"])})
+    letter = get_column_letter(len(df.columns))
+    return df, f"AND(ISNUMBER(${letter}2),${letter}2>100)"
+
+
+def samples_table_sheet(df):
+    """Таблица образцов для экспорта и условие выделения образцов без исследований."""
+    df = expand_dtypes(df)
+    if "Исследования" not in df.columns:
+        return df, None
+    letter = get_column_letter(df.columns.get_loc("Исследования") + 1)
+    return df, f'${letter}2="{NO_RESEARCH}"'
+
+
+def export_tables(save_path, main_df=None, samples_df=None):
+    """Сохраняет основную таблицу и таблицу образцов в одну книгу Excel (листы "Основные данные" и "Образцы").
+
+    Подсветка из интерфейса (вынос больше 100 %, "Нет исследований") переносится
+    правилами условного форматирования. Файл собирается во временном файле и
+    переносится на место целиком.
+    """
+    if main_df is None and samples_df is None:
+        raise ValueError("Нет данных для сохранения.")
+    with BuildWorkspace("export") as workspace:
+        temp_path = workspace.new_path("table", ".xlsx")
+        workbook = StreamingWorkbook(temp_path)
+        try:
+            if main_df is not None:
+                workbook.add_sheet("Основные данные", *main_table_sheet(main_df))
+            if samples_df is not None:
+                workbook.add_sheet("Образцы", *samples_table_sheet(samples_df))
+        finally:
+            workbook.close()
+        workspace.publish(temp_path, save_path)
+    return save_path
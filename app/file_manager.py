@@ -2,6 +2,10 @@ from tkinter import filedialog, ttk, Toplevel, messagebox
 import customtkinter as ctk
 from docx2pdf import convert
 import os
+from app.excel_export import export_tables
+from app.column_mapping import MAIN_FIELDS, SAMPLES_FIELDS, MappingProfiles, detect_columns
+from app.project_store import PROJECT_EXTENSION
+from app.table_loaders import table_filetypes
 
 class FileManager:
     def __init__(self):
@@ -10,35 +14,41 @@ class FileManager:
         self.last_catalog_path = None
         self.main_file_columns = None  # Для хранения выбранных столбцов основного файла
         self.samples_file_columns = None  # Для хранения выбранных столбцов файла с образцами
+        self.mapping_profiles = MappingProfiles()  # Сохранённые профили сопоставления столбцов
 
 
     def select_excel(self):
-        """Выбирает Excel-файл и запрашивает выбор столбцов."""
+        """Выбирает таблицу коробок (Excel, CSV, Parquet, LAS) и запрашивает выбор столбцов."""
         self.excel_path = filedialog.askopenfilename(
-            title="Выберите Excel-файл c информацией о коробках",
-            filetypes=[("Excel files", "*.xlsx *.xls")]
+            title="Выберите таблицу c информацией о коробках (Excel, CSV, Parquet, LAS)",
+            filetypes=table_filetypes()
         )
         if self.excel_path:
-            import pandas as pd
             try:
-                df = pd.read_excel(self.excel_path)
-                columns = list(df.columns)
+                # Читаем только заголовок и первые строки; столбцы определяются по профилю или автоматически
+                detection = detect_columns(self.excel_path, MAIN_FIELDS, "main", self.mapping_profiles)
+                columns = detection["available"]
                 if not columns:
-                    messagebox.showerror("Ошибка", "Excel-файл пуст или не содержит столбцов.")
+                    messagebox.showerror("Ошибка", "Файл пуст или не содержит столбцов.")
                     self.excel_path = None
                     return None
-                # Запрашиваем выбор столбцов, добавляем "Замеры"
-                self.main_file_columns = self.select_columns(
-                    columns,
-                    ["Коробка (BOX)", "От (начало коробки)", "До (конец коробки)",
-                     "Замеры (для выноса)"],
-                    "Выбор столбцов для основного файла"
-                )
+                if detection["confident"]:
+                    self.main_file_columns = detection["columns"]
+                    print(f"Столбцы определены автоматически (профиль: {detection['profile']}): {self.main_file_columns}")
+                else:
+                    # Запрашиваем выбор столбцов, подставляя найденные варианты
+                    self.main_file_columns = self.select_columns(
+                        columns,
+                        [field.label for field in MAIN_FIELDS],
+                        "Выбор столбцов для основного файла",
+                        defaults=detection["columns"],
+                        kind="main"
+                    )
                 if not self.main_file_columns:
                     self.excel_path = None
                     return None
             except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось загрузить Excel-файл: {str(e)}")
+                messagebox.showerror("Ошибка", f"Не удалось загрузить таблицу: {str(e)}")
                 self.excel_path = None
                 return None
         return self.excel_path
@@ -53,24 +63,29 @@ class FileManager:
     def select_samples_file(self):
         """Выбирает файл с образцами и запрашивает выбор столбцов."""
         samples_file = filedialog.askopenfilename(
-            title="Выберите файл с образцами",
-            filetypes=[("Excel files", "*.xlsx *.xls")]
+            title="Выберите файл с образцами (Excel, CSV, Parquet, LAS)",
+            filetypes=table_filetypes()
         )
         if samples_file:
-            # Загружаем файл, чтобы получить список столбцов
-            import pandas as pd
+            # Читаем только заголовок, чтобы получить список столбцов
             try:
-                df = pd.read_excel(samples_file)
-                columns = list(df.columns)
+                detection = detect_columns(samples_file, SAMPLES_FIELDS, "samples", self.mapping_profiles)
+                columns = detection["available"]
                 if len(columns) < 3:
                     messagebox.showerror("Ошибка", "Файл с образцами должен содержать как минимум 3 столбца.")
                     return None
-                # Запрашиваем выбор столбцов
-                self.samples_file_columns = self.select_columns(
-                    columns,
-                    ["Номер образца", "Глубина"],
-                    "Выбор столбцов для файла с образцами"
-                )
+                if detection["confident"]:
+                    self.samples_file_columns = detection["columns"]
+                    print(f"Столбцы образцов определены автоматически (профиль: {detection['profile']}): {self.samples_file_columns}")
+                else:
+                    # Запрашиваем выбор столбцов
+                    self.samples_file_columns = self.select_columns(
+                        columns,
+                        [field.label for field in SAMPLES_FIELDS],
+                        "Выбор столбцов для файла с образцами",
+                        defaults=detection["columns"],
+                        kind="samples"
+                    )
                 if not self.samples_file_columns:
                     return None
             except Exception as e:
@@ -78,11 +93,16 @@ class FileManager:
                 return None
         return samples_file
 
-    def select_columns(self, columns, labels, title):
-        """Создаёт окно для выбора столбцов из списка."""
+    def select_columns(self, columns, labels, title, defaults=None, kind=None):
+        """Создаёт окно для выбора столбцов из списка.
+
+        defaults — предложенные столбцы (в порядке labels); если задан kind, выбор можно
+        сохранить как именованный профиль и больше не выбирать вручную.
+        """
+        columns = [str(column) for column in columns]
         window = ctk.CTkToplevel()
         window.title(title)
-        window.geometry("400x300")
+        window.geometry("400x360")
         window.resizable(False, False)
         window.transient()  # Привязываем к главному окну
         window.grab_set()  # Блокируем взаимодействие с главным окном
@@ -100,8 +120,19 @@ class FileManager:
             lbl.pack(side="left")
             combo = ctk.CTkComboBox(frame, values=columns, width=200)
             combo.pack(side="right")
+            if defaults and defaults[len(selected_columns)] is not None:
+                combo.set(str(defaults[len(selected_columns)]))
             selected_columns[label_text] = combo
 
+        # Имя профиля: если указано, выбор сохраняется для следующих файлов
+        profile_entry = None
+        if kind is not None:
+            frame = ctk.CTkFrame(window)
+            frame.pack(fill="x", padx=20, pady=5)
+            ctk.CTkLabel(frame, text="Сохранить как профиль", width=150, anchor="w").pack(side="left")
+            profile_entry = ctk.CTkEntry(frame, width=200, placeholder_text="необязательно")
+            profile_entry.pack(side="right")
+
         # Кнопка подтверждения
         result = [None]  # Для хранения результата
         def confirm():
@@ -117,6 +148,11 @@ class FileManager:
                 messagebox.showerror("Ошибка", "Выбранные столбцы должны быть уникальными.")
                 return
             result[0] = selected
+            if profile_entry is not None and profile_entry.get().strip():
+                try:
+                    self.mapping_profiles.save(profile_entry.get().strip(), kind, selected)
+                except OSError as e:
+                    print(f"Ошибка сохранения профиля столбцов: {e}")
             window.destroy()
 
         btn_confirm = ctk.CTkButton(window, text="Подтвердить", command=confirm, corner_radius=8)
@@ -134,10 +170,25 @@ class FileManager:
         window.wait_window()  # Ждём, пока окно не закроется
         return result[0]
 
+    def detect_main_columns(self, excel_path):
+        """Определяет столбцы основного файла без диалога; возвращает список столбцов или None, если не уверен."""
+        try:
+            detection = detect_columns(excel_path, MAIN_FIELDS, "main", self.mapping_profiles)
+        except Exception as e:
+            print(f"Ошибка определения столбцов {excel_path}: {e}")
+            return None
+        return detection["columns"] if detection["confident"] else None
+
     def save_dataframe(self, dataframe):
         """Сохраняет DataFrame в Excel-файл."""
         if dataframe is None:
             raise ValueError("Нет данных для сохранения.")
+        return self.save_tables(main_df=dataframe)
+
+    def save_tables(self, main_df=None, samples_df=None):
+        """Сохраняет основную таблицу и таблицу образцов в одну книгу Excel с подсветкой строк."""
+        if main_df is None and samples_df is None:
+            raise ValueError("Нет данных для сохранения.")
         result_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
             filetypes=[("Excel files", "*.xlsx")],
@@ -145,8 +196,39 @@ class FileManager:
         )
         if not result_path:
             return None
-        dataframe.to_excel(result_path, index=False, engine="openpyxl")
-        return result_path
+        return export_tables(result_path, main_df, samples_df)
+
+    def select_project(self, save=False):
+        """Запрашивает путь к файлу проекта: новому (save=True) или существующему."""
+        filetypes = [("Проект каталога", f"*{PROJECT_EXTENSION}")]
+        if save:
+            return filedialog.asksaveasfilename(defaultextension=PROJECT_EXTENSION, filetypes=filetypes,
+                                                title="Сохранить проект")
+        return filedialog.askopenfilename(filetypes=filetypes, title="Открыть проект")
+
+    def select_well(self, wells):
+        """Окно выбора скважины проекта; возвращает название или None."""
+        window = ctk.CTkToplevel()
+        window.title("Скважина")
+        window.geometry("320x170")
+        window.resizable(False, False)
+        window.transient()
+        window.grab_set()
+
+        ctk.CTkLabel(window, text="Выберите скважину:", font=("Helvetica", 12)).pack(pady=10)
+        combo = ctk.CTkComboBox(window, values=list(wells), width=220, state="readonly")
+        combo.set(wells[0])
+        combo.pack(pady=5)
+
+        result = [None]
+        def confirm():
+            result[0] = combo.get()
+            window.destroy()
+
+        ctk.CTkButton(window, text="Открыть", command=confirm, corner_radius=8).pack(pady=15)
+        window.protocol("WM_DELETE_WINDOW", window.destroy)
+        window.wait_window()
+        return result[0]
 
     def save_catalog(self):
         """Запрашивает путь для сохранения каталога в формате .docx."""
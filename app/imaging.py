@@ -0,0 +1,250 @@
+import io  # Работа с потоками байтов
+import os  # Модуль для работы с файлами
+import threading  # Модуль для синхронизации потоков
+from collections import OrderedDict  # Кэш с вытеснением давно не используемых
+from PIL import Image  # Работа с изображениями
+
+try:
+    from PIL import ImageCms  # Управление цветом (нужна сборка Pillow с LittleCMS)
+except ImportError:
+    ImageCms = None
+
+# Сканы керна бывают 300–600 Мп; это доверенные файлы, поэтому поднимаем защитный порог Pillow
+if Image.MAX_IMAGE_PIXELS is not None:
+    Image.MAX_IMAGE_PIXELS = max(Image.MAX_IMAGE_PIXELS, 1_000_000_000)
+
+# Изображения больше этого числа пикселей считаются «гигантскими»
+LARGE_IMAGE_PIXELS = 50_000_000
+# Файлы больше этого размера не читаются в память заранее, а декодируются с диска полосами
+PREFETCH_MAX_BYTES = 64 * 1024 * 1024
+# Высота полосы при потоковом чтении (строк исходного изображения)
+BAND_ROWS = 512
+# Гигантские файлы, которые нельзя читать полосами, декодируются по одному, чтобы не исчерпать память
+_large_decode_slots = threading.BoundedSemaphore(1)
+
+# Объём кэша декодированных фото в памяти (байт пикселей)
+PHOTO_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_photo_cache = OrderedDict()
+_photo_cache_bytes = 0
+_photo_cache_lock = threading.Lock()
+
+# Тег EXIF с ориентацией снимка и соответствующие преобразования
+EXIF_ORIENTATION = 0x0112
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+# Цветовое пространство ICC-профиля -> режим изображения, к которому он применим
+_ICC_MODES = {"RGB": "RGB", "CMYK": "CMYK", "GRAY": "L"}
+_SRGB_PROFILE = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")) if ImageCms is not None else None
+
+# Бит на пиксель для «сырых» режимов, в которых stride может быть не указан
+_RAW_BITS = {
+    "1": 1, "L": 8, "P": 8, "I;16": 16, "I;16B": 16,
+    "RGB": 24, "BGR": 24, "RGBA": 32, "BGRA": 32, "RGBX": 32, "BGRX": 32, "CMYK": 32,
+}
+
+
+def _open(source):
+    """Открывает изображение из пути, байтов или файлового объекта (без декодирования)."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif hasattr(source, "seek"):
+        source.seek(0)
+    return Image.open(source)
+
+
+def _reduce_factor(size, max_size):
+    """Целый коэффициент уменьшения, после которого изображение не меньше max_size."""
+    width, height = size
+    max_width, max_height = max_size
+    factors = []
+    if max_width:
+        factors.append(width // max_width)
+    if max_height:
+        factors.append(height // max_height)
+    return max(1, min(factors)) if factors else 1
+
+
+def _raw_band_tiles(img, band_top, band_bottom):
+    """Возвращает куски файла для строк [band_top, band_bottom) или None, если формат нельзя читать полосами.
+
+    Каждый кусок — (смещение в файле, размер в байтах, (x0, y0, x1, y1) в полосе, rawmode, stride, ориентация).
+    """
+    tiles = []
+    for tile in img.tile:
+        codec, extents, offset, args = tile[0], tile[1], tile[2], tile[3]
+        if codec != "raw":
+            return None
+        x0, y0, x1, y1 = extents
+        if isinstance(args, str):
+            args = (args,)
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        orientation = args[2] if len(args) > 2 else 1
+        if not stride:
+            if rawmode not in _RAW_BITS:
+                return None
+            stride = (_RAW_BITS[rawmode] * (x1 - x0) + 7) // 8
+        row0, row1 = max(y0, band_top), min(y1, band_bottom)
+        if row0 >= row1:
+            continue
+        if orientation < 0:  # Строки хранятся снизу вверх (BMP)
+            band_offset = offset + (y1 - row1) * stride
+        else:
+            band_offset = offset + (row0 - y0) * stride
+        tiles.append((band_offset, (row1 - row0) * stride, (x0, row0 - band_top, x1, row1 - band_top),
+                      rawmode, stride, orientation))
+    return tiles
+
+
+def iter_bands(source, band_rows=BAND_ROWS):
+    """Отдаёт изображение горизонтальными полосами, читая с диска только байты строк текущей полосы.
+
+    Работает для несжатых форматов (BMP, TIFF без сжатия); для остальных возвращает None.
+    """
+    img = _open(source)
+    if img.mode == "P" or _raw_band_tiles(img, 0, 1) is None:
+        return None
+    width, height = img.size
+
+    def bands():
+        for band_top in range(0, height, band_rows):
+            band_bottom = min(height, band_top + band_rows)
+            band = Image.new(img.mode, (width, band_bottom - band_top))
+            for offset, length, (x0, y0, x1, y1), rawmode, stride, orientation in \
+                    _raw_band_tiles(img, band_top, band_bottom):
+                img.fp.seek(offset)
+                part = Image.frombytes(img.mode, (x1 - x0, y1 - y0), img.fp.read(length),
+                                       "raw", rawmode, stride, orientation)
+                band.paste(part, (x0, y0))
+            yield band
+        img.close()
+
+    return bands()
+
+
+def _work_mode(mode):
+    """Режим, в котором изображение уменьшается до цветокоррекции (CMYK и оттенки серого сохраняются для ICC)."""
+    return mode if mode in ("RGB", "CMYK", "L") else "RGB"
+
+
+def _decode_reduced(img, source, max_size):
+    """Декодирует изображение с уменьшением не ниже max_size; результат в режиме _work_mode."""
+    factor = _reduce_factor(img.size, max_size)
+    mode = _work_mode(img.mode)
+
+    if img.format == "JPEG":
+        width, height = img.size
+        img.draft(mode, (max(1, width // factor), max(1, height // factor)))
+        img = img.convert(mode)
+        factor = _reduce_factor(img.size, max_size)
+        return img.reduce(factor) if factor > 1 else img
+
+    if factor > 1:
+        bands = iter_bands(source)
+        if bands is not None:
+            width, height = img.size
+            reduced = Image.new(mode, ((width + factor - 1) // factor, (height + factor - 1) // factor))
+            out_top = 0
+            carry = None  # Остаток строк, не кратный коэффициенту, переносим в следующую полосу
+            for band in bands:
+                band = band.convert(mode)
+                if carry is not None:
+                    merged = Image.new(mode, (width, carry.height + band.height))
+                    merged.paste(carry, (0, 0))
+                    merged.paste(band, (0, carry.height))
+                    band = merged
+                usable = band.height - band.height % factor
+                if usable:
+                    part = band.crop((0, 0, width, usable)).reduce(factor)
+                    reduced.paste(part, (0, out_top))
+                    out_top += part.height
+                carry = band.crop((0, usable, width, band.height)) if usable < band.height else None
+            if carry is not None:
+                reduced.paste(carry.reduce(factor), (0, out_top))
+            return reduced
+
+    if img.width * img.height > LARGE_IMAGE_PIXELS:
+        with _large_decode_slots:
+            img = img.convert(mode)
+            return img.reduce(factor) if factor > 1 else img
+    img = img.convert(mode)
+    return img.reduce(factor) if factor > 1 else img
+
+
+def _to_srgb(img, icc_profile):
+    """Переводит изображение в sRGB по встроенному ICC-профилю; без профиля — простое преобразование в RGB."""
+    if icc_profile and ImageCms is not None:
+        try:
+            source_profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            color_space = source_profile.profile.xcolor_space.strip()
+            if _ICC_MODES.get(color_space) == img.mode:
+                return ImageCms.profileToProfile(img, source_profile, _SRGB_PROFILE, outputMode="RGB")
+        except (ImageCms.PyCMSError, OSError) as e:
+            print(f"Ошибка применения ICC-профиля: {e}")
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def load_reduced(source, max_size=(None, None)):
+    """Загружает изображение, уменьшенное не ниже max_size=(ширина, высота), с ограниченным расходом памяти.
+
+    JPEG уменьшается при декодировании (draft). Несжатые BMP/TIFF читаются полосами,
+    каждая полоса уменьшается целым коэффициентом, поэтому в памяти одновременно
+    только полоса и уменьшенный результат. Остальные гигантские файлы декодируются
+    целиком, но не более одного одновременно.
+
+    Результат нормализован: поворот по EXIF применён, цвета переведены в sRGB по
+    встроенному ICC-профилю, режим — RGB. max_size задаётся для уже повёрнутого фото.
+    """
+    img = _open(source)
+    orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    icc_profile = img.info.get("icc_profile")
+    if orientation in (5, 6, 7, 8):  # Повороты на 90°: ширина и высота меняются местами
+        max_size = (max_size[1], max_size[0])
+
+    img = _to_srgb(_decode_reduced(img, source, max_size), icc_profile)
+    method = _ORIENTATION_TRANSPOSE.get(orientation)
+    return img.transpose(method) if method is not None else img
+
+
+def load_photo(path, max_size=(None, None), data=None):
+    """Общий загрузчик фото: нормализованное уменьшенное изображение (см. load_reduced) с кэшем в памяти.
+
+    Ключ кэша — путь, размер и дата изменения файла и max_size, поэтому каждое фото
+    декодируется один раз за сеанс. data — уже прочитанные байты файла (необязательно).
+    Возвращаемое изображение общее для всех вызывающих: его нельзя изменять на месте.
+    """
+    global _photo_cache_bytes
+    stat = os.stat(path)
+    key = (str(path), stat.st_size, stat.st_mtime_ns, tuple(max_size))
+    with _photo_cache_lock:
+        img = _photo_cache.get(key)
+        if img is not None:
+            _photo_cache.move_to_end(key)
+            return img
+
+    img = load_reduced(data if data is not None else path, max_size)
+
+    size = img.width * img.height * len(img.getbands())
+    with _photo_cache_lock:
+        if key not in _photo_cache and size <= PHOTO_CACHE_MAX_BYTES:
+            _photo_cache[key] = img
+            _photo_cache_bytes += size
+            while _photo_cache_bytes > PHOTO_CACHE_MAX_BYTES:
+                _, evicted = _photo_cache.popitem(last=False)
+                _photo_cache_bytes -= evicted.width * evicted.height * len(evicted.getbands())
+    return img
+
+
+def clear_photo_cache():
+    """Очищает кэш декодированных фото."""
+    global _photo_cache_bytes
+    with _photo_cache_lock:
+        _photo_cache.clear()
+        _photo_cache_bytes = 0
@@ -0,0 +1,64 @@
+import math  # Модуль для математических функций
+import numpy as np  # Дробная часть номеров для массивов
+
+
+def number_offset(sample_num):
+    """Смещение образца от верха коробки по его номеру, м: дробная часть номера (для 3.15 это 0.15 м).
+
+    Принимает число или массив номеров.
+    """
+    return sample_num - np.floor(sample_num)
+
+
+class BoxLayout:
+    def __init__(self, box_number, top_depth, bottom_depth, core_count=1, box_length=1.0):
+        """Описывает раскладку керна в коробке: число колонок, длину коробки и интервалы глубин колонок."""
+        self.box_number = box_number
+        self.top_depth = round(float(top_depth), 3)  # Округляем: глубины могут храниться во float32
+        self.bottom_depth = round(float(bottom_depth), 3)
+        self.core_count = max(1, int(core_count))
+        self.box_length = round(float(box_length), 3) if box_length and box_length > 0 else 1.0
+        self.columns = self._split_columns()
+
+    def _split_columns(self):
+        """Делит интервал коробки на колонки: керн укладывается подряд, по box_length метров в колонку."""
+        columns = []
+        for i in range(self.core_count):
+            col_top = min(self.top_depth + i * self.box_length, self.bottom_depth)
+            col_bottom = min(self.top_depth + (i + 1) * self.box_length, self.bottom_depth)
+            columns.append((round(col_top, 3), round(col_bottom, 3)))
+        return columns
+
+    @property
+    def capacity(self):
+        """Вместимость коробки в метрах (все колонки)."""
+        return self.core_count * self.box_length
+
+    def locate_offset(self, offset):
+        """Возвращает (номер колонки, доля высоты колонки) для смещения в метрах от верха коробки."""
+        offset = min(max(float(offset), 0.0), self.capacity)
+        column = min(int(offset // self.box_length), self.core_count - 1)
+        fraction = (offset - column * self.box_length) / self.box_length
+        return column, min(max(fraction, 0.0), 1.0)
+
+    def locate_depth(self, depth):
+        """Возвращает (номер колонки, доля высоты колонки) для абсолютной глубины."""
+        return self.locate_offset(float(depth) - self.top_depth)
+
+    def locate_sample(self, sample_num):
+        """Положение образца по его номеру: дробная часть номера — расстояние от верха коробки в метрах."""
+        return self.locate_offset(number_offset(float(sample_num)))
+
+    def locate_placed(self, sample_num, offset=None):
+        """Положение образца по смещению от верха коробки по глубине (м); без смещения (None/NaN) — по номеру."""
+        if offset is None or math.isnan(float(offset)):
+            return self.locate_sample(sample_num)
+        return self.locate_offset(offset)
+
+    def column_center(self, column, width):
+        """Горизонтальный центр колонки на изображении шириной width пикселей."""
+        return width * (2 * column + 1) / (2 * self.core_count)
+
+    def column_labels(self):
+        """Подписи интервалов колонок для таблицы каталога."""
+        return [f"[{top}-{bottom}]" for top, bottom in self.columns]
@@ -1,9 +1,13 @@
+import multiprocessing
 import customtkinter as ctk
 from app.ui import AppUI
 from app.file_manager import FileManager
 from app.utils import resource_path  # Импортируем resource_path
+from app.workspace import cleanup_stale_workspaces
 
 def main():
+    # Убираем временные файлы сборок, оставшиеся после аварийного завершения
+    cleanup_stale_workspaces()
     root = ctk.CTk()
 
     # Устанавливаем иконку для окна
@@ -20,4 +24,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Нужно для процессов сборки томов в собранном .exe
     main()
\ No newline at end of file
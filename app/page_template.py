@@ -0,0 +1,128 @@
+import copy  # Глубокое копирование XML страницы
+import math  # Модуль для математических функций
+from docx.image.image import Image as DocxImage  # Разбор картинки (размеры, SHA1) без создания части документа
+from docx.opc.constants import RELATIONSHIP_TYPE as RT  # Тип связи с картинкой
+from docx.oxml import parse_xml  # Разбор XML для вставки в документ
+from docx.oxml.shape import CT_Inline  # Встроенный рисунок Word
+from docx.enum.text import WD_LINE_SPACING
+from docx.shared import Inches, Pt, Twips
+from app.depth_scale import vector_scale_xml
+
+# Высота строки подписей исследований (точная, не зависит от стиля документа)
+LABEL_LINE = Pt(13.8)
+# Примерное число символов в строке подписи в столбце исследований шириной 4 дюйма (для переносов)
+LABEL_CHARS_PER_LINE = 50
+
+
+def stack_labels(offsets, line_counts, line_height=LABEL_LINE):
+    """Отступы сверху (spacing before) для подписей, идущих в ячейке одна за другой.
+
+    offsets — желаемое положение центра первой строки каждой подписи от верха ячейки,
+    line_counts — число строк подписей. Подпись ставится точно на своё место, а если
+    оно занято предыдущей подписью — сразу под ней. Все величины в EMU.
+    """
+    spacings = []
+    position = 0  # Низ уже размещённых подписей
+    for offset, lines in zip(offsets, line_counts):
+        top = max(position, round(offset - line_height / 2))
+        spacings.append(top - position)
+        position = top + lines * line_height
+    return spacings
+
+
+class BoxPageTemplate:
+    def __init__(self, doc, column_widths, rows=4, style='Table Grid'):
+        """Шаблон страницы коробки: разрыв страницы и таблица строятся один раз, далее копируются.
+
+        Построение таблицы через python-docx (стиль, ширины по ячейкам) и вставка
+        картинок (поиск свободного id по всему документу, SHA1 всех картинок) дорожают
+        с каждой страницей. Шаблон копирует готовый XML страницы, а id фигур и связи
+        с картинками ведёт сам, поэтому документ получается тем же, а время на
+        страницу не зависит от числа коробок.
+
+        Все фигуры документа после создания шаблона должны добавляться через него.
+        """
+        self.doc = doc
+        self.part = doc.part
+
+        # Прототипы строятся теми же вызовами python-docx, что и раньше, и убираются из документа
+        break_paragraph = doc.add_page_break()
+        table = doc.add_table(rows=rows, cols=len(column_widths), style=style)
+        for column, width in zip(table.columns, column_widths):
+            for cell in column.cells:
+                cell.width = Inches(width)
+        self._break_proto = copy.deepcopy(break_paragraph._p)
+        self._table_proto = copy.deepcopy(table._tbl)
+        body = doc.element.body
+        body.remove(break_paragraph._p)
+        body.remove(table._tbl)
+
+        self._next_shape_id = self.part.next_id
+        # SHA1 -> часть картинки: картинки, уже бывшие в документе, не дублируются (как в python-docx)
+        self._image_parts = {image_part.sha1: image_part for image_part in self.part.package.image_parts}
+        self._images = {}  # SHA1 -> (rId, картинка) уже связанных с документом картинок
+
+    def add_page(self):
+        """Добавляет в конец документа разрыв страницы и копию таблицы; возвращает ячейки (w:tc) по строкам."""
+        body = self.doc.element.body
+        body._insert_p(copy.deepcopy(self._break_proto))
+        tbl = body._insert_tbl(copy.deepcopy(self._table_proto))
+        return [tr.tc_lst for tr in tbl.tr_lst]
+
+    @staticmethod
+    def set_text(tc, text):
+        """Заменяет содержимое ячейки текстом (как cell.text: "\\n" — перенос строки, "\\t" — табуляция)."""
+        tc.clear_content()
+        tc.add_p().add_r().text = text
+
+    def next_id(self):
+        """Следующий свободный id фигуры документа."""
+        shape_id = self._next_shape_id
+        self._next_shape_id += 1
+        return shape_id
+
+    def _image(self, image_descriptor):
+        """Возвращает (rId, картинка) для пути или потока; одинаковые картинки хранятся в документе один раз."""
+        image = DocxImage.from_file(image_descriptor)
+        cached = self._images.get(image.sha1)
+        if cached is not None:
+            return cached
+        image_part = self._image_parts.get(image.sha1)
+        if image_part is None:
+            image_part = self.part.package.image_parts._add_image_part(image)
+            self._image_parts[image.sha1] = image_part
+        cached = self._images[image.sha1] = (self.part.relate_to(image_part, RT.IMAGE), image_part.image)
+        return cached
+
+    def add_picture(self, p, image_descriptor, height):
+        """Добавляет в абзац p картинку заданной высоты (ширина — по пропорциям)."""
+        rId, image = self._image(image_descriptor)
+        cx, cy = image.scaled_dimensions(None, height)
+        inline = CT_Inline.new_pic_inline(self.next_id(), rId, image.filename, cx, cy)
+        p.add_r().add_drawing(inline)
+
+    @staticmethod
+    def add_positioned_labels(tc, labels):
+        """Заполняет ячейку подписями, каждая на своей высоте от верха ячейки.
+
+        labels — список (положение в EMU, текст) в порядке сверху вниз. Положение задаётся
+        отступом абзаца перед подписью и точной высотой строки, без пустых абзацев.
+        """
+        tc.clear_content()
+        if not labels:
+            tc.add_p()
+            return
+        line_counts = [max(1, math.ceil(len(text) / LABEL_CHARS_PER_LINE)) for _, text in labels]
+        spacings = stack_labels([offset for offset, _ in labels], line_counts)
+        for (_, text), spacing in zip(labels, spacings):
+            p = tc.add_p()
+            pPr = p.get_or_add_pPr()
+            pPr.spacing_before = Twips(round(spacing / Twips(1)))
+            pPr.spacing_after = 0
+            pPr.spacing_line = LABEL_LINE
+            pPr.spacing_lineRule = WD_LINE_SPACING.EXACTLY
+            p.add_r().text = text
+
+    def add_vector_scale(self, p, ticks, height):
+        """Добавляет в абзац p векторную шкалу глубин (см. depth_scale.py)."""
+        p.add_r().append(parse_xml(vector_scale_xml(ticks, height, self.next_id())))
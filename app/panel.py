@@ -0,0 +1,43 @@
+import functools  # Кэш подготовленных частей панели
+from PIL import Image  # Работа с изображениями
+from app.utils import resource_path
+
+# Промежуток между частями панели, пиксели (в Word картинки в строке стоят вплотную)
+PANEL_GAP_PX = 0
+# Начальное снижение качества JPEG панели относительно профиля: шкалы на белом фоне добавляют
+# к фото ~15 % объёма, при 150 dpi на 5 единиц ниже панель уже не больше отдельного фото
+PANEL_QUALITY_DROP = 5
+
+
+@functools.lru_cache(maxsize=16)
+def panel_component(name, height_px):
+    """Статичная картинка из resources (линейка, масштаб), уменьшенная до высоты height_px.
+
+    Готовится один раз на размер и затем только копируется в панели коробок.
+    """
+    with Image.open(resource_path(f'resources/{name}')) as img:
+        img = img.convert('RGB')
+        width = max(1, round(img.width * height_px / img.height))
+        return img.resize((width, height_px), Image.Resampling.LANCZOS)
+
+
+def fit_height(img, height_px):
+    """Изображение ровно высотой height_px (ширина — по пропорциям)."""
+    if img.height == height_px:
+        return img
+    width = max(1, round(img.width * height_px / img.height))
+    return img.resize((width, height_px), Image.Resampling.LANCZOS)
+
+
+def compose_panel(parts, height_px, gap=PANEL_GAP_PX):
+    """Склеивает части панели слева направо в одно изображение высотой height_px.
+
+    Части ниже панели выравниваются по низу, как картинки в строке Word.
+    """
+    panel = Image.new('RGB', (sum(part.width for part in parts) + gap * max(0, len(parts) - 1), height_px),
+                      (255, 255, 255))
+    x = 0
+    for part in parts:
+        panel.paste(part, (x, height_px - part.height))
+        x += part.width + gap
+    return panel
@@ -0,0 +1,165 @@
+import os  # Модуль для работы с файлами и папками
+import queue  # Потокобезопасная очередь событий
+import re  # Модуль для регулярных выражений
+import threading  # Модуль для фонового потока
+from pathlib import Path  # Работа с путями
+
+# Допустимые расширения фотографий
+VALID_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+# Имя фото: <скважина>_<коробка>[_uf].<расширение>, например "скв.77_12_uf.JPG"
+PHOTO_NAME_PATTERN = re.compile(r"^(.+?)_(\d+)(_uf)?\.(jpg|jpeg|png|tif|tiff|bmp)$", re.IGNORECASE)
+
+
+def box_key(box):
+    """Приводит номер коробки к строке, как в имени файла (5, 5.0 и "5" дают "5")."""
+    try:
+        value = float(box)
+        if value.is_integer():
+            return str(int(value))
+    except (TypeError, ValueError):
+        pass
+    return str(box)
+
+
+def parse_photo_name(file_name):
+    """Разбирает имя фото: возвращает (номер коробки, признак УФ, название скважины) или None."""
+    match = PHOTO_NAME_PATTERN.match(file_name)
+    if not match:
+        return None
+    well_name = match.group(1).replace("скв.", "").strip()
+    return match.group(2), match.group(3) is not None, well_name
+
+
+class PhotoIndex:
+    def __init__(self, images_folder):
+        """Индекс фотографий папки: номер коробки -> пути к обычному и УФ-фото."""
+        self.images_folder = Path(images_folder).resolve()
+        self.entries = {}  # (коробка, уф) -> отсортированный список путей
+        self.files = {}  # имя файла -> (mtime_ns, размер)
+
+    def scan(self):
+        """Снимок папки: имя файла -> (mtime_ns, размер) для всех фото."""
+        snapshot = {}
+        with os.scandir(self.images_folder) as it:
+            for entry in it:
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in VALID_EXTENSIONS:
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def build(self):
+        """Полностью строит индекс по текущему содержимому папки."""
+        self.entries = {}
+        self.files = self.scan()
+        for name in self.files:
+            self._add(name)
+        return self
+
+    def restore(self, files):
+        """Строит индекс по сохранённому снимку папки (имя файла -> (mtime_ns, размер)) без сканирования."""
+        self.entries = {}
+        self.files = dict(files)
+        for name in self.files:
+            self._add(name)
+        return self
+
+    def _add(self, name):
+        parsed = parse_photo_name(name)
+        if parsed is None:
+            return None
+        box, uf, _ = parsed
+        paths = self.entries.setdefault((box, uf), [])
+        path = str(self.images_folder / name)
+        if path not in paths:
+            paths.append(path)
+            paths.sort()
+        return box
+
+    def _remove(self, name):
+        parsed = parse_photo_name(name)
+        if parsed is None:
+            return None
+        box, uf, _ = parsed
+        paths = self.entries.get((box, uf), [])
+        path = str(self.images_folder / name)
+        if path in paths:
+            paths.remove(path)
+        if not paths:
+            self.entries.pop((box, uf), None)
+        return box
+
+    def refresh(self, snapshot=None):
+        """Обновляет индекс по новому снимку папки; возвращает номера коробок, чьи фото появились, изменились или исчезли."""
+        if snapshot is None:
+            snapshot = self.scan()
+        changed_boxes = set()
+        for name in self.files.keys() - snapshot.keys():
+            changed_boxes.add(self._remove(name))
+        for name in snapshot.keys() - self.files.keys():
+            changed_boxes.add(self._add(name))
+        for name in snapshot.keys() & self.files.keys():
+            if snapshot[name] != self.files[name]:
+                parsed = parse_photo_name(name)
+                changed_boxes.add(parsed[0] if parsed else None)
+        self.files = snapshot
+        changed_boxes.discard(None)
+        return changed_boxes
+
+    def find(self, box, uf=False):
+        """Возвращает путь к фото коробки (или УФ-фото) либо None."""
+        paths = self.entries.get((box_key(box), uf))
+        return paths[0] if paths else None
+
+    def all_files(self):
+        """Возвращает пути ко всем фото папки."""
+        return [(self.images_folder / name).resolve() for name in sorted(self.files)]
+
+
+class PhotoFolderWatcher:
+    def __init__(self, photo_index, interval=2.0):
+        """Следит за папкой с фото опросом (работает на любых дисках, включая сетевые).
+
+        Фоновый поток раз в interval секунд обновляет индекс и кладёт множества изменённых
+        коробок в очередь; забирать их нужно из главного потока методом get_changes.
+        """
+        self.photo_index = photo_index
+        self.interval = interval
+        self.changes = queue.Queue()
+        self.lock = threading.Lock()  # Защищает индекс от одновременного чтения и обновления
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запускает фоновый опрос папки."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="photo-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Останавливает опрос папки."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                snapshot = self.photo_index.scan()  # Медленное чтение папки — вне блокировки
+                with self.lock:
+                    changed_boxes = self.photo_index.refresh(snapshot)
+            except OSError as e:
+                print(f"Ошибка опроса папки с фото: {e}")
+                continue
+            if changed_boxes:
+                self.changes.put(changed_boxes)
+
+    def get_changes(self):
+        """Забирает из очереди все накопленные изменения; возвращает множество номеров коробок."""
+        changed_boxes = set()
+        while True:
+            try:
+                changed_boxes |= self.changes.get_nowait()
+            except queue.Empty:
+                return changed_boxes
@@ -0,0 +1,65 @@
+import os  # Модуль для работы с системными параметрами
+import threading  # Модуль для синхронизации потоков
+from collections import deque  # Очередь для окна заданий
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor  # Пулы потоков
+
+
+def run_pipeline(items, read, render, prefetch=4, workers=None, io_threads=2):
+    """Конвейер «чтение → обработка → запись» с перекрытием ввода-вывода и вычислений.
+
+    read(item) выполняется в пуле потоков ввода-вывода, render(item, data) — в пуле
+    обработчиков. Результаты отдаются вызывающему (единственному писателю) в исходном
+    порядке. Одновременно в работе не больше prefetch + workers заданий, поэтому
+    расход памяти не растёт с числом элементов.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(1, prefetch + workers)
+    stopped = threading.Event()  # Выставляется, если писатель прекратил чтение результатов
+
+    with ThreadPoolExecutor(max_workers=max(1, io_threads), thread_name_prefix="catalog-io") as io_pool, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-render") as render_pool:
+
+        def start(item):
+            result = Future()
+
+            def finish(value=None, error=None):
+                # Задание могло быть отменено писателем — тогда результат уже не нужен
+                try:
+                    if error is not None:
+                        result.set_exception(error)
+                    else:
+                        result.set_result(value)
+                except InvalidStateError:
+                    pass
+
+            def on_rendered(render_future):
+                try:
+                    finish(render_future.result())
+                except BaseException as e:
+                    finish(error=e)
+
+            def on_read(read_future):
+                if stopped.is_set():
+                    result.cancel()
+                    return
+                try:
+                    data = read_future.result()
+                    render_pool.submit(render, item, data).add_done_callback(on_rendered)
+                except BaseException as e:
+                    finish(error=e)
+
+            io_pool.submit(read, item).add_done_callback(on_read)
+            return result
+
+        window = deque()  # Ограниченная очередь заданий в работе
+        try:
+            for item in items:
+                window.append(start(item))
+                if len(window) >= max_in_flight:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+        finally:
+            stopped.set()
+            for future in window:
+                future.cancel()
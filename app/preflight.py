@@ -0,0 +1,247 @@
+import io  # Работа с потоками байтов
+import os  # Модуль для работы с файлами
+import time  # Замер времени
+import zlib  # Сжатие, как при сохранении .docx
+from concurrent.futures import ThreadPoolExecutor  # Параллельное чтение заголовков фото
+from functools import lru_cache  # Калибровка выполняется один раз на профиль
+import numpy as np
+import pandas as pd
+from PIL import Image  # Чтение заголовков фото
+from app.box_index import placement_issues
+from app.encoding import DEFAULT_PROFILE
+from app.excel_export import recovery_percents
+from app.imaging import EXIF_ORIENTATION
+from app.volumes import estimate_job_bytes
+
+# Размер синтетического кадра для калибровки (ширина, высота)
+CALIBRATION_SIZE = (1200, 1600)
+# Время записи одной страницы коробки в документ (копия шаблона, текст, ссылки на картинки), с
+PAGE_WRITE_SECONDS = 0.005
+# Потоки чтения заголовков фото (сетевые диски отвечают медленно, процессор почти не нужен)
+HEADER_THREADS = 8
+# Допуск при сравнении интервала коробки с её вместимостью и соседними коробками, м
+INTERVAL_TOLERANCE_M = 0.01
+# Фото ниже этой доли размера на странице считается низкого разрешения
+LOW_RESOLUTION_SHARE = 0.5
+
+
+def _best_time(action, repeats=3):
+    """Наименьшее время из нескольких запусков (меньше влияние фоновой нагрузки)."""
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+@lru_cache(maxsize=None)
+def calibrate(profile):
+    """Измеряет на этом компьютере стоимость этапов сборки в секундах на пиксель.
+
+    Синтетический кадр кодируется в JPEG и декодируется целиком и с уменьшением 1/8
+    (draft): разница даёт стоимость пикселя на выходе декодера, уменьшенное
+    декодирование — стоимость разбора файла на пиксель исходника. Отдельно
+    измеряются масштабирование, кодирование профилем и сжатие при сохранении.
+    """
+    width, height = CALIBRATION_SIZE
+    rng = np.random.default_rng(0)
+    # Плавный градиент с шумом: сжимается примерно как фото керна
+    gradient = np.linspace(0, 200, width * height, dtype=np.float32).reshape(height, width)
+    pixels = gradient[:, :, None] + rng.normal(0, 12, (height, width, 3))
+    img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+    source = io.BytesIO()
+    img.save(source, format="JPEG", quality=92)
+    data = source.getvalue()
+    pixel_count = width * height
+
+    def decode(scale):
+        with Image.open(io.BytesIO(data)) as photo:
+            if scale > 1:
+                photo.draft("RGB", (width // scale, height // scale))
+            photo.load()
+
+    full = _best_time(lambda: decode(1)) / pixel_count
+    parse = _best_time(lambda: decode(8)) / pixel_count
+    resize = _best_time(lambda: img.resize((width // 2, height // 2), Image.Resampling.LANCZOS)) / pixel_count
+    half = img.resize((width // 2, height // 2))
+    encode = _best_time(lambda: profile.save_at(half, profile.quality)) / (half.width * half.height)
+    payload = os.urandom(1024 * 1024)  # JPEG внутри .docx почти не сжимается
+    save = _best_time(lambda: zlib.compress(payload, 6)) / len(payload)
+    return {
+        "parse": parse,  # Разбор JPEG, с на пиксель исходника
+        "decode": max(full - parse, 0.0),  # Выход декодера, с на декодированный пиксель
+        "resize": resize,  # Масштабирование, с на пиксель до уменьшения
+        "encode": encode,  # Кодирование профилем, с на пиксель результата
+        "save": save,  # Сжатие при сохранении документа, с на байт
+    }
+
+
+def read_photo_header(path):
+    """Размер (с учётом поворота по EXIF), режим и формат фото по заголовку файла, без декодирования.
+
+    Возвращает словарь или текст ошибки, если файла нет или он не читается.
+    """
+    if not os.path.exists(path):
+        return f"файл не найден: {path}"
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if img.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                width, height = height, width
+            return {"size": (width, height), "mode": img.mode, "format": img.format,
+                    "bytes": os.path.getsize(path)}
+    except Exception as e:
+        return f"файл не читается как изображение ({e})"
+
+
+def estimate_photo_seconds(header, profile, height_inches, costs):
+    """Время обработки одного фото по его размеру и калибровке: разбор, декодирование, масштаб, кодирование."""
+    width, height = header["size"]
+    source_pixels = width * height
+    target_height = profile.pixel_height(height_inches)
+    factor = max(1, height // target_height)
+    if header["format"] == "JPEG":
+        # draft уменьшает при декодировании в 1, 2, 4 или 8 раз
+        scale = 1
+        while scale * 2 <= min(factor, 8):
+            scale *= 2
+        decoded_height = height // scale
+        decoded = source_pixels / (scale * scale)
+        seconds = source_pixels * costs["parse"] + decoded * costs["decode"]
+    else:
+        decoded_height = height
+        decoded = source_pixels
+        seconds = source_pixels * (costs["parse"] + costs["decode"])
+    # Остаток уменьшения — целым коэффициентом (reduce), затем масштабирование до размера на странице
+    remaining = max(1, decoded_height // target_height)
+    reduced = decoded / (remaining * remaining)
+    target_width, target_height = profile.target_size((width, height), height_inches)
+    return seconds + reduced * costs["resize"] + target_width * target_height * costs["encode"]
+
+
+def interval_issues(layouts):
+    """Сообщения по коробкам об интервалах от/до: пропуски, обратный порядок, переполнение и перекрытия."""
+    issues = {}
+    previous = None
+    for layout in sorted(layouts, key=lambda item: (np.nan_to_num(item.top_depth, nan=np.inf), item.box_number)):
+        messages = issues.setdefault(layout.box_number, [])
+        top, bottom = layout.top_depth, layout.bottom_depth
+        if np.isnan(top) or np.isnan(bottom):
+            messages.append("не указан интервал от/до")
+            continue
+        length = bottom - top
+        if length <= 0:
+            messages.append(f"подошва {bottom} м не глубже кровли {top} м")
+        elif length > layout.capacity + INTERVAL_TOLERANCE_M:
+            messages.append(f"интервал {length:.2f} м больше вместимости коробки {layout.capacity:.2f} м")
+        if previous is not None and top < previous.bottom_depth - INTERVAL_TOLERANCE_M:
+            messages.append(f"интервал перекрывается с коробкой {previous.box_number} "
+                            f"({previous.top_depth}–{previous.bottom_depth} м)")
+        if previous is None or bottom > previous.bottom_depth:
+            previous = layout
+    return {box: messages for box, messages in issues.items() if messages}
+
+
+def run_preflight(processor, photo_height_inches, samples_df=None, profile=None, workers=None):
+    """Пробная сборка каталога без декодирования фото и записи документа.
+
+    Выполняет те же шаги, что и create_catalog, до обработки фото: проверку столбцов,
+    раскладку коробок, размещение образцов по глубине (см. collect_box_jobs). У фото
+    читаются только заголовки (размер, режим). Возвращает словарь с замечаниями по
+    коробкам, общими замечаниями, числом страниц и оценками времени и размера каталога.
+    """
+    profile = profile or DEFAULT_PROFILE
+    started = time.perf_counter()
+    report = {"general": [], "issues": {}, "boxes": 0, "pages": 0, "photos": 0,
+              "estimated_bytes": 0, "estimated_seconds": 0.0}
+    try:
+        jobs = processor.collect_box_jobs(samples_df)
+    except (ValueError, KeyError) as e:
+        report["general"].append(f"Каталог не собрать: {e}")
+        report["elapsed"] = time.perf_counter() - started
+        return report
+
+    def add(box, message):
+        report["issues"].setdefault(box, []).append(message)
+
+    for box, messages in interval_issues([job["layout"] for job in jobs]).items():
+        for message in messages:
+            add(box, message)
+
+    df = processor.current_dataframe
+    if "Вынос" in df.columns:
+        over = df[recovery_percents(df["Вынос"]).to_numpy() > 100]
+        for box in over[processor.box_column].unique():
+            add(box, "вынос больше 100 %")
+
+    placed = processor.sample_placement
+    if placed is not None:
+        box_column = processor.box_column
+        depth_outside = placed["Коробка по глубине"].isna() & placed["Глубина"].notna() \
+            if "Глубина" in placed.columns else False
+        for box, group in placed[placed["Расхождение"] | depth_outside].groupby(box_column):
+            for message in placement_issues(group, box_column):
+                add(box, message)
+        known = {float(job["box_number"]) for job in jobs}
+        number_boxes = pd.to_numeric(placed[box_column], errors="coerce")
+        unknown = placed[~number_boxes.isin(known) & placed["Коробка по глубине"].isna()]
+        if not unknown.empty:
+            report["general"].append(f"Образцов вне коробок таблицы: {len(unknown)} "
+                                     f"(например, {unknown['Номер образца'].iloc[0]}), на фото они не попадут.")
+        duplicates = placed["Номер образца"][placed["Номер образца"].duplicated()]
+        if not duplicates.empty:
+            report["general"].append(f"Номера образцов повторяются: {', '.join(map(str, duplicates.unique()[:10]))}.")
+
+    paths = [(job, key, job[key]) for job in jobs for key in ("photo_path", "photo_uf_path")]
+    with ThreadPoolExecutor(max_workers=HEADER_THREADS, thread_name_prefix="preflight") as pool:
+        headers = list(pool.map(lambda item: read_photo_header(item[2]) if item[2] else None, paths))
+
+    costs = calibrate(profile)
+    target_height = profile.pixel_height(photo_height_inches)
+    render_seconds = 0.0
+    names = {"photo_path": "фото", "photo_uf_path": "УФ-фото"}
+    for (job, key, path), header in zip(paths, headers):
+        if header is None:
+            add(job["box_number"], f"нет {names[key]}")
+        elif isinstance(header, str):
+            add(job["box_number"], f"{names[key]}: {header}")
+        else:
+            report["photos"] += 1
+            render_seconds += estimate_photo_seconds(header, profile, photo_height_inches, costs)
+            if header["size"][1] < target_height * LOW_RESOLUTION_SHARE:
+                add(job["box_number"], f"{names[key]} низкого разрешения: высота {header['size'][1]} пикс. "
+                                       f"при {target_height} пикс. на странице")
+
+    report["boxes"] = len(jobs)
+    report["pages"] = len(jobs) + 1 if jobs else 0  # Вступительная страница и по странице на коробку
+    report["estimated_bytes"] = sum(estimate_job_bytes(job, profile, photo_height_inches) for job in jobs)
+    # Фото обрабатываются параллельно, запись страниц и сохранение документа — в одном потоке
+    workers = workers or os.cpu_count() or 1
+    report["estimated_seconds"] = (max(render_seconds / workers, len(jobs) * PAGE_WRITE_SECONDS)
+                                   + report["estimated_bytes"] * costs["save"])
+    report["issues"] = {box: report["issues"][box] for box in sorted(report["issues"])}
+    report["elapsed"] = time.perf_counter() - started
+    return report
+
+
+def format_report(report, limit=200):
+    """Текст отчёта пробной сборки: итоги, общие замечания и замечания по коробкам (не больше limit строк)."""
+    lines = [
+        f"Коробок: {report['boxes']}, страниц: {report['pages']}, фото: {report['photos']}",
+        f"Ожидаемый размер каталога: {report['estimated_bytes'] / 1024 / 1024:.1f} МБ",
+        f"Ожидаемое время сборки: {report['estimated_seconds']:.1f} с",
+        f"Проверка заняла {report['elapsed']:.1f} с",
+    ]
+    if report["general"]:
+        lines += [""] + report["general"]
+    if report["issues"]:
+        lines += ["", f"Замечания по коробкам ({len(report['issues'])}):"]
+        box_lines = [f"Коробка {box}: {message}" for box, messages in report["issues"].items() for message in messages]
+        lines += box_lines[:limit]
+        if len(box_lines) > limit:
+            lines.append(f"... и ещё {len(box_lines) - limit}")
+    else:
+        lines += ["", "Замечаний по коробкам нет."]
+    return "\n".join(lines)
@@ -0,0 +1,359 @@
+import hashlib  # Ключи кэша обработанных фото
+import json  # Строки таблицы и настройки скважины
+import os  # Модуль для работы с файлами
+import sqlite3  # Встроенная база данных проекта
+import threading  # Синхронизация потоков
+import time  # Время сохранения скважины
+import pandas as pd
+from app.photo_index import parse_photo_name
+from app.samples_loader import NO_RESEARCH
+from app.utils import expand_dtypes
+
+# Версия схемы базы; при изменении таблиц увеличивается
+SCHEMA_VERSION = 3
+# Расширение файла проекта
+PROJECT_EXTENSION = ".ccproj"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wells (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    excel_path TEXT NOT NULL,
+    images_folder TEXT NOT NULL,
+    samples_path TEXT,
+    excel_mtime_ns INTEGER,
+    samples_mtime_ns INTEGER,
+    settings TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    saved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boxes (
+    well_id INTEGER NOT NULL REFERENCES wells(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    box INTEGER,
+    top REAL,
+    bottom REAL,
+    photo TEXT,
+    photo_uf TEXT,
+    row TEXT NOT NULL,
+    PRIMARY KEY (well_id, position)
+);
+CREATE INDEX IF NOT EXISTS boxes_by_box ON boxes (well_id, box);
+CREATE INDEX IF NOT EXISTS boxes_by_depth ON boxes (well_id, top, bottom);
+CREATE TABLE IF NOT EXISTS samples (
+    well_id INTEGER NOT NULL REFERENCES wells(id) ON DELETE CASCADE,
+    number REAL NOT NULL,
+    box INTEGER,
+    depth REAL,
+    research TEXT,
+    PRIMARY KEY (well_id, number)
+);
+CREATE INDEX IF NOT EXISTS samples_by_box ON samples (well_id, box);
+CREATE INDEX IF NOT EXISTS samples_by_depth ON samples (well_id, depth);
+CREATE TABLE IF NOT EXISTS research (
+    well_id INTEGER NOT NULL REFERENCES wells(id) ON DELETE CASCADE,
+    number REAL NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (well_id, number, type)
+);
+CREATE INDEX IF NOT EXISTS research_by_type ON research (type, well_id);
+CREATE TABLE IF NOT EXISTS photos (
+    well_id INTEGER NOT NULL REFERENCES wells(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    box TEXT,
+    uf INTEGER NOT NULL DEFAULT 0,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    cache_key TEXT NOT NULL,
+    PRIMARY KEY (well_id, name)
+);
+CREATE INDEX IF NOT EXISTS photos_by_box ON photos (well_id, box, uf);
+"""
+
+# Обратный индекс "вид исследования -> образцы" (глубина может быть пустой, поэтому она не входит в ключ)
+POSTINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sample_postings (
+    type TEXT NOT NULL,
+    depth REAL,
+    well_id INTEGER NOT NULL REFERENCES wells(id) ON DELETE CASCADE,
+    number REAL NOT NULL,
+    box INTEGER,
+    PRIMARY KEY (type, well_id, number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sample_postings_by_depth ON sample_postings (type, depth);
+CREATE INDEX IF NOT EXISTS sample_postings_by_well ON sample_postings (well_id);
+"""
+SCHEMA += POSTINGS_SCHEMA
+
+# Заполнение таблиц, добавленных в новых версиях схемы, для проектов старых версий
+MIGRATIONS = {
+    2: """
+INSERT OR IGNORE INTO sample_postings (type, depth, well_id, number, box)
+SELECT r.type, s.depth, r.well_id, r.number, s.box FROM research r
+JOIN samples s ON s.well_id = r.well_id AND s.number = r.number;
+""",
+    # Глубина была частью ключа и молча отбрасывала образцы без глубины: таблица строится заново
+    3: "DROP TABLE sample_postings;" + POSTINGS_SCHEMA + """
+INSERT INTO sample_postings (type, depth, well_id, number, box)
+SELECT r.type, s.depth, r.well_id, r.number, s.box FROM research r
+JOIN samples s ON s.well_id = r.well_id AND s.number = r.number;
+""",
+}
+
+
+def photo_cache_key(name, mtime_ns, size):
+    """Ключ обработанных копий фото: меняется, когда меняется сам файл."""
+    return hashlib.sha1(f"{name}:{mtime_ns}:{size}".encode("utf-8")).hexdigest()[:16]
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+def _number(value):
+    """Число для записи в базу: None вместо NaN."""
+    return None if value is None or pd.isna(value) else float(value)
+
+
+class ProjectStore:
+    def __init__(self, path):
+        """Файл проекта (SQLite): скважины, коробки с интервалами, образцы, исследования и фото.
+
+        Обработанные таблицы сохраняются целиком, поэтому повторное открытие скважины
+        не требует чтения Excel и сканирования папки. По коробке, интервалу глубин и
+        виду исследования ищут индексированные запросы.
+        """
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        with self.connection:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise ValueError(f"Проект {self.path} создан более новой версией программы.")
+            self.connection.executescript(SCHEMA)
+            if version:
+                for target in range(version + 1, SCHEMA_VERSION + 1):
+                    self.connection.executescript(MIGRATIONS[target])
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        """Закрывает файл проекта."""
+        with self._lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def wells(self):
+        """Названия скважин проекта."""
+        return [name for (name,) in self._query("SELECT name FROM wells ORDER BY name")]
+
+    def well_info(self, name):
+        """Пути, настройки и время сохранения скважины или None."""
+        rows = self._query(
+            "SELECT excel_path, images_folder, samples_path, excel_mtime_ns, samples_mtime_ns, settings, saved_at "
+            "FROM wells WHERE name = ?", (name,))
+        if not rows:
+            return None
+        excel_path, images_folder, samples_path, excel_mtime, samples_mtime, settings, saved_at = rows[0]
+        return {"excel_path": excel_path, "images_folder": images_folder, "samples_path": samples_path,
+                "excel_mtime_ns": excel_mtime, "samples_mtime_ns": samples_mtime,
+                "settings": json.loads(settings), "saved_at": saved_at}
+
+    def is_stale(self, name):
+        """Исходные таблицы скважины изменились после сохранения (нужна повторная обработка)."""
+        info = self.well_info(name)
+        if info is None:
+            return True
+        if _mtime_ns(info["excel_path"]) != info["excel_mtime_ns"]:
+            return True
+        return info["samples_path"] is not None and _mtime_ns(info["samples_path"]) != info["samples_mtime_ns"]
+
+    def save_well(self, name, processor, samples_df=None, samples_path=None):
+        """Сохраняет (заменяет) скважину: обработанную таблицу, образцы и индекс фото DataProcessor."""
+        df = processor.current_dataframe
+        if df is None:
+            raise ValueError("Нет данных для сохранения в проект.")
+        settings = {
+            "box_column": processor.box_column,
+            "start_column": processor.start_column,
+            "end_column": processor.end_column,
+            "measurements_column": processor.measurements_column,
+            "core_count_column": processor.core_count_column,
+            "box_length_column": processor.box_length_column,
+        }
+        cols_lower = {str(col).lower(): col for col in df.columns}
+        start_col = cols_lower.get(processor.start_column.lower())
+        end_col = cols_lower.get(processor.end_column.lower())
+        # to_json приводит типы numpy и NaN к JSON; строки таблицы хранятся в исходном порядке
+        # (float32 предварительно возвращается к округлённому float64, иначе в JSON попадут "хвосты")
+        expanded = expand_dtypes(df)
+        rows = json.loads(expanded.to_json(orient="values", double_precision=15))
+        tops = expanded[start_col] if start_col is not None else [None] * len(df)
+        bottoms = expanded[end_col] if end_col is not None else [None] * len(df)
+        box_rows = [
+            (position, json.dumps(label.item() if hasattr(label, "item") else label),
+             None if pd.isna(box) else int(box), _number(top), _number(bottom),
+             None if pd.isna(photo) else str(photo), None if pd.isna(photo_uf) else str(photo_uf),
+             json.dumps(values, ensure_ascii=False))
+            for position, (label, box, top, bottom, photo, photo_uf, values) in enumerate(zip(
+                df.index, df[processor.box_column], tops, bottoms, df["Фото"], df["Фото УФ"], rows))
+        ]
+
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM wells WHERE name = ?", (name,))
+            cursor = self.connection.execute(
+                "INSERT INTO wells (name, excel_path, images_folder, samples_path, excel_mtime_ns, samples_mtime_ns, "
+                "settings, columns, saved_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, str(processor.excel_path), str(processor.images_folder),
+                 str(samples_path) if samples_path else None, _mtime_ns(processor.excel_path),
+                 _mtime_ns(samples_path), json.dumps(settings, ensure_ascii=False),
+                 json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()], ensure_ascii=False),
+                 time.time()))
+            well_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO boxes (well_id, position, label, box, top, bottom, photo, photo_uf, row) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(well_id,) + row for row in box_rows])
+            if samples_df is not None:
+                self._insert_samples(well_id, samples_df, processor.box_column)
+            if processor.photo_index is not None:
+                self._insert_photos(well_id, processor.photo_index.files)
+
+    def _insert_samples(self, well_id, samples_df, box_column):
+        sample_rows = []
+        research_rows = []
+        posting_rows = []
+        for box, number, depth, research in zip(samples_df[box_column], samples_df["Номер образца"],
+                                                samples_df["Глубина"], samples_df["Исследования"]):
+            number, box, depth = float(number), None if pd.isna(box) else int(box), _number(depth)
+            sample_rows.append((well_id, number, box, depth, research))
+            for item in str(research).split(", "):
+                if item == NO_RESEARCH:
+                    continue
+                research_rows.append((well_id, number, item))
+                posting_rows.append((item, depth, well_id, number, box))
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO samples (well_id, number, box, depth, research) VALUES (?, ?, ?, ?, ?)",
+            sample_rows)
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO research (well_id, number, type) VALUES (?, ?, ?)", research_rows)
+        # Обратный индекс: вид исследования -> образцы по глубине во всех скважинах (см. sample_search.py)
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO sample_postings (type, depth, well_id, number, box) VALUES (?, ?, ?, ?, ?)",
+            posting_rows)
+
+    def _insert_photos(self, well_id, files):
+        photo_rows = []
+        for file_name, (mtime_ns, size) in files.items():
+            parsed = parse_photo_name(file_name)
+            box, uf = (parsed[0], int(parsed[1])) if parsed else (None, 0)
+            photo_rows.append((well_id, file_name, box, uf, mtime_ns, size,
+                               photo_cache_key(file_name, mtime_ns, size)))
+        self.connection.executemany(
+            "INSERT INTO photos (well_id, name, box, uf, mtime_ns, size, cache_key) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            photo_rows)
+
+    def delete_well(self, name):
+        """Удаляет скважину со всеми коробками, образцами и фото."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM wells WHERE name = ?", (name,))
+
+    def _well_id(self, name):
+        rows = self._query("SELECT id FROM wells WHERE name = ?", (name,))
+        if not rows:
+            raise KeyError(f"Скважина '{name}' отсутствует в проекте.")
+        return rows[0][0]
+
+    def load_table(self, name):
+        """Обработанная таблица скважины в исходном порядке строк и с исходными метками."""
+        well_id = self._well_id(name)
+        columns = json.loads(self._query("SELECT columns FROM wells WHERE id = ?", (well_id,))[0][0])
+        rows = self._query("SELECT label, row FROM boxes WHERE well_id = ? ORDER BY position", (well_id,))
+        df = pd.DataFrame([json.loads(row) for _, row in rows], columns=[name for name, _ in columns],
+                          index=[json.loads(label) for label, _ in rows])
+        # Столбцы, которые были object (например, "Вынос"), не превращаем в строковый тип pandas
+        for name, dtype in columns:
+            if dtype == "object":
+                df[name] = df[name].astype(object)
+        return df
+
+    def load_samples(self, name, box_column):
+        """Таблица образцов скважины в виде результата load_samples или None, если образцов нет."""
+        rows = self._query(
+            "SELECT box, number, depth, research FROM samples WHERE well_id = ? ORDER BY number",
+            (self._well_id(name),))
+        if not rows:
+            return None
+        return pd.DataFrame({
+            box_column: pd.Series([row[0] for row in rows], dtype="int64"),
+            "Номер образца": pd.Series([row[1] for row in rows], dtype="float64"),
+            "Глубина": pd.Series([row[2] for row in rows], dtype="float64"),
+            "Исследования": [row[3] for row in rows],
+        })
+
+    def load_photo_files(self, name):
+        """Снимок папки с фото на момент сохранения: имя файла -> (mtime_ns, размер)."""
+        rows = self._query("SELECT name, mtime_ns, size FROM photos WHERE well_id = ?", (self._well_id(name),))
+        return {file_name: (mtime_ns, size) for file_name, mtime_ns, size in rows}
+
+    def photo_cache_keys(self, name, box):
+        """Ключи кэша обработанных фото коробки: (имя файла, признак УФ, ключ)."""
+        rows = self._query("SELECT name, uf, cache_key FROM photos WHERE well_id = ? AND box = ? ORDER BY name",
+                           (self._well_id(name), str(box)))
+        return [(file_name, bool(uf), key) for file_name, uf, key in rows]
+
+    def boxes_in_range(self, name, top, bottom):
+        """Коробки скважины, интервал которых пересекается с [top, bottom]: (коробка, от, до, фото, УФ-фото)."""
+        return self._query(
+            "SELECT box, top, bottom, photo, photo_uf FROM boxes "
+            "WHERE well_id = ? AND top <= ? AND bottom >= ? ORDER BY top",
+            (self._well_id(name), bottom, top))
+
+    def samples_in_box(self, name, box):
+        """Образцы коробки: (номер, глубина, исследования)."""
+        return self._query(
+            "SELECT number, depth, research FROM samples WHERE well_id = ? AND box = ? ORDER BY number",
+            (self._well_id(name), int(box)))
+
+    def samples_by_research(self, research, top=None, bottom=None, wells=None):
+        """Образцы с заданным исследованием (или любым из списка) во всех или выбранных скважинах.
+
+        Ищет по обратному индексу sample_postings: для каждого вида исследования —
+        один просмотр диапазона глубин [top, bottom]. Возвращает список
+        (скважина, номер образца, коробка, глубина, вид исследования), упорядоченный по скважине и глубине.
+        """
+        types = [research] if isinstance(research, str) else list(research)
+        sql = ("SELECT w.name, p.number, p.box, p.depth, p.type FROM sample_postings p "
+               f"JOIN wells w ON w.id = p.well_id WHERE p.type IN ({', '.join('?' * len(types))})")
+        params = list(types)
+        if top is not None:
+            sql += " AND p.depth >= ?"
+            params.append(top)
+        if bottom is not None:
+            sql += " AND p.depth <= ?"
+            params.append(bottom)
+        if wells:
+            sql += f" AND w.name IN ({', '.join('?' * len(wells))})"
+            params.extend(wells)
+        return self._query(sql + " ORDER BY w.name, p.depth, p.number", params)
+
+    def research_types(self):
+        """Все виды исследований проекта."""
+        # Перебор различных значений по индексу скачками, без просмотра всех записей
+        return [item for (item,) in self._query(
+            "WITH RECURSIVE t(type) AS (SELECT MIN(type) FROM sample_postings UNION ALL "
+            "SELECT (SELECT MIN(type) FROM sample_postings WHERE type > t.type) FROM t WHERE t.type IS NOT NULL) "
+            "SELECT type FROM t WHERE type IS NOT NULL")]
@@ -0,0 +1,38 @@
+import pandas as pd  # Библиотека для работы с таблицами
+
+
+class SampleIndex:
+    def __init__(self, samples_df, box_column, number_column="Номер образца", depth_column="Глубина"):
+        """Индекс образцов: группировка по коробкам, отсортированная по номеру.
+
+        Строится один раз; выборка образцов коробки — поиск в словаре. Положение
+        образцов по глубине и выход за интервалы коробок проверяет BoxDepthIndex
+        (см. box_index.py).
+        """
+        self.box_column = box_column
+        self.number_column = number_column
+        self.depth_column = depth_column
+        self.columns = list(samples_df.columns)
+
+        # Нормализуем номера коробок к int, строки без коробки в индекс не попадают
+        boxes = pd.to_numeric(samples_df[box_column], errors="coerce")
+        valid = samples_df[boxes.notna()]
+        box_keys = boxes[boxes.notna()].astype(int)
+
+        # Один проход сортировки и группировки вместо фильтрации всей таблицы для каждой коробки
+        sorted_df = valid.assign(_box_key=box_keys).sort_values(by=["_box_key", number_column], kind="mergesort")
+        self.by_box = {
+            int(box): group.drop(columns="_box_key")
+            for box, group in sorted_df.groupby("_box_key", sort=False)
+        }
+        self._empty = samples_df.iloc[0:0]
+
+    def __len__(self):
+        return sum(len(group) for group in self.by_box.values())
+
+    def for_box(self, box_number):
+        """Возвращает образцы коробки, отсортированные по номеру (пустой DataFrame, если их нет)."""
+        try:
+            return self.by_box.get(int(box_number), self._empty)
+        except (TypeError, ValueError):
+            return self._empty
@@ -0,0 +1,60 @@
+import argparse  # Разбор аргументов командной строки
+import sys  # Код завершения
+import time  # Время выполнения запроса
+import pandas as pd
+from app.project_store import ProjectStore
+
+# Столбцы результата поиска
+RESULT_COLUMNS = ["Скважина", "Номер образца", "Коробка", "Глубина", "Исследование"]
+
+
+def search_samples(store, research, top=None, bottom=None, wells=None):
+    """Ищет образцы с видом исследования (или любым из списка) в интервале глубин по всем скважинам проекта.
+
+    Индекс пополняется при каждом сохранении скважины в проект (ProjectStore.save_well),
+    поэтому запрос не открывает таблицы образцов скважин. Возвращает DataFrame RESULT_COLUMNS.
+    """
+    rows = store.samples_by_research(research, top, bottom, wells)
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def parse_depth(text):
+    """Глубина из строки ввода: пусто -> None, допускаются запятая и пробелы ("2 300,5")."""
+    text = str(text).replace(" ", "").replace(" ", "").replace(",", ".")
+    return float(text) if text else None
+
+
+def main(argv=None):
+    """Поиск образцов из командной строки:
+
+    python -m app.sample_search проект.ccproj Пористость --from 2300 --to 2400
+    """
+    parser = argparse.ArgumentParser(description="Поиск образцов по виду исследования и глубине во всех скважинах проекта.")
+    parser.add_argument("project", help="Файл проекта (.ccproj)")
+    parser.add_argument("research", nargs="*", help="Вид исследования (несколько — любой из них)")
+    parser.add_argument("--from", dest="top", type=parse_depth, default=None, help="Глубина от, м")
+    parser.add_argument("--to", dest="bottom", type=parse_depth, default=None, help="Глубина до, м")
+    parser.add_argument("--well", action="append", default=None, help="Только указанные скважины")
+    parser.add_argument("--csv", default=None, help="Сохранить результат в CSV-файл")
+    args = parser.parse_args(argv)
+
+    with ProjectStore(args.project) as store:
+        if not args.research:
+            print("Виды исследований в проекте:")
+            for item in store.research_types():
+                print(f"  {item}")
+            return 0
+        start = time.perf_counter()
+        result = search_samples(store, args.research, args.top, args.bottom, args.well)
+        elapsed = (time.perf_counter() - start) * 1000
+
+    if args.csv:
+        result.to_csv(args.csv, index=False, sep=";", encoding="utf-8-sig")
+    else:
+        print(result.to_string(index=False) if not result.empty else "Образцы не найдены.")
+    print(f"Найдено образцов: {len(result)}, скважин: {result['Скважина'].nunique()} ({elapsed:.1f} мс)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
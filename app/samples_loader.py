@@ -0,0 +1,166 @@
+import math  # Проверка конечности чисел
+import os  # Модуль для работы с файлами
+import numpy as np
+import pandas as pd
+from app.table_loaders import iter_table_chunks
+
+# Сколько строк таблицы образцов обрабатывается за раз
+SAMPLES_CHUNK_ROWS = 20_000
+# Строки, которые pandas по умолчанию считает пустыми значениями (как при pd.read_excel)
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+NO_RESEARCH = "Нет исследований"
+
+
+def _header_names(values):
+    """Имена столбцов, как их даёт pandas: пустые -> "Unnamed: i", повторы -> "имя.1", "имя.2"."""
+    names = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or value == "" else value
+        if isinstance(name, float) and name.is_integer():
+            name = int(name)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        if count:
+            name = f"{name}.{count}"
+        names.append(name)
+    return names
+
+
+def _normalize_cell(value):
+    """Значение ячейки как после pd.read_excel: пустые строки и маркеры NA -> None, целые float -> int."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def _iter_xlsx_rows(path):
+    """Строки первого листа .xlsx в режиме только для чтения (файл не загружается целиком)."""
+    from openpyxl import load_workbook  # Тот же движок, что использует pandas для .xlsx
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield [_normalize_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_sample_chunks(path, chunk_rows=SAMPLES_CHUNK_ROWS):
+    """Отдаёт таблицу образцов порциями DataFrame по chunk_rows строк.
+
+    .xlsx читается потоково через openpyxl; остальные форматы — загрузчиком по
+    расширению (см. table_loaders.py): CSV и LAS по частям, Parquet по группам строк,
+    .xls (старый формат без потокового чтения) целиком с делением на порции.
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension != ".xlsx":
+        for chunk in iter_table_chunks(path, chunk_rows):
+            yield chunk.astype(object).where(chunk.notna(), None)
+        return
+
+    header = None
+    rows = []
+    for row in _iter_xlsx_rows(path):
+        if header is None:
+            if any(value is not None for value in row):  # Пустые строки до заголовка пропускаем
+                header = list(row)
+            continue
+        rows.append(row)
+        if len(rows) >= chunk_rows:
+            yield _rows_to_frame(header, rows)
+            rows = []
+    if header is not None and rows:
+        yield _rows_to_frame(header, rows)
+
+
+def _rows_to_frame(header, rows):
+    """Порция строк .xlsx в DataFrame; строки длиннее заголовка получают столбцы "Unnamed: i", как в pandas."""
+    width = max([len(header)] + [len(row) for row in rows])
+    names = _header_names(header + [None] * (width - len(header)))
+    return pd.DataFrame([row + [None] * (width - len(row)) for row in rows], columns=names, dtype=object)
+
+
+def _to_float(value):
+    """float(value) или NaN, если значение не преобразуется в число."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def load_samples(path, box_column, number_column=None, depth_column=None, chunk_rows=SAMPLES_CHUNK_ROWS):
+    """Потоково читает таблицу образцов и собирает по номеру образца коробку, глубину и исследования.
+
+    По умолчанию номер образца — 2-й столбец, глубина — 3-й; исследованиями считаются
+    остальные столбцы начиная с 4-го, отмеченные "+". Таблица обрабатывается порциями,
+    в памяти одновременно только порция и накопленный результат (по строке на образец).
+    Возвращает DataFrame [box_column, "Номер образца", "Глубина", "Исследования"], отсортированный по номеру.
+    """
+    boxes = {}
+    depths = {}
+    research = {}
+    research_columns = None
+    research_items = None
+
+    for chunk in iter_sample_chunks(path, chunk_rows):
+        if chunk.shape[1] < 3:
+            raise ValueError("Файл образцов должен содержать как минимум 3 столбца.")
+        columns = list(chunk.columns)
+        # Выбранные пользователем столбцы используем, если они есть в файле; иначе — по положению
+        numbers_raw = chunk[number_column] if number_column in chunk.columns else chunk.iloc[:, 1]
+        depths_raw = chunk[depth_column] if depth_column in chunk.columns else chunk.iloc[:, 2]
+        skip = {numbers_raw.name, depths_raw.name}
+        chunk_research = [column for column in columns[3:] if column not in skip]
+        if research_columns != chunk_research:
+            research_columns = chunk_research
+            # Название столбца может содержать ", " — делим так же, как при разборе строки исследований
+            research_items = [[item for item in str(column).split(", ") if item != NO_RESEARCH]
+                              for column in research_columns]
+
+        numbers = numbers_raw.map(_to_float).astype(float)
+        depth_values = depths_raw.map(lambda value: np.nan if value is None else _to_float(value)).astype(float)
+        # Строка пропускается, если номер не число, а также если глубина указана, но не число
+        valid = np.isfinite(numbers) & ~(depths_raw.notna() & depth_values.isna())
+        if not valid.any():
+            continue
+        numbers = numbers[valid]
+        depth_values = depth_values[valid].map(lambda value: round(value, 2) if pd.notna(value) else value)
+
+        first_depths = depth_values.groupby(numbers, sort=False).first()
+        for number, depth in first_depths.items():
+            if number not in boxes:
+                boxes[number] = int(number)
+                depths[number] = depth
+                research[number] = set()
+            elif pd.isna(depths[number]) and pd.notna(depth):
+                depths[number] = depth
+
+        if research_columns:
+            flags = chunk.loc[valid, research_columns].eq("+")
+            flags.columns = range(len(research_columns))
+            marked = flags.groupby(numbers, sort=False).any()
+            for number, row in zip(marked.index, marked.to_numpy()):
+                if row.any():
+                    items = research[number]
+                    for position in np.flatnonzero(row):
+                        items.update(research_items[position])
+
+    if not boxes:
+        return pd.DataFrame(columns=[box_column, "Номер образца", "Глубина", "Исследования"])
+    sample_numbers = sorted(boxes)
+    return pd.DataFrame({
+        box_column: pd.Series([boxes[number] for number in sample_numbers], dtype="int64"),
+        "Номер образца": pd.Series(sample_numbers, dtype="float64"),
+        "Глубина": pd.Series([depths[number] for number in sample_numbers], dtype="float64"),
+        "Исследования": [", ".join(sorted(research[number])) or NO_RESEARCH for number in sample_numbers],
+    })
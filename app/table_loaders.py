@@ -0,0 +1,245 @@
+import codecs  # Проверка кодировки текстовых файлов
+import os  # Модуль для работы с файлами
+from abc import ABC, abstractmethod  # Обязательные методы загрузчика
+import re  # Модуль для регулярных выражений
+import pandas as pd  # Библиотека для работы с таблицами
+
+try:
+    import pyarrow.parquet as pq  # Чтение Parquet и многопоточное чтение CSV (необязательный пакет)
+except ImportError:
+    pq = None
+
+# Сколько строк текстового файла просматривается для определения разделителя и десятичного знака
+SNIFF_LINES = 20
+# Сколько байт текстового файла проверяется при определении кодировки
+ENCODING_SAMPLE_BYTES = 1024 * 1024
+# Кодировки текстовых таблиц: UTF-8 (с BOM или без) и Windows-1251 (Excel в русской Windows)
+TEXT_ENCODINGS = ("utf-8-sig", "cp1251")
+
+
+class TableLoader(ABC):
+    """Загрузчик таблиц одного формата: вся таблица, заголовок с первыми строками и чтение порциями.
+
+    Новый формат подключается подклассом с extensions и регистрацией через register_loader;
+    подкласс без read или read_header нельзя создать, поэтому ошибка видна сразу при регистрации.
+    """
+    extensions = ()
+    description = ""
+
+    @abstractmethod
+    def read(self, path, dtypes=None):
+        """Вся таблица; dtypes — типы известных столбцов ({имя: тип}), отсутствующие в файле пропускаются."""
+
+    @abstractmethod
+    def read_header(self, path, nrows):
+        """Заголовок и первые nrows строк (для определения столбцов)."""
+
+    def iter_chunks(self, path, chunk_rows):
+        """Таблица порциями по chunk_rows строк; по умолчанию читается целиком и делится."""
+        df = self.read(path)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+class ExcelLoader(TableLoader):
+    extensions = (".xlsx", ".xls")
+    description = "Excel"
+
+    def read(self, path, dtypes=None):
+        return pd.read_excel(path)
+
+    def read_header(self, path, nrows):
+        return pd.read_excel(path, nrows=nrows)
+
+
+def detect_encoding(path):
+    """Кодировка текстового файла: utf-8-sig, если начало файла читается как UTF-8, иначе cp1251."""
+    with open(path, "rb") as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+    try:
+        # Пошаговый декодер не считает ошибкой символ, обрезанный на границе образца
+        codecs.getincrementaldecoder(TEXT_ENCODINGS[0])().decode(sample, final=False)
+        return TEXT_ENCODINGS[0]
+    except UnicodeDecodeError:
+        return TEXT_ENCODINGS[1]
+
+
+def sniff_csv(path):
+    """Разделитель (";", "\\t" или ","), десятичный знак ("," или ".") и кодировка текстовой таблицы.
+
+    Разделитель определяется по первой строке, десятичный знак — по первым строкам данных.
+    """
+    encoding = detect_encoding(path)
+    with open(path, encoding=encoding, errors="replace") as f:
+        lines = [line for _, line in zip(range(SNIFF_LINES), f)]
+    if not lines:
+        return ",", ".", encoding
+    sep = max((";", "\t", ","), key=lines[0].count)
+    # Выгрузки с разделителем ";" обычно пишут дробные числа через запятую ("2300,5")
+    decimal = "," if sep != "," and any(re.search(r"\d,\d", line) for line in lines[1:]) else "."
+    return sep, decimal, encoding
+
+
+class CsvLoader(TableLoader):
+    extensions = (".csv", ".txt", ".tsv")
+    description = "CSV"
+
+    def _options(self, path):
+        sep, decimal, encoding = sniff_csv(path)
+        return {"sep": sep, "decimal": decimal, "encoding": encoding}
+
+    def read(self, path, dtypes=None):
+        options = self._options(path)
+        if pq is not None and options["decimal"] == ".":
+            options["engine"] = "pyarrow"  # Многопоточный разбор; не поддерживает decimal=","
+        if dtypes:
+            header = pd.read_csv(path, nrows=0, sep=options["sep"], encoding=options["encoding"])
+            # Имена столбцов сравниваются без учёта регистра, как в DataProcessor
+            by_lower = {str(column).lower(): column for column in header.columns}
+            known = {by_lower[name.lower()]: dtype for name, dtype in dtypes.items() if name.lower() in by_lower}
+            try:
+                return pd.read_csv(path, dtype=known, **options)
+            except (ValueError, TypeError) as e:
+                # В числовом столбце встретился текст: читаем с определением типов
+                print(f"Типы столбцов {path} не совпали с ожидаемыми ({e}), читаем без них")
+        return pd.read_csv(path, **options)
+
+    def read_header(self, path, nrows):
+        return pd.read_csv(path, nrows=nrows, **self._options(path))
+
+    def iter_chunks(self, path, chunk_rows):
+        yield from pd.read_csv(path, chunksize=chunk_rows, **self._options(path))
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ValueError("Для чтения Parquet нужен пакет pyarrow (pip install pyarrow).")
+
+
+class ParquetLoader(TableLoader):
+    extensions = (".parquet", ".pq")
+    description = "Parquet"
+
+    def read(self, path, dtypes=None):
+        # Типы столбцов хранятся в самом файле, определять их не нужно
+        _require_pyarrow()
+        return pq.read_table(path).to_pandas()
+
+    def read_header(self, path, nrows):
+        _require_pyarrow()
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=max(1, nrows)):
+            return batch.to_pandas().head(nrows)
+        return parquet_file.schema_arrow.empty_table().to_pandas()
+
+    def iter_chunks(self, path, chunk_rows):
+        _require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+
+
+def las_layout(path, encoding="utf-8-sig"):
+    """Имена кривых (раздел ~C), значение NULL (раздел ~W) и номер строки начала данных (~A)."""
+    names = []
+    null = None
+    section = None
+    with open(path, encoding=encoding, errors="replace") as f:
+        for number, line in enumerate(f):
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            if stripped.startswith("~"):
+                section = stripped[1:2].upper()
+                if section == "A":
+                    return names, null, number + 1
+                continue
+            # Строка описания: "МНЕМОНИКА.ЕДИНИЦА  ЗНАЧЕНИЕ : ОПИСАНИЕ"
+            mnemonic, _, rest = stripped.partition(".")
+            if section == "C":
+                names.append(mnemonic.strip())
+            elif section == "W" and mnemonic.strip().upper() == "NULL":
+                value = rest.split(":")[0]
+                # Единица измерения стоит сразу после точки, значение — после пробела
+                data = value if value[:1].isspace() else value.partition(" ")[2]
+                try:
+                    null = float(data.strip())
+                except ValueError:
+                    null = None
+    raise ValueError(f"В файле {path} нет раздела данных ~A.")
+
+
+class LasLoader(TableLoader):
+    extensions = (".las",)
+    description = "LAS"
+
+    def _options(self, path):
+        encoding = detect_encoding(path)
+        names, null, data_start = las_layout(path, encoding)
+        if not names:
+            raise ValueError(f"В файле {path} нет описания столбцов (раздел ~C).")
+        return {"sep": r"\s+", "header": None, "names": names, "skiprows": data_start, "comment": "#",
+                "na_values": [null] if null is not None else None, "encoding": encoding}
+
+    def read(self, path, dtypes=None):
+        return pd.read_csv(path, **self._options(path))
+
+    def read_header(self, path, nrows):
+        return pd.read_csv(path, nrows=nrows, **self._options(path))
+
+    def iter_chunks(self, path, chunk_rows):
+        yield from pd.read_csv(path, chunksize=chunk_rows, **self._options(path))
+
+
+# Расширение -> загрузчик
+LOADERS = {}
+
+
+def register_loader(loader):
+    """Подключает загрузчик (экземпляр или класс) для его расширений, заменяя прежний загрузчик тех же расширений.
+
+    Класс с нереализованными read/read_header не создаётся: TypeError возникает здесь, а не при первом чтении.
+    """
+    if isinstance(loader, type):
+        loader = loader()
+    if not isinstance(loader, TableLoader):
+        raise TypeError(f"Загрузчик таблиц должен быть экземпляром TableLoader, получено: {loader!r}")
+    for extension in loader.extensions:
+        LOADERS[extension] = loader
+    return loader
+
+
+for _loader in (ExcelLoader(), CsvLoader(), ParquetLoader(), LasLoader()):
+    register_loader(_loader)
+
+
+def loader_for(path):
+    """Загрузчик по расширению файла."""
+    extension = os.path.splitext(str(path))[1].lower()
+    loader = LOADERS.get(extension)
+    if loader is None:
+        raise ValueError(f"Неподдерживаемый формат таблицы: {extension or 'файл без расширения'}")
+    return loader
+
+
+def read_table(path, dtypes=None):
+    """Читает таблицу любого подключённого формата (Excel, CSV, Parquet, LAS)."""
+    return loader_for(path).read(path, dtypes)
+
+
+def read_table_header(path, nrows):
+    """Читает только заголовок таблицы и первые nrows строк."""
+    return loader_for(path).read_header(path, nrows)
+
+
+def iter_table_chunks(path, chunk_rows):
+    """Отдаёт таблицу порциями DataFrame по chunk_rows строк."""
+    return loader_for(path).iter_chunks(path, chunk_rows)
+
+
+def table_filetypes():
+    """Типы файлов для диалогов выбора: все таблицы вместе, затем каждый формат отдельно."""
+    formats = {}
+    for extension, loader in LOADERS.items():
+        formats.setdefault(loader.description, []).append(f"*{extension}")
+    every = " ".join(pattern for patterns in formats.values() for pattern in patterns)
+    return [("Таблицы", every)] + [(name, " ".join(patterns)) for name, patterns in formats.items()]
@@ -0,0 +1,69 @@
+import hashlib  # Модуль для вычисления хэшей
+import os  # Модуль для работы с файлами и папками
+import tempfile  # Модуль для временных папок
+from pathlib import Path  # Работа с путями
+from PIL import Image  # Работа с изображениями
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=None, height=400):
+        """Кэш миниатюр страниц коробок на диске.
+
+        Ключ миниатюры зависит от раскладки коробки, номеров и положения образцов и размера/даты
+        изменения фото, поэтому после правки данных или замены фото миниатюра
+        перестраивается, а в остальных случаях читается с диска.
+        """
+        self.cache_dir = Path(cache_dir or os.path.join(tempfile.gettempdir(), "CoreCatalog", "thumbnails"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.height = height
+
+    def key(self, job):
+        """Вычисляет ключ миниатюры для задания коробки."""
+        layout = job["layout"]
+        parts = [
+            str(self.height),
+            str(job["box_number"]),
+            repr(layout.columns),
+            str(layout.box_length),
+        ]
+        samples = job.get("samples")
+        if samples is not None and not samples.empty:
+            parts.append(",".join(map(str, samples["Номер образца"].tolist())))
+            # Кружки ставятся по глубине (смещению от верха коробки), поэтому оно тоже входит в ключ
+            for column in ("Смещение, м", "Глубина"):
+                if column in samples.columns:
+                    parts.append(",".join(map(str, samples[column].tolist())))
+        for key in ("photo_path", "photo_uf_path"):
+            path = job.get(key)
+            if path and os.path.exists(path):
+                stat = os.stat(path)
+                parts.append(f"{path}|{stat.st_size}|{stat.st_mtime_ns}")
+            else:
+                parts.append("-")
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, job, render):
+        """Возвращает миниатюру из кэша или строит её функцией render(job, height) и сохраняет."""
+        path = self.cache_dir / f"{self.key(job)}.jpg"
+        if path.exists():
+            try:
+                with Image.open(path) as img:
+                    img.load()
+                    return img.copy()
+            except OSError:
+                pass  # Повреждённый файл кэша перестраиваем
+        img = render(job, self.height)
+        # Пишем во временный файл и переименовываем, чтобы параллельные потоки не видели недописанный файл
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, "JPEG", quality=80)
+        os.replace(tmp_path, path)
+        return img
+
+    def clear(self):
+        """Удаляет все миниатюры из кэша."""
+        for path in self.cache_dir.glob("*.jpg"):
+            try:
+                path.unlink()
+            except OSError as e:
+                print(f"Ошибка удаления миниатюры {path}: {e}")
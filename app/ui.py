@@ -5,10 +5,24 @@ from PIL import Image
 import os
 import platform
 import subprocess
-import re
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from app.utils import find_continuous_intervals, resource_path
+from app.utils import find_continuous_intervals, resource_path, recovery_percent, set_cell, expand_dtypes
 from app.data_processor import DataProcessor
+from app.thumbnails import ThumbnailCache
+from app.encoding import PROFILES, DEFAULT_PROFILE
+from app.samples_loader import load_samples
+from app.table_loaders import read_table
+from app.project_store import ProjectStore
+from app.sample_search import search_samples, parse_depth, RESULT_COLUMNS
+from app.preflight import format_report
+
+# Начиная с этого числа коробок каталог предлагается разбить на тома
+VOLUME_BOX_THRESHOLD = 500
+# Коробок (страниц) в одном томе
+BOXES_PER_VOLUME = 300
 
 class AppUI:
     def __init__(self, root, file_manager):
@@ -21,6 +35,7 @@ class AppUI:
         self.data_processor = None
         self.samples_file = None
         self.samples_dataframe = None  # DataFrame для образцов
+        self.project_store = None  # Открытый файл проекта (ProjectStore)
 
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
@@ -54,9 +69,9 @@ class AppUI:
         self.btn_create_catalog = CTkButton(self.top_frame, text="Создать каталог (Word)", command=self.create_catalog,
                                             corner_radius=8, font=("Helvetica", 12))
         self.btn_create_catalog.grid(row=1, column=0, padx=10, pady=10)
-        #self.btn_preview = CTkButton(self.top_frame, text="Предпросмотр", command=self.preview_catalog,
-        #                             corner_radius=8, font=("Helvetica", 12))
-        #self.btn_preview.grid(row=1, column=4, padx=10, pady=10)
+        self.btn_preview = CTkButton(self.top_frame, text="Предпросмотр", command=self.preview_catalog,
+                                     corner_radius=8, font=("Helvetica", 12))
+        self.btn_preview.grid(row=1, column=4, padx=10, pady=10)
         self.btn_convert_pdf = CTkButton(self.top_frame, text="Конвертировать в PDF", command=self.convert_to_pdf,
                                          corner_radius=8, font=("Helvetica", 12))
         self.btn_convert_pdf.grid(row=1, column=1, padx=10, pady=10)
@@ -69,6 +84,32 @@ class AppUI:
                                           corner_radius=8, font=("Helvetica", 12))
         self.clear_button.grid(row=1, column=3, pady=10, padx=10)
 
+        # Проект: сохранённые скважины открываются без повторной обработки
+        self.btn_save_project = CTkButton(self.top_frame, text="Сохранить в проект", command=self.save_project,
+                                          corner_radius=8, font=("Helvetica", 12))
+        self.btn_save_project.grid(row=2, column=0, padx=10, pady=10)
+        self.btn_open_project = CTkButton(self.top_frame, text="Открыть проект", command=self.open_project,
+                                          corner_radius=8, font=("Helvetica", 12))
+        self.btn_open_project.grid(row=2, column=1, padx=10, pady=10)
+        self.btn_search_samples = CTkButton(self.top_frame, text="Поиск образцов", command=self.open_sample_search,
+                                            corner_radius=8, font=("Helvetica", 12))
+        self.btn_search_samples.grid(row=2, column=2, padx=10, pady=10)
+
+        # Профиль кодирования фото каталога (стандарт, печать, почта)
+        self.profile_var = ctk.StringVar(value=DEFAULT_PROFILE.name)
+        self.profile_menu = ctk.CTkOptionMenu(self.top_frame, values=list(PROFILES), variable=self.profile_var,
+                                              corner_radius=8, font=("Helvetica", 12))
+        self.profile_menu.grid(row=1, column=5, padx=10, pady=10)
+        # Шкалы и фото коробки одной картинкой: меньше картинок для Word в больших каталогах
+        self.composite_var = ctk.BooleanVar(value=False)
+        self.chk_composite = CTkCheckBox(self.top_frame, text="Одна картинка на страницу", variable=self.composite_var,
+                                         font=("Helvetica", 12))
+        self.chk_composite.grid(row=2, column=3, padx=10, pady=10)
+        # Пробная сборка: проверки и оценка времени и размера без обработки фото
+        self.btn_dry_run = CTkButton(self.top_frame, text="Проверка (без сборки)", command=self.dry_run,
+                                     corner_radius=8, font=("Helvetica", 12))
+        self.btn_dry_run.grid(row=2, column=4, padx=10, pady=10)
+
         # Фрейм для вкладок
         self.tab_view = CTkTabview(self.main_frame, corner_radius=10)
         self.tab_view.pack(fill="both", expand=True)
@@ -93,9 +134,26 @@ class AppUI:
         self.last_images_folder = None
         self.last_samples_path = None
 
+        # Периодически подхватываем новые и изменённые фото из папки
+        self.root.after(2000, self.poll_photo_changes)
+
+    def poll_photo_changes(self):
+        """Применяет к таблице изменения в папке с фото и обновляет только затронутые строки."""
+        try:
+            if self.data_processor is not None and self.data_processor.get_current_dataframe() is not None:
+                affected = self.data_processor.apply_photo_changes()
+                if affected:
+                    self.refresh_tree_rows(affected)
+                    self.status_var.set(f"Обновлены фото для {len(affected)} строк")
+        except Exception as e:
+            print(f"Ошибка обновления фото: {e}")
+        self.root.after(2000, self.poll_photo_changes)
+
     def clear_data(self):
         response = messagebox.askyesno("Подтверждение", "Вы уверены, что хотите очистить все данные?")
         if response:
+            if self.data_processor is not None:
+                self.data_processor.stop_photo_watcher()
             self.data_processor = None
             self.last_excel_path = None
             self.last_images_folder = None
@@ -139,7 +197,11 @@ class AppUI:
         samples_path = self.file_manager.select_samples_file()
         if samples_path:
             self.last_samples_path = samples_path
-            self.samples_dataframe = pd.read_excel(samples_path)
+            self.samples_dataframe = None  # Таблица образцов читается при обработке (process_samples)
+            if self.data_processor and self.data_processor.get_current_dataframe() is not None:
+                self.samples_file = samples_path
+                self.process_samples()
+                self.update_project()
             self.status_var.set(f"Выбран файл с образцами: {os.path.basename(samples_path)}")
         else:
             self.status_var.set("Выбор файла с образцами отменён")
@@ -169,6 +231,9 @@ class AppUI:
 
             # Получаем выбранные столбцы из FileManager
             main_columns = self.file_manager.get_main_file_columns()
+            if not main_columns:
+                # Столбцы не выбирались: пробуем определить их по заголовку таблицы
+                main_columns = self.file_manager.detect_main_columns(self.last_excel_path)
             print(f"Выбранные столбцы: {main_columns}")
             if main_columns and len(main_columns) == 4:
                 box_column = main_columns[0]
@@ -185,6 +250,8 @@ class AppUI:
                 print("Используются столбцы по умолчанию")
 
             # Пересоздаём DataProcessor с текущими путями
+            if self.data_processor is not None:
+                self.data_processor.stop_photo_watcher()
             self.data_processor = DataProcessor(
                 self.last_excel_path,
                 self.last_images_folder,
@@ -196,6 +263,7 @@ class AppUI:
 
             # Пересчитываем основные данные
             df = self.data_processor.process_data()
+            self.data_processor.start_photo_watcher()
 
             # Отображаем основной DataFrame
             print(f"Столбцы в DataFrame: {list(df.columns)}")
@@ -206,6 +274,9 @@ class AppUI:
                 self.samples_file = self.last_samples_path  # Устанавливаем путь к файлу образцов
                 self.process_samples()  # Обрабатываем и отображаем данные образцов
 
+            # Если открыт проект, скважина сразу попадает в него (и в индекс поиска образцов)
+            self.update_project()
+
             self.status_var.set(f"Данные обработаны: {len(df)} строк")
 
         except Exception as e:
@@ -214,58 +285,38 @@ class AppUI:
             raise
 
     def process_samples(self):
-        """Обрабатывает данные образцов и создаёт DataFrame для второй вкладки."""
-        samples_df = pd.read_excel(self.samples_file, sheet_name=0)
-
-        if samples_df.shape[1] < 3:
-            raise ValueError("Файл образцов должен содержать как минимум 3 столбца.")
-
-        sample_numbers = samples_df.iloc[:, 1]  # 2-й столбец: номер образца
-        absolute_depths = samples_df.iloc[:, 2]  # 3-й столбец: абсолютная глубина
+        """Обрабатывает данные образцов и создаёт DataFrame для второй вкладки.
 
-        temp_data = []
+        Таблица читается потоково порциями (см. load_samples), поэтому большие реестры
+        образцов не загружаются в память целиком.
+        """
         # Получаем имя столбца для коробок из DataProcessor
         box_column = self.data_processor.box_column
-        for idx, (sample_num, abs_depth) in enumerate(zip(sample_numbers, absolute_depths)):
-            try:
-                sample_num = float(sample_num)
-                box_num = int(sample_num)  # Целая часть — номер коробки
-                research = []
-                for col in samples_df.columns[3:]:
-                    if samples_df.iloc[idx][col] == "+":
-                        research.append(str(col))
-                research_str = ", ".join(research) if research else "Нет исследований"
-                temp_data.append({
-                    box_column: box_num,  # Используем динамическое имя столбца
-                    "Номер образца": sample_num,
-                    "Глубина": round(float(abs_depth), 2) if pd.notna(abs_depth) else abs_depth,
-                    "Исследования": research_str
-                })
-            except (ValueError, TypeError):
-                continue
-
-        temp_df = pd.DataFrame(temp_data)
-        if not temp_df.empty:
-            grouped = temp_df.groupby("Номер образца").agg({
-                box_column: "first",  # Используем динамическое имя столбца
-                "Глубина": "first",
-                "Исследования": lambda x: ", ".join(sorted(set(
-                    item for sublist in x for item in sublist.split(", ") if item != "Нет исследований"
-                )))
-            }).reset_index()
-            grouped["Исследования"] = grouped["Исследования"].apply(
-                lambda x: x if x else "Нет исследований"
-            )
-            self.samples_dataframe = grouped[[box_column, "Номер образца", "Глубина", "Исследования"]]
-        else:
-            self.samples_dataframe = pd.DataFrame(columns=[box_column, "Номер образца", "Глубина", "Исследования"])
-
-        self.samples_dataframe = self.samples_dataframe.sort_values(by="Номер образца")
+        samples_columns = self.file_manager.get_samples_file_columns() or [None, None]
+        self.samples_dataframe = load_samples(
+            self.samples_file,
+            box_column,
+            number_column=samples_columns[0],
+            depth_column=samples_columns[1]
+        )
 
         if self.samples_dataframe.empty:
             messagebox.showwarning("Предупреждение", "Нет данных об образцах для отображения.")
             return
 
+        # Сверяем положение образцов по глубине (интервалы от/до коробок) с закодированным в номере
+        self.data_processor.build_sample_index(self.samples_dataframe)
+        placement_issues = self.data_processor.get_placement_issues()
+        if placement_issues:
+            shown = "\n".join(placement_issues[:10])
+            more = f"\n... и ещё {len(placement_issues) - 10}" if len(placement_issues) > 10 else ""
+            messagebox.showwarning("Положение образцов",
+                                   f"Образцы размещаются по глубине; расхождения с номером:\n{shown}{more}")
+
+        self.show_samples_tab()
+
+    def show_samples_tab(self):
+        """Создаёт (при необходимости) вкладку "Образцы" и показывает в ней таблицу образцов."""
         if "Образцы" not in self.tab_view._tab_dict:
             self.tab_samples = self.tab_view.add("Образцы")
             self.samples_table_frame = CTkFrame(self.tab_samples, corner_radius=10)
@@ -273,13 +324,157 @@ class AppUI:
 
         self.display_samples_dataframe(self.samples_dataframe)
 
+    def current_well_name(self):
+        """Название скважины текущих данных: по именам фото, иначе по имени Excel-файла."""
+        wells = self.data_processor.get_current_dataframe()["Скважина"].dropna()
+        if not wells.empty:
+            return str(wells.iloc[0])
+        return os.path.splitext(os.path.basename(str(self.data_processor.excel_path)))[0]
+
+    def save_project(self):
+        """Сохраняет обработанную скважину (таблица, образцы, индекс фото) в файл проекта."""
+        if not self.data_processor or self.data_processor.get_current_dataframe() is None:
+            messagebox.showerror("Ошибка", "Сначала обработайте данные.")
+            return
+        if self.project_store is None:
+            project_path = self.file_manager.select_project(save=True)
+            if not project_path:
+                return
+            self.project_store = ProjectStore(project_path)
+        well_name = self.current_well_name()
+        try:
+            self.project_store.save_well(well_name, self.data_processor, self.samples_dataframe,
+                                         self.last_samples_path if self.samples_dataframe is not None else None)
+            self.status_var.set(f"Скважина {well_name} сохранена в проект: {self.project_store.path}")
+        except Exception as e:
+            messagebox.showerror("Ошибка сохранения проекта", str(e))
+
+    def update_project(self):
+        """Сохраняет текущую скважину в открытый проект (без диалогов); ничего не делает, если проект не открыт."""
+        if self.project_store is None or self.data_processor is None:
+            return
+        try:
+            self.project_store.save_well(self.current_well_name(), self.data_processor, self.samples_dataframe,
+                                         self.last_samples_path if self.samples_dataframe is not None else None)
+        except Exception as e:
+            print(f"Ошибка сохранения скважины в проект: {e}")
+
+    def open_sample_search(self):
+        """Окно поиска образцов по виду исследования и интервалу глубин во всех скважинах проекта."""
+        if self.project_store is None:
+            messagebox.showerror("Ошибка", "Сначала откройте проект или сохраните скважину в проект.")
+            return
+        research_types = self.project_store.research_types()
+        if not research_types:
+            messagebox.showwarning("Предупреждение", "В проекте нет образцов с исследованиями.")
+            return
+
+        window = ctk.CTkToplevel(self.root)
+        window.title("Поиск образцов")
+        window.geometry("720x520")
+
+        form = CTkFrame(window, corner_radius=10)
+        form.pack(fill="x", padx=10, pady=10)
+        research_combo = ctk.CTkComboBox(form, values=research_types, width=200, state="readonly")
+        research_combo.set(research_types[0])
+        research_combo.grid(row=0, column=0, padx=5, pady=5)
+        top_entry = ctk.CTkEntry(form, width=100, placeholder_text="от, м")
+        top_entry.grid(row=0, column=1, padx=5, pady=5)
+        bottom_entry = ctk.CTkEntry(form, width=100, placeholder_text="до, м")
+        bottom_entry.grid(row=0, column=2, padx=5, pady=5)
+        result_var = ctk.StringVar(value="")
+        CTkLabel(window, textvariable=result_var, font=("Helvetica", 11)).pack(fill="x", padx=10)
+
+        tree_frame = CTkFrame(window, corner_radius=10)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        tree = ttk.Treeview(tree_frame, columns=RESULT_COLUMNS, show="headings")
+        for col in RESULT_COLUMNS:
+            tree.heading(col, text=col)
+            tree.column(col, width=130, anchor="w")
+        scrollbar_y = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar_y.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar_y.pack(side="right", fill="y")
+
+        def run_search():
+            try:
+                top = parse_depth(top_entry.get())
+                bottom = parse_depth(bottom_entry.get())
+            except ValueError:
+                messagebox.showerror("Ошибка", "Глубины должны быть числами.", parent=window)
+                return
+            start = time.perf_counter()
+            result = search_samples(self.project_store, research_combo.get(), top, bottom)
+            elapsed = (time.perf_counter() - start) * 1000
+            tree.delete(*tree.get_children())
+            for row in result.itertuples(index=False):
+                tree.insert("", "end", values=list(row))
+            result_var.set(f"Найдено образцов: {len(result)}, скважин: {result['Скважина'].nunique()} "
+                           f"({elapsed:.0f} мс)")
+
+        CTkButton(form, text="Найти", command=run_search, corner_radius=8,
+                  font=("Helvetica", 12)).grid(row=0, column=3, padx=5, pady=5)
+
+    def open_project(self):
+        """Открывает скважину из файла проекта без повторной обработки Excel и папки с фото."""
+        project_path = self.file_manager.select_project()
+        if not project_path:
+            return
+        try:
+            store = ProjectStore(project_path)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось открыть проект: {e}")
+            return
+        wells = store.wells()
+        if not wells:
+            messagebox.showwarning("Предупреждение", "В проекте нет сохранённых скважин.")
+            store.close()
+            return
+        well_name = wells[0] if len(wells) == 1 else self.file_manager.select_well(wells)
+        if well_name is None:
+            store.close()
+            return
+        if self.project_store is not None:
+            self.project_store.close()
+        self.project_store = store
+
+        info = store.well_info(well_name)
+        self.last_excel_path = info["excel_path"]
+        self.last_images_folder = info["images_folder"]
+        self.last_samples_path = info["samples_path"]
+        if store.is_stale(well_name):
+            if messagebox.askyesno("Проект", "Исходные таблицы скважины изменились после сохранения. "
+                                             "Обработать их заново?"):
+                settings = info["settings"]
+                self.file_manager.main_file_columns = [settings["box_column"], settings["start_column"],
+                                                       settings["end_column"], settings["measurements_column"]]
+                self.samples_var.set(info["samples_path"] is not None)
+                self.toggle_samples_button()
+                self.process_data()
+                return
+
+        if self.data_processor is not None:
+            self.data_processor.stop_photo_watcher()
+        self.data_processor = DataProcessor.from_project(store, well_name)
+        self.data_processor.start_photo_watcher()
+        df = self.data_processor.get_current_dataframe()
+        self.display_dataframe(df)
+
+        self.samples_dataframe = store.load_samples(well_name, self.data_processor.box_column)
+        self.samples_file = info["samples_path"]
+        self.samples_var.set(self.samples_dataframe is not None)
+        self.toggle_samples_button()
+        if self.samples_dataframe is not None:
+            self.show_samples_tab()
+        self.status_var.set(f"Открыта скважина {well_name} из проекта: {len(df)} строк")
+
     def check_samples_issues(self):
         """Проверяет образцы на отсутствие '+' и одинаковые номера образцов."""
         if self.samples_dataframe is None:
             return []
 
         issues = []
-        samples_df = pd.read_excel(self.samples_file, sheet_name=0)
+        samples_df = read_table(self.samples_file)
 
         # Проверяем отсутствие "+"
         for idx, row in samples_df.iterrows():
@@ -310,6 +505,8 @@ class AppUI:
             messagebox.showwarning("Предупреждение", "Нет данных для отображения.")
             return
 
+        # Компактные float32-столбцы показываем округлёнными, как в исходной таблице
+        dataframe = expand_dtypes(dataframe)
         columns = list(dataframe.columns)
         self.tree = ttk.Treeview(self.table_frame, columns=columns, show="headings", height=len(dataframe))
         self.tree.grid(row=0, column=0, sticky="nsew")
@@ -340,27 +537,39 @@ class AppUI:
         vynos_col_index = columns.index("Вынос") if "Вынос" in columns else -1
 
         # Вставляем строки и выделяем те, где вынос > 100%
+        self.tree_labels = {}  # iid строки Treeview -> метка индекса DataFrame
         for index, row in dataframe.iterrows():
             row_values = list(row)
             row_id = self.tree.insert("", "end", iid=str(index), values=row_values)
+            self.tree_labels[row_id] = index
 
             # Проверяем значение в столбце "Вынос"
             if vynos_col_index != -1:
-                vynos_value = row["Вынос"]
-                if isinstance(vynos_value, str) and vynos_value != "N/A":
-                    # Извлекаем процент из строки вида "X м (Y %)"
-                    match = re.search(r"\((\d+\.\d+|\d+) %\)", vynos_value)
-                    if match:
-                        percentage = float(match.group(1))
-                        if percentage > 100:
-                            # Выделяем строку красным цветом
-                            self.tree.item(row_id, tags=("highlight",))
+                # Извлекаем процент из строки вида "X м (Y %)"
+                percentage = recovery_percent(row["Вынос"])
+                if percentage is not None and percentage > 100:
+                    # Выделяем строку красным цветом
+                    self.tree.item(row_id, tags=("highlight",))
 
         # Настраиваем тег для выделения
         self.tree.tag_configure("highlight", background="#FF6666")  # Красный фон
 
         self.tree.bind("<Double-1>", self.on_double_click)
 
+    def refresh_tree_rows(self, labels):
+        """Обновляет значения и подсветку только указанных строк основной таблицы."""
+        df = self.data_processor.get_current_dataframe()
+        for label in labels:
+            row_id = str(label)
+            if not self.tree.exists(row_id):
+                continue
+            self.tree.item(row_id, values=list(expand_dtypes(df.loc[[label]]).iloc[0]))
+            percentage = recovery_percent(df.at[label, "Вынос"]) if "Вынос" in df.columns else None
+            if percentage is not None and percentage > 100:
+                self.tree.item(row_id, tags=("highlight",))
+            else:
+                self.tree.item(row_id, tags=())
+
     def display_samples_dataframe(self, dataframe):
         """Отображает DataFrame образцов во второй вкладке."""
         for widget in self.samples_table_frame.winfo_children():
@@ -398,9 +607,11 @@ class AppUI:
             self.samples_tree.column(col, width=width, anchor="w", stretch=False)
 
         # Вставляем строки и выделяем те, где "Нет исследований"
+        self.samples_tree_labels = {}  # iid строки Treeview -> метка индекса DataFrame
         for index, row in dataframe.iterrows():
             row_values = list(row)
             row_id = self.samples_tree.insert("", "end", iid=str(index), values=row_values)
+            self.samples_tree_labels[row_id] = index
             if row["Исследования"] == "Нет исследований":
                 self.samples_tree.item(row_id, tags=("no_research",))
 
@@ -427,19 +638,28 @@ class AppUI:
         entry.focus_set()
 
         def on_focus_out(event):
+            if not entry.winfo_exists():
+                return  # Правка уже применена по Enter
             new_value = entry.get()
-            self.samples_tree.set(row_id, column, new_value)
-            # Обновляем DataFrame образцов
-            col_index = int(column.replace('#', '')) - 1
-            self.samples_dataframe.iat[int(row_id), col_index] = new_value
             entry.destroy()
-
+            # Обновляем DataFrame образцов: iid строки — это метка индекса, а не позиция
+            df = self.samples_dataframe
+            label = self.samples_tree_labels[row_id]
+            col_name = df.columns[int(column.replace('#', '')) - 1]
+            box_column = self.data_processor.box_column
+            if col_name in ("Номер образца", "Глубина", box_column):
+                new_value = pd.to_numeric(str(new_value).replace(",", "."), errors="coerce")
+            set_cell(df, label, col_name, new_value)
+            # Целая часть номера образца — номер коробки
+            if col_name == "Номер образца" and pd.notna(new_value) and box_column in df.columns:
+                set_cell(df, label, box_column, int(new_value))
+
+            self.samples_tree.item(row_id, values=list(df.loc[label]))
             # Перепроверяем строку на наличие исследований
-            if col_index == self.samples_dataframe.columns.get_loc("Исследования"):
-                if new_value == "Нет исследований":
-                    self.samples_tree.item(row_id, tags=("no_research",))
-                else:
-                    self.samples_tree.item(row_id, tags=())
+            if df.at[label, "Исследования"] == "Нет исследований":
+                self.samples_tree.item(row_id, tags=("no_research",))
+            else:
+                self.samples_tree.item(row_id, tags=())
 
         entry.bind("<FocusOut>", on_focus_out)
         entry.bind("<Return>", on_focus_out)
@@ -461,50 +681,31 @@ class AppUI:
         entry.focus_set()
 
         def on_focus_out(event):
+            if not entry.winfo_exists():
+                return  # Правка уже применена по Enter
             new_value = entry.get()
-            self.tree.set(row_id, column, new_value)
-            # Обновляем DataFrame в data_processor
-            col_index = int(column.replace('#', '')) - 1
-            df = self.data_processor.get_current_dataframe()
-            df.iat[int(row_id), col_index] = new_value
             entry.destroy()
-
-            # Перепроверяем строку на условие выноса > 100%
-            if col_index == df.columns.get_loc("Вынос"):
-                vynos_value = new_value
-                if isinstance(vynos_value, str) and vynos_value != "N/A":
-                    match = re.search(r"\((\d+\.\d+|\d+) %\)", vynos_value)
-                    if match:
-                        percentage = float(match.group(1))
-                        if percentage > 100:
-                            self.tree.item(row_id, tags=("highlight",))
-                        else:
-                            self.tree.item(row_id, tags=())
+            # Применяем правку в data_processor: пересчитываются только интервалы группы и вынос строки
+            df = self.data_processor.get_current_dataframe()
+            col_name = df.columns[int(column.replace('#', '')) - 1]
+            affected = self.data_processor.apply_edit(self.tree_labels[row_id], col_name, new_value)
+            self.refresh_tree_rows(affected)
 
         entry.bind("<FocusOut>", on_focus_out)
         entry.bind("<Return>", on_focus_out)
 
     def save_data(self):
-        """Сохраняет активный DataFrame в файл в зависимости от текущей вкладки."""
-        # Определяем текущую вкладку
-        current_tab = self.tab_view.get()
-
-        if current_tab == "Основные данные":
-            if not self.data_processor or self.data_processor.get_current_dataframe() is None:
-                messagebox.showerror("Ошибка", "Нет основных данных для сохранения.")
-                return
-            df = self.data_processor.get_current_dataframe()
-        elif current_tab == "Образцы":
-            if self.samples_dataframe is None or self.samples_dataframe.empty:
-                messagebox.showerror("Ошибка", "Нет данных об образцах для сохранения.")
-                return
-            df = self.samples_dataframe
-        else:
-            messagebox.showerror("Ошибка", "Неизвестная вкладка.")
+        """Сохраняет основную таблицу и таблицу образцов (если есть) в одну книгу Excel."""
+        main_df = self.data_processor.get_current_dataframe() if self.data_processor else None
+        samples_df = self.samples_dataframe
+        if samples_df is not None and samples_df.empty:
+            samples_df = None
+        if main_df is None and samples_df is None:
+            messagebox.showerror("Ошибка", "Нет данных для сохранения.")
             return
 
         try:
-            result_path = self.file_manager.save_dataframe(df)
+            result_path = self.file_manager.save_tables(main_df, samples_df)
             if result_path:
                 self.status_var.set(f"Таблица сохранена: {result_path}")
                 # Показываем уведомление с вопросом об открытии
@@ -529,6 +730,13 @@ class AppUI:
                 print(f"Текущий box_column в data_processor: '{self.data_processor.box_column}'")
                 print(f"Столбцы в current_dataframe: {list(self.data_processor.get_current_dataframe().columns)}")
 
+                total_boxes = len(self.data_processor.get_current_dataframe().groupby(self.data_processor.box_column))
+                use_volumes = total_boxes > VOLUME_BOX_THRESHOLD and messagebox.askyesno(
+                    "Большой каталог",
+                    f"В каталоге {total_boxes} коробок. Разбить его на тома по {BOXES_PER_VOLUME} коробок?\n"
+                    "Тома строятся параллельно, выбранный файл станет оглавлением со ссылками на них."
+                )
+
                 # Создаём окно прогресса
                 progress_window = ctk.CTkToplevel(self.root)
                 progress_window.title("Создание каталога")
@@ -544,17 +752,30 @@ class AppUI:
                 progress_bar.pack(pady=10)
                 progress_bar.set(0)
 
-                total_boxes = len(self.data_processor.get_current_dataframe().groupby(self.data_processor.box_column))
                 progress_step = 1.0 / total_boxes if total_boxes > 0 else 1.0
                 print(f"Количество коробок: {total_boxes}, шаг прогресса: {progress_step}")
 
-                print("Вызов DataProcessor.create_catalog")
-                self.data_processor.create_catalog(
-                    save_path,
-                    self.samples_dataframe if self.samples_var.get() else None,
-                    progress_bar,
-                    progress_step
-                )
+                if use_volumes:
+                    print("Вызов DataProcessor.create_catalog_volumes")
+                    self.data_processor.create_catalog_volumes(
+                        save_path,
+                        self.samples_dataframe if self.samples_var.get() else None,
+                        mode="pages",
+                        limit=BOXES_PER_VOLUME,
+                        progress_bar=progress_bar,
+                        profile=PROFILES[self.profile_var.get()],
+                        composite=self.composite_var.get()
+                    )
+                else:
+                    print("Вызов DataProcessor.create_catalog")
+                    self.data_processor.create_catalog(
+                        save_path,
+                        self.samples_dataframe if self.samples_var.get() else None,
+                        progress_bar,
+                        progress_step,
+                        profile=PROFILES[self.profile_var.get()],
+                        composite=self.composite_var.get()
+                    )
 
                 progress_window.destroy()
 
@@ -569,6 +790,40 @@ class AppUI:
             messagebox.showerror("Ошибка создания каталога", str(e))
             raise  # Добавляем raise для полной трассировки
 
+    def dry_run(self):
+        """Пробная сборка каталога: замечания по коробкам, число страниц, ожидаемые время и размер."""
+        if not self.data_processor or self.data_processor.get_current_dataframe() is None:
+            messagebox.showerror("Ошибка", "Нет данных для проверки.")
+            return
+
+        self.status_var.set("Проверка каталога...")
+        self.root.update_idletasks()
+        try:
+            report = self.data_processor.dry_run(
+                self.samples_dataframe if self.samples_var.get() else None,
+                profile=PROFILES[self.profile_var.get()]
+            )
+        except Exception as e:
+            self.status_var.set("Готово")
+            messagebox.showerror("Ошибка проверки", str(e))
+            return
+        text = format_report(report)
+        if report["boxes"] > VOLUME_BOX_THRESHOLD:
+            volumes = -(-report["boxes"] // BOXES_PER_VOLUME)
+            text += f"\n\nКоробок больше {VOLUME_BOX_THRESHOLD}: при сборке будет предложено {volumes} томов."
+        self.status_var.set(f"Проверка: коробок {report['boxes']}, замечаний по коробкам {len(report['issues'])}")
+
+        window = ctk.CTkToplevel(self.root)
+        window.title("Проверка каталога")
+        window.geometry("800x500")
+        window.transient(self.root)
+        textbox = ctk.CTkTextbox(window, font=("Helvetica", 12), wrap="word")
+        textbox.pack(fill="both", expand=True, padx=10, pady=10)
+        textbox.insert("1.0", text)
+        textbox.configure(state="disabled")
+        CTkButton(window, text="Закрыть", command=window.destroy, corner_radius=8,
+                  font=("Helvetica", 12)).pack(pady=(0, 10))
+
     def open_file(self, file_path):
         """Открывает файл в зависимости от операционной системы."""
         try:
@@ -582,131 +837,104 @@ class AppUI:
             print(f"Ошибка открытия файла: {str(e)}")
             messagebox.showerror("Ошибка", f"Не удалось открыть файл: {str(e)}")
 
-    #def preview_catalog(self):
-    #    """Показывает предпросмотр каталога, аналогичный Word-документу."""
-    #    if not self.data_processor or self.data_processor.get_current_dataframe() is None:
-    #        messagebox.showerror("Ошибка", "Нет данных для предпросмотра.")
-    #        return
-#
-    #    preview_window = ctk.CTkToplevel(self.root)
-    #    preview_window.title("Предпросмотр каталога")
-    #    preview_window.geometry("1000x700")
-    #    preview_window.attributes("-topmost", True)
-#
-    #    preview_frame = CTkScrollableFrame(preview_window, corner_radius=10)
-    #    preview_frame.pack(fill="both", expand=True, padx=20, pady=20)
-#
-    #    title_label = CTkLabel(preview_frame,
-    #                           text=f"Фотографии керна по скважине {self.data_processor.get_current_dataframe()['Скважина'].iloc[0]}",
-    #                           font=("Helvetica", 18, "bold"))
-    #    title_label.pack(pady=10)
-#
-    #    intro_label = CTkLabel(preview_frame,
-    #                           text="Глубины даны по керну. Номера образцов расположены напротив точек выбуривания. "
-    #                                "Номер образца состоит из двух цифр, разделённых точкой. "
-    #                                "Первая цифра соответствует номеру коробки, вторая – расстояние в сантиметрах от низа коробки до точки отбора образца.",
-    #                           font=("Helvetica", 12), wraplength=900, justify="left")
-    #    intro_label.pack(pady=10)
-#
-    #    df = self.data_processor.get_current_dataframe()
-    #    grouped = df.groupby(self.data_processor.box_column)
-#
-    #    scale_image_path = resource_path('resources/scale.jpg')
-    #    shkala_image_path = resource_path('resources/shkala.jpg')
-#
-    #    target_height = 400
-    #    shkala_height = 50
-#
-    #    for box_number, group in grouped:
-    #        separator = CTkFrame(preview_frame, height=2, fg_color="#555555")
-    #        separator.pack(fill="x", pady=20)
-#
-    #        table_frame = CTkFrame(preview_frame, corner_radius=5, fg_color="#333333")
-    #        table_frame.pack(fill="x", padx=10, pady=10)
-#
-    #        width_samles_col = 100
-    #        width_photo_col = 400
-    #        width_samles_right = 300
-    #        width_scale_col = 50
-#
-    #        cell_0_0 = CTkFrame(table_frame, width=width_samles_col, height=50, fg_color="#444444")
-    #        cell_0_0.grid(row=0, column=0, padx=1, pady=1, sticky="nsew")
-    #        label_0_0 = CTkLabel(cell_0_0, text=f"Коробка {int(box_number)}", font=("Helvetica", 12))
-    #        label_0_0.pack(pady=5)
-#
-    #        cell_0_1 = CTkFrame(table_frame, width=width_photo_col, height=50, fg_color="#444444")
-    #        cell_0_1.grid(row=0, column=1, padx=1, pady=1, sticky="nsew")
-    #        ts = 'Интервал бурения: '
-    #        for idx, row in group.iterrows():
-    #            ts += f"{row['Начало интервала']}-{row['Конец интервала']}\nвынос: {row['Вынос']}\n"
-    #        label_0_1 = CTkLabel(cell_0_1, text=ts.strip(), font=("Helvetica", 12), justify="left")
-    #        label_0_1.pack(pady=5)
-#
-    #        cell_0_2 = CTkFrame(table_frame, width=width_samles_right, height=50, fg_color="#444444")
-    #        cell_0_2.grid(row=0, column=2, padx=1, pady=1, sticky="nsew")
-#
-    #        cell_0_3 = CTkFrame(table_frame, width=width_scale_col, height=50, fg_color="#444444")
-    #        cell_0_3.grid(row=0, column=3, padx=1, pady=1, sticky="nsew")
-#
-    #        cell_1_0 = CTkFrame(table_frame, width=width_samles_col, height=30, fg_color="#444444")
-    #        cell_1_0.grid(row=1, column=0, padx=1, pady=1, sticky="nsew")
-    #        label_1_0 = CTkLabel(cell_1_0, text="Номера образцов:", font=("Helvetica", 12))
-    #        label_1_0.pack(pady=5)
-#
-    #        cell_1_1 = CTkFrame(table_frame, width=width_photo_col, height=30, fg_color="#444444")
-    #        cell_1_1.grid(row=1, column=1, padx=1, pady=1, sticky="nsew")
-    #        start_value = group[self.data_processor.start_column].iloc[
-    #            0] if self.data_processor.start_column in group.columns else "N/A"
-    #        label_1_1 = CTkLabel(cell_1_1, text=f"[{start_value}]", font=("Helvetica", 12))
-    #        label_1_1.pack(pady=5)
-#
-    #        cell_1_2 = CTkFrame(table_frame, width=width_samles_right, height=30, fg_color="#444444")
-    #        cell_1_2.grid(row=1, column=2, padx=1, pady=1, sticky="nsew")
-    #        label_1_2 = CTkLabel(cell_1_2, text="Исследования:", font=("Helvetica", 12))
-    #        label_1_2.pack(pady=5)
-#
-    #        cell_1_3 = CTkFrame(table_frame, width=width_scale_col, height=30, fg_color="#444444")
-    #        cell_1_3.grid(row=1, column=3, padx=1, pady=1, sticky="nsew")
-#
-    #        cell_2_1 = CTkFrame(table_frame, width=width_photo_col, height=450, fg_color="#444444")
-    #        cell_2_1.grid(row=2, column=1, padx=1, pady=1, sticky="nsew")
-    #        images_frame = CTkFrame(cell_2_1, fg_color="#444444")
-    #        images_frame.pack(pady=5)
-#
-    #        try:
-    #            top_depth = float(group[self.data_processor.start_column].iloc[
-    #                                  0]) if self.data_processor.start_column in group.columns else 0
-    #            bottom_depth = float(group[self.data_processor.end_column].iloc[
-    #                                     0]) if self.data_processor.end_column in group.columns else 0
-    #            core_count = 1
-    #            img_d, img_d2 = self.data_processor.generate_depth_scale(top_depth, bottom_depth, core_count)
-    #            img = Image.open(img_d)
-    #            img.thumbnail((50, target_height))
-    #            depth_scale = CTkImage(light_image=img, dark_image=img, size=(50, target_height))
-    #            depth_scale_label = CTkLabel(images_frame, image=depth_scale, text="")
-    #            depth_scale_label.pack(side="left", padx=5)
-    #            if img_d2:
-    #                img2 = Image.open(img_d2)
-    #                img2.thumbnail((50, target_height))
-    #                depth_scale2 = CTkImage(light_image=img2, dark_image=img2, size=(50, target_height))
-    #                depth_scale_label2 = CTkLabel(images_frame, image=depth_scale2, text="")
-    #                depth_scale_label2.pack(side="left", padx=5)
-    #        except Exception as e:
-    #            error_label = CTkLabel(images_frame, text=f"Ошибка шкалы: {str(e)}", font=("Helvetica", 10))
-    #            error_label.pack(side="left", padx=5)
-#
-    #        # ... (далее без изменений до конца метода)
-#
-    #        cell_3_1 = CTkFrame(table_frame, width=width_photo_col, height=30, fg_color="#444444")
-    #        cell_3_1.grid(row=3, column=1, padx=1, pady=1, sticky="nsew")
-    #        end_value = group[self.data_processor.end_column].iloc[
-    #            0] if self.data_processor.end_column in group.columns else "N/A"
-    #        label_3_1 = CTkLabel(cell_3_1, text=f"[{end_value}]", font=("Helvetica", 12))
-    #        label_3_1.pack(pady=5)
-#
-    #    close_button = CTkButton(preview_frame, text="Закрыть", command=preview_window.destroy,
-    #                             corner_radius=8, font=("Helvetica", 12))
-    #    close_button.pack(pady=10)
+    def preview_catalog(self):
+        """Показывает предпросмотр каталога: миниатюры коробок подгружаются по мере прокрутки."""
+        if not self.data_processor or self.data_processor.get_current_dataframe() is None:
+            messagebox.showerror("Ошибка", "Нет данных для предпросмотра.")
+            return
+
+        # Та же раскладка коробок, что и при создании каталога
+        jobs = self.data_processor.collect_box_jobs(self.samples_dataframe if self.samples_var.get() else None)
+        if not jobs:
+            messagebox.showwarning("Предупреждение", "Нет коробок для предпросмотра.")
+            return
+
+        preview_window = ctk.CTkToplevel(self.root)
+        preview_window.title("Предпросмотр каталога")
+        preview_window.geometry("1000x700")
+        preview_window.attributes("-topmost", True)
+
+        preview_frame = CTkScrollableFrame(preview_window, corner_radius=10)
+        preview_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+        title_label = CTkLabel(preview_frame,
+                               text=f"Фотографии керна по скважине {self.data_processor.get_current_dataframe()['Скважина'].iloc[0]}",
+                               font=("Helvetica", 18, "bold"))
+        title_label.pack(pady=10)
+
+        thumbnail_height = 400
+        thumbnail_cache = ThumbnailCache(height=thumbnail_height)
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="preview")
+        results = queue.Queue()  # Готовые миниатюры из фоновых потоков
+
+        # Для каждой коробки создаём лёгкую заготовку; изображение строится, когда она видна
+        slots = []
+        for job in jobs:
+            group = expand_dtypes(job["group"])
+            box_frame = CTkFrame(preview_frame, corner_radius=5, fg_color="#333333")
+            box_frame.pack(fill="x", padx=10, pady=10)
+
+            ts = f"Коробка {int(job['box_number'])}    " + " ".join(job["layout"].column_labels()) + "\nИнтервал бурения: "
+            for idx, row in group.iterrows():
+                ts += f"{row['Начало интервала']}-{row['Конец интервала']}, вынос: {row['Вынос']}; "
+            if job["samples"] is not None and not job["samples"].empty:
+                ts += "\nОбразцы: " + ", ".join(map(str, job["samples"]["Номер образца"].tolist()))
+            header = CTkLabel(box_frame, text=ts.strip("; "), font=("Helvetica", 12), justify="left",
+                              wraplength=900)
+            header.pack(anchor="w", padx=10, pady=5)
+
+            image_label = CTkLabel(box_frame, text="Загрузка...", height=thumbnail_height)
+            image_label.pack(pady=5)
+            slots.append({"job": job, "frame": box_frame, "label": image_label, "state": None, "image": None})
+
+        def load_thumbnail(slot):
+            try:
+                results.put((slot, thumbnail_cache.get(slot["job"], self.data_processor.render_box_thumbnail), None))
+            except Exception as e:
+                results.put((slot, None, e))
+
+        def request_visible():
+            """Ставит в очередь миниатюры коробок, попадающих в видимую область (с запасом в один экран)."""
+            canvas = preview_frame._parent_canvas
+            view_top = canvas.winfo_rooty()
+            view_height = canvas.winfo_height()
+            for slot in slots:
+                frame_top = slot["frame"].winfo_rooty()
+                if frame_top > view_top + 2 * view_height:
+                    break  # Заготовки идут сверху вниз, дальше только невидимые
+                if slot["state"] is None and frame_top + slot["frame"].winfo_height() >= view_top - view_height:
+                    slot["state"] = "loading"
+                    executor.submit(load_thumbnail, slot)
+
+        last_view = [None]
+
+        def poll():
+            if not preview_window.winfo_exists():
+                return
+            while not results.empty():
+                slot, img, error = results.get_nowait()
+                if error is not None:
+                    slot["label"].configure(text=f"Ошибка миниатюры: {error}")
+                    continue
+                slot["image"] = CTkImage(light_image=img, dark_image=img, size=img.size)
+                slot["label"].configure(image=slot["image"], text="")
+            # Видимые коробки пересчитываем только при прокрутке или изменении размеров окна
+            view = (preview_frame._parent_canvas.yview(), preview_window.winfo_height())
+            if view != last_view[0]:
+                last_view[0] = view
+                request_visible()
+            preview_window.after(100, poll)
+
+        def close():
+            executor.shutdown(wait=False, cancel_futures=True)
+            preview_window.destroy()
+
+        close_button = CTkButton(preview_frame, text="Закрыть", command=close,
+                                 corner_radius=8, font=("Helvetica", 12))
+        close_button.pack(pady=10)
+        preview_window.protocol("WM_DELETE_WINDOW", close)
+        preview_window.after(100, poll)
+
     def convert_to_pdf(self):
         """Конвертирует каталог в PDF."""
         try:
@@ -1,5 +1,7 @@
 import os  # Модуль для работы с файлами и папками
+import re  # Модуль для регулярных выражений
 import sys  # Модуль для работы с системными параметрами
+import numpy as np  # Библиотека для работы с массивами
 import pandas as pd  # Библиотека для работы с таблицами
 
 # Функция для получения пути к ресурсам (работает и в .exe)
@@ -53,4 +55,105 @@ def find_continuous_intervals(df, start_col, end_col):
     for s in sorted_data[(sorted_data[start_col] >= current_start) & (sorted_data[start_col] <= current_end)][start_col]:
         interval_dict[s] = (current_start, current_end)
 
-    return intervals, interval_dict  # Возвращаем список интервалов и словарь
\ No newline at end of file
+    return intervals, interval_dict  # Возвращаем список интервалов и словарь
+
+# Число знаков после запятой для глубин и длин (мм); float32 допускается, только если значения сохраняются без потерь
+DEPTH_DECIMALS = 3
+
+# Функция для перевода таблицы в компактные типы данных
+def compact_dtypes(df, category_columns=(), float_columns=(), integer_columns=()):
+    """Переводит столбцы в компактные типы: category для повторяющихся строк, float32 и малые целые для чисел.
+
+    float32 используется только там, где это безопасно: значения с точностью до DEPTH_DECIMALS
+    знаков переживают преобразование без изменений. Изменяет и возвращает df.
+    """
+    for col in category_columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    for col in float_columns:
+        if col not in df.columns or not pd.api.types.is_float_dtype(df[col]) or df[col].dtype == np.float32:
+            continue
+        values = df[col].to_numpy()
+        rounded = np.round(values, DEPTH_DECIMALS)
+        as_float32 = values.astype(np.float32)
+        restored = np.round(as_float32.astype(np.float64), DEPTH_DECIMALS)
+        # Точность выше DEPTH_DECIMALS или потеря знаков — оставляем float64
+        if np.allclose(values, rounded, rtol=0, atol=1e-9, equal_nan=True) and \
+                np.array_equal(restored, rounded, equal_nan=True):
+            df[col] = as_float32
+
+    for col in integer_columns:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]) and df[col].notna().all():
+            values = df[col]
+            if (values == values.round()).all():
+                df[col] = pd.to_numeric(values.astype(np.int64), downcast="integer")
+    return df
+
+# Функция для возврата компактной таблицы к обычным типам (для экспорта)
+def expand_dtypes(df):
+    """Возвращает копию таблицы, где float32 снова float64 с округлением до DEPTH_DECIMALS знаков."""
+    float32_columns = [col for col in df.columns if df[col].dtype == np.float32]
+    if not float32_columns:
+        return df
+    df = df.copy()
+    for col in float32_columns:
+        df[col] = df[col].astype(np.float64).round(DEPTH_DECIMALS)
+    return df
+
+# Функция для расчёта выноса керна по столбцам таблицы
+def format_recovery(measurements, start, end):
+    """Возвращает текст выноса вида "X м (Y %)" для каждой строки; "N/A", если данных недостаточно."""
+    length = end - start
+    valid = measurements.notna() & start.notna() & end.notna() & (length != 0)
+    percent = measurements / length.where(length != 0) * 100
+    text = measurements.astype(str) + " м (" + percent.map("{:.1f}".format) + " %)"
+    return text.where(valid, "N/A").astype(object)
+
+# Функция для извлечения процента выноса из текста
+def recovery_percent(vynos_value):
+    """Извлекает процент из строки выноса вида "X м (Y %)"; None, если процента нет."""
+    if isinstance(vynos_value, str) and vynos_value != "N/A":
+        match = re.search(r"\((\d+\.\d+|\d+) %\)", vynos_value)
+        if match:
+            return float(match.group(1))
+    return None
+
+# Функция для записи значения в ячейку с учётом компактных типов
+def set_cell(df, label, column, value):
+    """Записывает значение в ячейку по метке строки и имени столбца.
+
+    Для столбцов-категорий новое значение добавляется в категории, а float32-столбец
+    переводится во float64, если значение в нём не помещается без потерь. Малый целый
+    столбец расширяется до целого типа, вмещающего новое значение; во float64 он
+    переводится только для пустого или дробного значения.
+    """
+    series = df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if pd.notna(value) and value not in series.cat.categories:
+            df[column] = series.cat.add_categories([value])
+    elif series.dtype == np.float32:
+        if pd.notna(value) and round(float(np.float32(value)), DEPTH_DECIMALS) != round(float(value), DEPTH_DECIMALS):
+            df[column] = series.astype(np.float64)
+        else:
+            value = np.float32(value)
+    elif pd.api.types.is_integer_dtype(series.dtype):
+        if pd.isna(value) or float(value) != int(value):
+            df[column] = series.astype(np.float64)
+        else:
+            value = int(value)
+            info = np.iinfo(series.dtype)
+            if not info.min <= value <= info.max:
+                df[column] = series.astype(_integer_dtype_for(value, series.dtype))
+    df.at[label, column] = value
+
+
+def _integer_dtype_for(value, dtype):
+    """Наименьший целый тип, вмещающий и value, и весь диапазон dtype; float64 — если такого нет."""
+    info = np.iinfo(dtype)
+    low, high = min(value, info.min), max(value, info.max)
+    candidates = (np.uint8, np.uint16, np.uint32, np.uint64) if low >= 0 else (np.int8, np.int16, np.int32, np.int64)
+    for candidate in candidates:
+        if np.iinfo(candidate).min <= low and high <= np.iinfo(candidate).max:
+            return candidate
+    return np.float64
@@ -0,0 +1,197 @@
+import multiprocessing  # Контекст запуска процессов
+import os  # Модуль для работы с файлами и папками
+from concurrent.futures import ProcessPoolExecutor, as_completed  # Пул процессов
+from pathlib import Path  # Работа с путями
+from docx import Document  # Работа с Word
+from docx.opc.constants import RELATIONSHIP_TYPE  # Типы связей (гиперссылки)
+from docx.oxml import OxmlElement  # Создание XML-элементов
+from docx.oxml.ns import qn  # Имена XML с пространствами имён
+from PIL import Image  # Чтение размеров фото
+
+# Способы разбиения каталога на тома
+PARTITION_MODES = ("pages", "depth", "bytes")
+# Примерный размер JPEG на пиксель (около 1.2 бита) для оценки объёма тома
+JPEG_BYTES_PER_PIXEL = 0.15
+# Накладные расходы страницы коробки без фото: таблица и шкалы
+PAGE_OVERHEAD_BYTES = 60_000
+
+
+def estimate_job_bytes(job, profile, photo_height_inches):
+    """Оценивает вклад коробки в размер документа по размеру фото на странице и профилю кодирования."""
+    estimate = PAGE_OVERHEAD_BYTES
+    for key in ("photo_path", "photo_uf_path"):
+        path = job.get(key)
+        if not path or not os.path.exists(path):
+            continue
+        if profile.max_bytes:
+            estimate += profile.max_bytes
+            continue
+        try:
+            with Image.open(path) as img:  # Читается только заголовок файла
+                width, height = profile.target_size(img.size, photo_height_inches)
+        except OSError:
+            estimate += os.path.getsize(path)
+            continue
+        estimate += min(os.path.getsize(path), int(width * height * JPEG_BYTES_PER_PIXEL))
+    return estimate
+
+
+def partition_jobs(jobs, mode="pages", limit=None, volume_count=None, weight=None):
+    """Делит задания коробок (по порядку) на тома.
+
+    mode="pages" — limit страниц (коробок) в томе, mode="depth" — limit метров глубины на том,
+    mode="bytes" — limit байт на том (вес коробки считает функция weight(job)).
+    Вместо limit можно задать volume_count — число томов. Возвращает список списков заданий.
+    """
+    if mode not in PARTITION_MODES:
+        raise ValueError(f"Неизвестный способ разбиения на тома: {mode}")
+    if not jobs:
+        return []
+    if limit is None and not volume_count:
+        raise ValueError("Нужно задать размер тома или число томов.")
+
+    if mode == "depth":
+        top = min(job["layout"].top_depth for job in jobs)
+        if limit is None:
+            bottom = max(job["layout"].bottom_depth for job in jobs)
+            limit = (bottom - top) / volume_count or 1.0
+        volumes = {}
+        for job in jobs:
+            # Коробка попадает в том по глубине своего верха
+            volumes.setdefault(int((job["layout"].top_depth - top) // limit), []).append(job)
+        return [volumes[key] for key in sorted(volumes)]
+
+    if mode == "pages":
+        weights = [1] * len(jobs)
+    else:
+        if weight is None:
+            raise ValueError("Для разбиения по размеру нужна функция оценки размера коробки.")
+        weights = [weight(job) for job in jobs]
+    if limit is None:
+        # Заданное число томов: коробка попадает в том по середине своего накопленного веса
+        total = sum(weights) or 1
+        volumes = {}
+        accumulated = 0
+        for job, job_weight in zip(jobs, weights):
+            number = min(volume_count - 1, int((accumulated + job_weight / 2) * volume_count / total))
+            volumes.setdefault(number, []).append(job)
+            accumulated += job_weight
+        return [volumes[key] for key in sorted(volumes)]
+
+    volumes = [[]]
+    volume_weight = 0
+    for job, job_weight in zip(jobs, weights):
+        if volumes[-1] and volume_weight + job_weight > limit:
+            volumes.append([])
+            volume_weight = 0
+        volumes[-1].append(job)
+        volume_weight += job_weight
+    return volumes
+
+
+def volume_path(save_path, number):
+    """Путь к файлу тома рядом с оглавлением: "каталог.docx" -> "каталог_том01.docx"."""
+    save_path = Path(save_path)
+    return save_path.with_name(f"{save_path.stem}_том{number:02d}{save_path.suffix}")
+
+
+def volume_summary(number, jobs, path):
+    """Описание тома для оглавления: номер, диапазон коробок и глубин, имя файла."""
+    return {
+        "number": number,
+        "boxes": (jobs[0]["box_number"], jobs[-1]["box_number"]),
+        "depths": (min(job["layout"].top_depth for job in jobs), max(job["layout"].bottom_depth for job in jobs)),
+        "box_count": len(jobs),
+        "path": str(path),
+    }
+
+
+def _build_volume(processor, path, jobs, title, profile, workers, composite=False):
+    """Строит один том в отдельном процессе (processor приходит в процесс копией)."""
+    processor.create_catalog(str(path), jobs=jobs, title=title, profile=profile, workers=workers,
+                             composite=composite)
+    return str(path)
+
+
+def build_volumes(processor, save_path, volumes, profile=None, processes=None, progress_bar=None, composite=False):
+    """Строит тома параллельно в отдельных процессах; возвращает описания томов.
+
+    processor должен быть облегчённой копией DataProcessor без фоновых потоков
+    (см. DataProcessor.volume_copy). Потоки конвейера внутри тома делят ядра поровну.
+    """
+    processes = max(1, min(processes or os.cpu_count() or 1, len(volumes)))
+    workers = max(1, (os.cpu_count() or 1) // processes)
+    total_boxes = sum(len(jobs) for jobs in volumes)
+    summaries = []
+
+    # "spawn" одинаково работает в Windows, в собранном .exe и рядом с окном Tk
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        futures = {}
+        for number, jobs in enumerate(volumes, start=1):
+            path = volume_path(save_path, number)
+            title = f"Том {number} из {len(volumes)}"
+            future = pool.submit(_build_volume, processor, path, jobs, title, profile, workers, composite)
+            futures[future] = (number, jobs, path)
+
+        done_boxes = 0
+        for future in as_completed(futures):
+            number, jobs, path = futures[future]
+            future.result()
+            print(f"Том {number} создан: {path}")
+            summaries.append(volume_summary(number, jobs, path))
+            done_boxes += len(jobs)
+            if progress_bar is not None:
+                progress_bar.set(min(done_boxes / total_boxes, 1.0))
+                progress_bar.update()
+
+    summaries.sort(key=lambda summary: summary["number"])
+    return summaries
+
+
+def _add_hyperlink(paragraph, target, text):
+    """Добавляет в абзац гиперссылку на файл (путь относительно оглавления)."""
+    rel_id = paragraph.part.relate_to(target, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), rel_id)
+    run = OxmlElement("w:r")
+    run_properties = OxmlElement("w:rPr")
+    style = OxmlElement("w:rStyle")
+    style.set(qn("w:val"), "Hyperlink")
+    run_properties.append(style)
+    underline = OxmlElement("w:u")
+    underline.set(qn("w:val"), "single")
+    run_properties.append(underline)
+    color = OxmlElement("w:color")
+    color.set(qn("w:val"), "0563C1")
+    run_properties.append(color)
+    run.append(run_properties)
+    text_element = OxmlElement("w:t")
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+
+def write_volume_index(save_path, well_name, summaries):
+    """Создаёт лёгкое оглавление каталога со ссылками на файлы томов."""
+    doc = Document()
+    doc.add_heading(f'Фотографии керна по скважине {well_name}', 0)
+    doc.add_paragraph(f'Каталог разбит на тома: {len(summaries)}. Файлы томов должны лежать в одной папке с оглавлением.')
+
+    table = doc.add_table(rows=1, cols=4, style='Table Grid')
+    for cell, text in zip(table.rows[0].cells, ("Том", "Коробки", "Интервал, м", "Файл")):
+        cell.text = text
+    for summary in summaries:
+        cells = table.add_row().cells
+        cells[0].text = str(summary["number"])
+        first_box, last_box = summary["boxes"]
+        cells[1].text = f"{first_box}–{last_box} ({summary['box_count']})"
+        top, bottom = summary["depths"]
+        cells[2].text = f"{top}–{bottom}"
+        file_name = Path(summary["path"]).name
+        _add_hyperlink(cells[3].paragraphs[0], file_name, file_name)
+
+    doc.save(save_path)
+    print(f"Оглавление томов сохранено: {save_path}")
+    return save_path
@@ -0,0 +1,157 @@
+import atexit  # Очистка при выходе из программы
+import itertools  # Счётчик уникальных имён
+import os  # Модуль для работы с файлами и папками
+import shutil  # Удаление папок и перенос файлов
+import tempfile  # Системная временная папка
+import threading  # Синхронизация потоков
+import uuid  # Уникальные имена
+
+# Префикс папок рабочих пространств; в имени также pid процесса-владельца
+WORKSPACE_PREFIX = "corecatalog_build_"
+# Папки в оперативной памяти (tmpfs), которые используются, если доступны
+RAM_DIRS = ("/dev/shm",)
+# Сколько места оставлять свободным в оперативной памяти; файлы сверх этого пишутся на диск
+RAM_RESERVE_BYTES = 512 * 1024 * 1024
+
+
+def _pid_alive(pid):
+    """Проверяет, жив ли процесс с заданным pid."""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # В Windows os.kill завершает процесс, поэтому спрашиваем систему через OpenProcess
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # Нет доступа — процесс существует
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Процесс есть, но принадлежит другому пользователю
+    return True
+
+
+def cleanup_stale_workspaces():
+    """Удаляет рабочие пространства процессов, которые завершились аварийно и не убрали за собой."""
+    for base in (tempfile.gettempdir(),) + RAM_DIRS:
+        try:
+            entries = list(os.scandir(base))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.name.startswith(WORKSPACE_PREFIX) or not entry.is_dir():
+                continue
+            try:
+                pid = int(entry.name[len(WORKSPACE_PREFIX):].split("_")[0])
+            except ValueError:
+                continue
+            if not _pid_alive(pid):
+                print(f"Удаляем оставшееся рабочее пространство: {entry.path}")
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class BuildWorkspace:
+    def __init__(self, name="build"):
+        """Рабочее пространство сборки для временных файлов.
+
+        У каждой сборки своя папка (pid процесса и случайная часть в имени), поэтому
+        параллельные сборки и сборки разных скважин не мешают друг другу, а папка
+        с фото не изменяется. Файлы пишутся в оперативную память (tmpfs), если она
+        есть и в ней хватает места; иначе — во временную папку на диске. Папки
+        удаляются при закрытии, при выходе из программы, а после аварийного
+        завершения — при следующем запуске (cleanup_stale_workspaces).
+        """
+        self.name = name
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._dirs = {}  # "ram" / "disk" -> созданная папка
+        self.closed = False
+        atexit.register(self.close)
+
+    def _dir(self, kind):
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("Рабочее пространство уже закрыто.")
+            if kind not in self._dirs:
+                base = self._ram_base() if kind == "ram" else tempfile.gettempdir()
+                prefix = f"{WORKSPACE_PREFIX}{os.getpid()}_{self.name}_"
+                self._dirs[kind] = tempfile.mkdtemp(prefix=prefix, dir=base)
+            return self._dirs[kind]
+
+    @staticmethod
+    def _ram_base():
+        for base in RAM_DIRS:
+            if os.path.isdir(base) and os.access(base, os.W_OK):
+                return base
+        return None
+
+    def _ram_has_room(self, size):
+        base = self._ram_base()
+        if base is None:
+            return False
+        try:
+            return shutil.disk_usage(base).free - (size or 0) > RAM_RESERVE_BYTES
+        except OSError:
+            return False
+
+    def new_path(self, stem="file", suffix="", size=None):
+        """Возвращает уникальный путь для нового временного файла.
+
+        size — ожидаемый размер: если оперативной памяти мало, файл будет на диске.
+        """
+        kind = "ram" if self._ram_has_room(size) else "disk"
+        with self._lock:
+            number = next(self._counter)
+        file_name = f"{stem}_{number}_{uuid.uuid4().hex[:8]}{suffix}"
+        return os.path.join(self._dir(kind), file_name)
+
+    def write(self, data, stem="file", suffix=""):
+        """Записывает байты во временный файл рабочего пространства; возвращает путь."""
+        path = self.new_path(stem, suffix, len(data))
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    @staticmethod
+    def publish(path, target):
+        """Переносит готовый файл на место назначения целиком (без недописанного файла в target)."""
+        target = os.path.abspath(target)
+        try:
+            os.replace(path, target)
+        except OSError:
+            # Другой диск: копируем рядом с целью и переименовываем (права файла — как у обычного)
+            tmp_target = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                shutil.copyfile(path, tmp_target)
+                os.replace(tmp_target, target)
+            except OSError:
+                if os.path.exists(tmp_target):
+                    os.remove(tmp_target)
+                raise
+            os.remove(path)
+        return target
+
+    def close(self):
+        """Удаляет все временные файлы рабочего пространства."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            dirs, self._dirs = list(self._dirs.values()), {}
+        for path in dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+